@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+from codec_profiles import CODEC_PROFILES, codec_options, predictor_for
+
+HEIGHT, WIDTH = 1616, 1737
+BLOCK_SIZE = 512
+TILE_READS = 20
+
+# (codec, extra creation options, predictor: False, a number, or True for
+# predictor_for(dtype))
+CODECS = [
+    ('NONE', {}, False),
+    ('LZW', {}, False),
+    ('LZW', {}, True),
+    ('DEFLATE', {'ZLEVEL': '6'}, False),
+    ('DEFLATE', {'ZLEVEL': '6'}, True),
+    ('ZSTD', {'ZSTD_LEVEL': '1'}, 2),
+    ('ZSTD', {'ZSTD_LEVEL': '1'}, True),
+    ('ZSTD', {'ZSTD_LEVEL': '9'}, False),
+    ('ZSTD', {'ZSTD_LEVEL': '9'}, 2),
+    ('ZSTD', {'ZSTD_LEVEL': '9'}, True),
+    ('ZSTD', {'ZSTD_LEVEL': '15'}, True),
+    ('LERC', {'MAX_Z_ERROR': '0'}, False),
+    ('LERC_ZSTD', {'MAX_Z_ERROR': '0'}, False),
+]
+
+def smooth_field(rng, low, high):
+    """Spatially correlated field between low and high, like a satellite band."""
+    y = np.linspace(0, 1, HEIGHT, dtype=np.float32)[:, np.newaxis]
+    x = np.linspace(0, 1, WIDTH, dtype=np.float32)[np.newaxis, :]
+    field = np.zeros((HEIGHT, WIDTH), dtype=np.float32)
+    for scale in (1, 3, 9, 27, 81):
+        phase = rng.uniform(0, 2 * np.pi, 2)
+        field += np.sin(2 * np.pi * scale * x + phase[0]) * np.cos(2 * np.pi * scale * y + phase[1]) / scale
+    field += rng.normal(0, 0.02, field.shape).astype(np.float32)
+    field = (field - field.min()) / (field.max() - field.min())
+    return low + field * (high - low)
+
+def product_rasters(seed=0):
+    """One raster per product type written by the project."""
+    rng = np.random.default_rng(seed)
+    counts = np.rint(smooth_field(rng, 0, 1022)).astype(np.uint16)
+    radiance = (counts * np.float32(0.0017001) + np.float32(-0.0148718)).astype(np.float32)
+    temperature = smooth_field(rng, 190.0, 320.0)
+    return {
+        'counts (uint16)': counts,
+        'radiance (float32)': radiance,
+        'temperature (float32)': temperature,
+        'fire_mask (uint8)': (temperature > 315).astype(np.uint8),
+    }
+
+def creation_options(codec, extra, predictor, dtype):
+    options = dict(compress=codec, tiled=True, blockxsize=BLOCK_SIZE, blockysize=BLOCK_SIZE, **extra)
+    if predictor:
+        options['predictor'] = predictor_for(dtype) if predictor is True else predictor
+    return options
+
+def measure(path, data, options):
+    """(size bytes, write MB/s, mean ms per single-tile read from a fresh open)."""
+    profile = dict(driver='GTiff', height=HEIGHT, width=WIDTH, count=1, dtype=data.dtype,
+                   crs='EPSG:4326', transform=from_origin(44.5, 45.5, 0.04, 0.04), **options)
+    start = time.perf_counter()
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, 1)
+    write_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    start = time.perf_counter()
+    for _ in range(TILE_READS):
+        col = rng.integers(0, WIDTH // BLOCK_SIZE) * BLOCK_SIZE
+        row = rng.integers(0, HEIGHT // BLOCK_SIZE) * BLOCK_SIZE
+        with rasterio.open(path) as src:
+            src.read(1, window=Window(col, row, BLOCK_SIZE, BLOCK_SIZE))
+    tile_ms = (time.perf_counter() - start) / TILE_READS * 1000
+    return os.path.getsize(path), data.nbytes / write_seconds / 1e6, tile_ms
+
+def main():
+    products = product_rasters()
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "codec.tif")
+        for product, data in products.items():
+            print(f"\n{product}: {data.nbytes / 1e6:.1f} MB raw")
+            print(f"{'codec':<24}{'size MB':>9}{'ratio':>8}{'write MB/s':>12}{'tile ms':>9}")
+            for codec, extra, predictor in CODECS:
+                options = creation_options(codec, extra, predictor, data.dtype)
+                size, throughput, tile_ms = measure(path, data, options)
+                label = codec + ''.join(f" {k}={v}" for k, v in extra.items() if k.endswith('LEVEL'))
+                label += f" P{options['predictor']}" if predictor else ''
+                print(f"{label:<24}{size / 1e6:9.2f}{data.nbytes / size:8.2f}{throughput:12.1f}{tile_ms:9.2f}")
+            for name in CODEC_PROFILES:
+                options = {k.lower(): v for k, v in codec_options(name, data.dtype).items()}
+                options.update(tiled=True, blockxsize=BLOCK_SIZE, blockysize=BLOCK_SIZE)
+                size, throughput, tile_ms = measure(path, data, options)
+                label = f"profile {name}"
+                print(f"{label:<24}{size / 1e6:9.2f}{data.nbytes / size:8.2f}{throughput:12.1f}{tile_ms:9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import logging
+import os
+import tempfile
+import time
+import h5py
+import numpy as np
+import rasterio
+import rasterio.shutil
+from grid import grid_from_file
+import l1ctocog
+from synthetic_scene import BANDS, write_synthetic_l1c
+
+def io_counters():
+    """Bytes this process has passed to write() and sent to storage so far."""
+    counters = {}
+    with open('/proc/self/io') as f:
+        for line in f:
+            name, value = line.split(':')
+            counters[name] = int(value)
+    return counters['wchar'], counters['write_bytes']
+
+def temp_file_conversion(h5_file, output_dir):
+    """The previous flow: GeoTIFF to disk, reread into a COG-layout GTiff, delete."""
+    with h5py.File(h5_file, 'r') as h5f:
+        grid = grid_from_file(h5f)
+        for key in BANDS:
+            data = np.squeeze(h5f[key][:]) * 1.0 + 0.0
+            temp_tif = f"{output_dir}/{key}_temp.tif"
+            with rasterio.open(temp_tif, 'w', driver='GTiff', height=data.shape[0],
+                               width=data.shape[1], count=1, dtype=data.dtype,
+                               crs=grid.crs_wkt, transform=grid.transform) as dst:
+                dst.write(data, 1)
+            # gdal.Translate with these creation options is a GTiff CreateCopy
+            rasterio.shutil.copy(temp_tif, f"{output_dir}/{key}_cog.tif", driver='GTiff',
+                                 COMPRESS='LZW', TILED='YES', COPY_SRC_OVERVIEWS='YES',
+                                 BIGTIFF='YES')
+            os.remove(temp_tif)
+
+def direct_conversion(h5_file, output_dir):
+    l1ctocog.extract_and_project_subdatasets(h5_file, output_dir)
+
+def measure(name, convert, h5_file, output_dir):
+    os.makedirs(output_dir)
+    wchar_before, disk_before = io_counters()
+    start = time.perf_counter()
+    convert(h5_file, output_dir)
+    elapsed = time.perf_counter() - start
+    wchar_after, disk_after = io_counters()
+    output_bytes = sum(os.path.getsize(os.path.join(output_dir, n)) for n in os.listdir(output_dir))
+    print(f"{name:>10}: {elapsed:6.2f} s  written {(wchar_after - wchar_before) / 1e6:7.1f} MB "
+          f"(to storage {(disk_after - disk_before) / 1e6:7.1f} MB)  output {output_bytes / 1e6:6.1f} MB")
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as work_dir:
+        h5_file = write_synthetic_l1c(os.path.join(work_dir, "synthetic_L1C.h5"))
+        measure("temp file", temp_file_conversion, h5_file, os.path.join(work_dir, "temp_file"))
+        measure("direct", direct_conversion, h5_file, os.path.join(work_dir, "direct"))
+        for key in BANDS:
+            with rasterio.open(os.path.join(work_dir, "temp_file", f"{key}_cog.tif")) as a, \
+                 rasterio.open(os.path.join(work_dir, "direct", f"{key}_cog.tif")) as b:
+                assert np.array_equal(a.read(), b.read()), f"{key} pixels differ"
+        print("Pixels identical in both outputs")
+
+if __name__ == "__main__":
+    main()
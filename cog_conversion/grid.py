@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import numpy as np
+from pyproj import CRS, Transformer
+from rasterio.transform import Affine, from_bounds
+
+# On-disk cache of derived grids, shared by every script on the host
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'insat_grids')
+
+_grids = {}
+
+def attribute_value(value):
+    """Unwrap an HDF5 attribute into a float, list or str."""
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in 'SO':
+            return attribute_value(value.reshape(-1)[0])
+        values = value.reshape(-1).tolist()
+        return values[0] if len(values) == 1 else values
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class Grid:
+    """CRS, affine transform and size of a product grid."""
+
+    def __init__(self, crs_wkt, transform, width, height):
+        self.crs_wkt = crs_wkt
+        self.transform = transform
+        self.width = width
+        self.height = height
+        self._crs = None
+        self._transformers = {}
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    @property
+    def crs(self):
+        """pyproj CRS of the grid, built on first use."""
+        if self._crs is None:
+            self._crs = CRS.from_wkt(self.crs_wkt)
+        return self._crs
+
+    @property
+    def bounds(self):
+        """(left, bottom, right, top) in grid coordinates."""
+        left, top = self.transform * (0, 0)
+        right, bottom = self.transform * (self.width, self.height)
+        return (left, bottom, right, top)
+
+    def transformer(self, src_crs='EPSG:4326'):
+        """Cached pyproj Transformer from src_crs to the grid CRS (x/y order)."""
+        if src_crs not in self._transformers:
+            self._transformers[src_crs] = Transformer.from_crs(
+                CRS.from_user_input(src_crs), self.crs, always_xy=True
+            )
+        return self._transformers[src_crs]
+
+    def to_dict(self):
+        return {
+            'crs_wkt': self.crs_wkt,
+            'transform': list(self.transform)[:6],
+            'width': self.width,
+            'height': self.height,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['crs_wkt'], Affine(*data['transform']), data['width'], data['height'])
+
+def projection_parameters(attrs):
+    """PROJ parameters for a CF grid_mapping variable's attributes."""
+    name = attrs.get('grid_mapping_name')
+    if name == 'mercator':
+        return {
+            'proj': 'merc',
+            'lon_0': attrs['longitude_of_projection_origin'],
+            'lat_ts': attrs['standard_parallel'],
+            'x_0': attrs.get('false_easting', 0.0),
+            'y_0': attrs.get('false_northing', 0.0),
+            'a': attrs['semi_major_axis'],
+            'b': attrs['semi_minor_axis'],
+            'units': 'm'
+        }
+    if name == 'latitude_longitude':
+        return {'proj': 'longlat', 'datum': 'WGS84'}
+    raise ValueError(f"Unsupported grid_mapping_name: {name!r}")
+
+def grid_signature(attrs, width, height, x_ends, y_ends):
+    """Stable hash of everything that determines a grid."""
+    key = json.dumps({
+        'attrs': attrs,
+        'size': [width, height],
+        'x': x_ends,
+        'y': y_ends,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def derive_grid(attrs, x_ends, y_ends, width, height):
+    """Build a Grid from grid_mapping attributes and the X/Y coordinate ends."""
+    crs = CRS.from_dict(projection_parameters(attrs))
+    transformer = Transformer.from_crs(CRS.from_epsg(4326), crs, always_xy=True)
+
+    upper_left = attrs.get('upper_left_lat_lon(degrees)')
+    lower_right = attrs.get('lower_right_lat_lon(degrees)')
+    if upper_left and lower_right:
+        # Corner coordinates are the outer edges of the sector
+        left, top = transformer.transform(upper_left[1], upper_left[0])
+        right, bottom = transformer.transform(lower_right[1], lower_right[0])
+        transform = from_bounds(left, bottom, right, top, width, height)
+    else:
+        # X/Y hold pixel centres; extend by half a pixel to the edges
+        pixel_width = (x_ends[1] - x_ends[0]) / (width - 1)
+        pixel_height = (y_ends[1] - y_ends[0]) / (height - 1)
+        transform = Affine(pixel_width, 0.0, x_ends[0] - pixel_width / 2,
+                           0.0, pixel_height, y_ends[0] - pixel_height / 2)
+    return Grid(crs.to_wkt(), transform, width, height)
+
+def grid_from_file(h5f, grid_mapping='Projection_Information', cache_dir=DEFAULT_CACHE_DIR):
+    """Grid of an open HDF5 product, cached in-process and on disk by signature."""
+    variable = h5f[grid_mapping]
+    attrs = {
+        name: attribute_value(value)
+        for name, value in variable.attrs.items()
+        if name not in ('DIMENSION_LIST', 'REFERENCE_LIST', 'CLASS')
+    }
+    x, y = h5f['X'], h5f['Y']
+    width, height = x.shape[0], y.shape[0]
+    x_ends = [float(x[0]), float(x[width - 1])]
+    y_ends = [float(y[0]), float(y[height - 1])]
+
+    signature = grid_signature(attrs, width, height, x_ends, y_ends)
+    if signature in _grids:
+        return _grids[signature]
+
+    cache_path = os.path.join(cache_dir, f"{signature}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            grid = Grid.from_dict(json.load(f))
+    else:
+        grid = derive_grid(attrs, x_ends, y_ends, width, height)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(grid.to_dict(), f)
+            os.replace(temp_path, cache_path)
+
+    _grids[signature] = grid
+    return grid
@@ -1,126 +1,187 @@
 import h5py
 import numpy as np
-import rasterio
 from rasterio.transform import from_bounds
-from pyproj import CRS, Transformer
 import logging
 import os
-from osgeo import gdal
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from grid import attribute_value, grid_from_file
+from cog_writer import write_cog, write_scene_cog
+from codec_profiles import CODEC_PROFILES, selected_profile
+from build_cache import BuildCache, build_key, file_identity
+from counts_storage import counts_metadata
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def convert_to_cog(input_tif, output_tif):
-    """Convert a GeoTIFF to Cloud Optimized GeoTIFF with LZW compression"""
-    cog_options = gdal.TranslateOptions(
-        format='GTiff',
-        creationOptions=[
-            'COMPRESS=LZW',
-            'TILED=YES',
-            'COPY_SRC_OVERVIEWS=YES',
-            'BIGTIFF=YES'
-        ]
-    )
-    gdal.Translate(output_tif, input_tif, options=cog_options)
-    os.remove(input_tif)  # Remove original TIFF after conversion
+BASE_IMAGES = ['IMG_MIR', 'IMG_SWIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_VIS', 'IMG_WV']
 
-def extract_and_project_subdatasets(h5_file_path, output_dir):
-    """
-    Extract and project base image subdatasets from HDF5 file using Mercator projection
-    and convert to COG
+def convert_band(h5f, key, output_dir, grid, profile=None, storage='calibrated'):
+    """Calibrate one band and write it as the COG {output_dir}/{key}_cog.tif.
+
+    With storage 'counts' the uint16 counts are kept, with calibration
+    metadata (see counts_storage). Returns the COG path, or None when the
+    band is missing or not 2-D.
     """
-    BASE_IMAGES = ['IMG_MIR', 'IMG_SWIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_VIS', 'IMG_WV']
+    if key not in h5f:
+        logger.warning(f"Skipping {key} - not found in file")
+        return None
+        
+    logger.info(f"Processing {key}")
     
-    proj_params = {
-        'proj': 'merc',
-        'lon_0': 77.25,
-        'lat_ts': 17.75,
-        'x_0': 0,
-        'y_0': 0,
-        'a': 6378137,
-        'b': 6356752.3142,
-        'units': 'm'
-    }
-
-    crs = CRS.from_dict(proj_params)
+    data = h5f[key][:]
+    data = np.squeeze(data)
+    
+    if len(data.shape) != 2:
+        logger.warning(f"Skipping {key} - unexpected shape {data.shape}")
+        return None
+    
+    logger.info(f"Data shape: {data.shape}")
+    
+    if storage != 'counts':
+        scale_factor = h5f[key].attrs.get(f'{key}_lab_radiance_scale_factor', 1.0)
+        add_offset = h5f[key].attrs.get(f'{key}_lab_radiance_add_offset', 0.0)
+        data = data * scale_factor + add_offset
+    
+    final_cog = f"{output_dir}/{key}_cog.tif"
+    
+    if data.shape == grid.shape:
+        transform = grid.transform
+    else:
+        transform = from_bounds(*grid.bounds, data.shape[1], data.shape[0])
     
-    bounds = {
-        'left': 44.5,
-        'right': 110.0,
-        'bottom': -10.0,
-        'top': 45.5
+    tags = {
+        'WAVELENGTH': h5f[key].attrs.get(f'{key}_central_wavelength', ''),
+        'UNITS': h5f[key].attrs.get(f'{key}_RADIANCE_units', '')
     }
+    if storage == 'counts':
+        scale, offset, nodata, count_tags = counts_metadata(h5f, key)
+        write_scene_cog(final_cog, {key: data}, grid.crs_wkt, transform, nodata=nodata,
+                        scales={key: scale}, offsets={key: offset}, band_tags={key: count_tags},
+                        tags=tags, profile=profile)
+    else:
+        write_cog(final_cog, data, grid.crs_wkt, transform, profile=profile, tags=tags)
+    logger.info(f"Successfully written COG: {final_cog}")
+    return final_cog
 
-    transformer = Transformer.from_crs(
-        CRS.from_epsg(4326),
-        crs,
-        always_xy=True
-    )
+def convert_band_job(h5_file_path, key, output_dir, profile=None, storage='calibrated'):
+    """Worker entry point: convert one band with its own file handle."""
+    try:
+        with h5py.File(h5_file_path, 'r') as h5f:
+            return convert_band(h5f, key, output_dir, grid_from_file(h5f), profile, storage)
+    except Exception as e:
+        logger.error(f"Error processing {key}: {str(e)}")
+        return None
 
-    left, bottom = transformer.transform(bounds['left'], bounds['bottom'])
-    right, top = transformer.transform(bounds['right'], bounds['top'])
+def extract_and_project_subdatasets(h5_file_path, output_dir, workers=1, profile=None, force=False,
+                                    digest=False, storage='calibrated'):
+    """
+    Extract and project base image subdatasets from HDF5 file using Mercator projection
+    and convert to COG
 
-    with h5py.File(h5_file_path, 'r') as h5f:
-        for key in BASE_IMAGES:
-            try:
-                if key not in h5f:
-                    logger.warning(f"Skipping {key} - not found in file")
+    With workers above 1 the bands are converted concurrently in separate
+    processes. profile names the codec profile (see codec_profiles) and
+    storage 'counts' keeps uint16 counts with calibration metadata. Bands whose COG was already built from the same input (size and mtime,
+    or content with digest) and profile are skipped unless force.
+    Returns the current COG paths, in BASE_IMAGES order.
+    """
+    cache = BuildCache(output_dir)
+    input_identity = file_identity(h5_file_path, digest)
+    config = {'converter': 'l1ctocog', 'profile': selected_profile(profile, 'COG'),
+              'storage': storage}
+    build_keys = {key: build_key(input_identity, key, config) for key in BASE_IMAGES}
+    outputs = {}
+    pending = []
+    for key in BASE_IMAGES:
+        final_cog = f"{output_dir}/{key}_cog.tif"
+        if not force and cache.is_current(build_keys[key], final_cog):
+            logger.info(f"Skipping {key} - up to date")
+            outputs[key] = final_cog
+        else:
+            cache.invalidate(final_cog)
+            pending.append(key)
+
+    if workers > 1 and pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(convert_band_job, h5_file_path, key, output_dir, profile, storage)
+                for key in pending
+            ]
+            for key, future in zip(pending, futures):
+                try:
+                    final_cog = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {key}: {str(e)}")
                     continue
-                    
-                logger.info(f"Processing {key}")
-                
-                data = h5f[key][:]
-                data = np.squeeze(data)
-                
-                if len(data.shape) != 2:
-                    logger.warning(f"Skipping {key} - unexpected shape {data.shape}")
+                if final_cog:
+                    cache.record(build_keys[key], final_cog)
+                    outputs[key] = final_cog
+    elif pending:
+        with h5py.File(h5_file_path, 'r') as h5f:
+            grid = grid_from_file(h5f)
+            for key in pending:
+                try:
+                    final_cog = convert_band(h5f, key, output_dir, grid, profile, storage)
+                    if final_cog:
+                        cache.record(build_keys[key], final_cog)
+                        outputs[key] = final_cog
+                except Exception as e:
+                    logger.error(f"Error processing {key}: {str(e)}")
                     continue
-                
-                logger.info(f"Data shape: {data.shape}")
-                
-                scale_factor = h5f[key].attrs.get(f'{key}_lab_radiance_scale_factor', 1.0)
-                add_offset = h5f[key].attrs.get(f'{key}_lab_radiance_add_offset', 0.0)
-                
-                data = data * scale_factor + add_offset
-                
-                temp_tif = f"{output_dir}/{key}_temp.tif"
-                final_cog = f"{output_dir}/{key}_cog.tif"
-                
-                transform = from_bounds(
-                    left, bottom, right, top,
-                    data.shape[1], data.shape[0]
-                )
-                
-                with rasterio.open(
-                    temp_tif,
-                    'w',
-                    driver='GTiff',
-                    height=data.shape[0],
-                    width=data.shape[1],
-                    count=1,
-                    dtype=data.dtype,
-                    crs=crs.to_wkt(),
-                    transform=transform,
-                ) as dst:
-                    dst.write(data, 1)
-                    dst.update_tags(**{
-                        'WAVELENGTH': h5f[key].attrs.get(f'{key}_central_wavelength', ''),
-                        'UNITS': h5f[key].attrs.get(f'{key}_RADIANCE_units', '')
-                    })
-                
-                # Convert to COG
-                convert_to_cog(temp_tif, final_cog)
-                logger.info(f"Successfully written COG: {final_cog}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {key}: {str(e)}")
+    return [outputs[key] for key in BASE_IMAGES if key in outputs]
+
+def write_scene(h5_file_path, output_path, keys=None, profile=None):
+    """Write the raw counts of every base image band into one multi-band scene COG.
+
+    Bands keep their names as descriptions and carry the lab radiance
+    scale/offset and lookup tables (see counts_storage), so a single tile
+    read serves any band-math expression.
+    """
+    keys = keys or BASE_IMAGES
+    with h5py.File(h5_file_path, 'r') as h5f:
+        grid = grid_from_file(h5f)
+        bands, scales, offsets, band_tags = {}, {}, {}, {}
+        nodata = None
+        for key in keys:
+            if key not in h5f:
+                logger.warning(f"Skipping {key} - not found in file")
                 continue
+            attrs = h5f[key].attrs
+            bands[key] = np.squeeze(h5f[key][:])
+            scales[key], offsets[key], band_nodata, band_tags[key] = counts_metadata(h5f, key)
+            band_tags[key]['WAVELENGTH'] = attribute_value(attrs.get('central_wavelength', ''))
+            if nodata is None:
+                nodata = band_nodata
+
+    shape = next(iter(bands.values())).shape
+    transform = grid.transform if shape == grid.shape else from_bounds(*grid.bounds, shape[1], shape[0])
+    write_scene_cog(output_path, bands, grid.crs_wkt, transform, nodata=nodata,
+                    scales=scales, offsets=offsets, band_tags=band_tags, profile=profile)
+    logger.info(f"Successfully written scene COG: {output_path}")
+    return output_path
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert L1C image bands to COG")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of bands converted concurrently")
+    parser.add_argument('--codec-profile', choices=sorted(CODEC_PROFILES),
+                        help="compression profile (default: legacy LZW)")
+    parser.add_argument('--storage', default='calibrated', choices=['calibrated', 'counts'],
+                        help="write calibrated floats, or uint16 counts with calibration metadata")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild bands even if their COGs are up to date")
+    parser.add_argument('--scene-cog', action='store_true',
+                        help="also write every band into one multi-band scene COG")
+    args = parser.parse_args()
+
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
     output_dir = "projected_data"
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
-    extract_and_project_subdatasets(h5_file, output_dir)
\ No newline at end of file
+    extract_and_project_subdatasets(h5_file, output_dir, workers=args.workers,
+                                    profile=args.codec_profile, force=args.force,
+                                    storage=args.storage)
+    if args.scene_cog:
+        write_scene(h5_file, f"{output_dir}/scene_cog.tif", profile=args.codec_profile)
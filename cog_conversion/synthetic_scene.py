@@ -0,0 +1,63 @@
+import h5py
+import numpy as np
+
+# Layout of an INSAT-3DR L1C ASIA_MER scene (see metadata.json)
+BANDS = ['IMG_MIR', 'IMG_SWIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_VIS', 'IMG_WV']
+THERMAL_BANDS = ['IMG_MIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_WV']
+HEIGHT, WIDTH = 1616, 1737
+FILL_VALUE = 1023
+
+PROJECTION_ATTRIBUTES = {
+    'false_easting': 0.0,
+    'false_northing': 0.0,
+    'longitude_of_projection_origin': 77.25,
+    'semi_major_axis': 6378137.0,
+    'semi_minor_axis': 6356752.3142,
+    'standard_parallel': 17.75,
+    'upper_left_lat_lon(degrees)': [45.5, 44.5],
+    'lower_right_lat_lon(degrees)': [-10.0, 110.0],
+    'upper_left_xy(meters)': [-3473242.733735, 5401854.420193],
+}
+
+def write_synthetic_l1c(path, height=HEIGHT, width=WIDTH, seed=0):
+    """Write an L1C-shaped HDF5 file with random counts, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, 'w') as f:
+        f.attrs['left_longitude'] = 44.5
+        f.attrs['right_longitude'] = 110.0
+        f.attrs['lower_latitude'] = -10.0
+        f.attrs['upper_latitude'] = 45.5
+        f.attrs['Processing_Level'] = np.bytes_('L1C')
+
+        f['GreyCount'] = np.arange(1024, dtype=np.int32)
+        for band in BANDS:
+            counts = rng.integers(0, FILL_VALUE + 1, size=(1, height, width), dtype=np.uint16)
+            dataset = f.create_dataset(band, data=counts, chunks=(1, min(height, 256), width))
+            dataset.attrs['_FillValue'] = np.array([FILL_VALUE], dtype=np.uint16)
+            dataset.attrs['lab_radiance_scale_factor'] = np.array([0.0017001], dtype=np.float32)
+            dataset.attrs['lab_radiance_add_offset'] = np.array([-0.0148718], dtype=np.float32)
+            dataset.attrs['lab_radiance_quad'] = np.array([-4.23297e-07], dtype=np.float32)
+            dataset.attrs['lab_radiance_scale_factor_gsics'] = np.array([0.0025428], dtype=np.float32)
+            dataset.attrs['lab_radiance_add_offset_gsics'] = np.array([-0.2082410], dtype=np.float32)
+            dataset.attrs['lab_radiance_quad_gsics'] = np.array([-6.33107e-07], dtype=np.float32)
+            dataset.attrs['central_wavelength'] = np.array([10.785], dtype=np.float32)
+            dataset.attrs['grid_mapping'] = np.bytes_('Projection_Information')
+
+            f[f'{band}_RADIANCE'] = np.linspace(0.0, 2.0, 1024, dtype=np.float32)
+            if band in THERMAL_BANDS:
+                temperature = np.linspace(330.0, 180.0, 1024, dtype=np.float32)
+                temperature[FILL_VALUE] = 999.0
+                f[f'{band}_TEMP'] = temperature
+                f[f'{band}_TEMP'].attrs['_FillValue'] = np.array([999.0], dtype=np.float32)
+        f['IMG_VIS_ALBEDO'] = np.linspace(0.0, 100.0, 1024, dtype=np.float32)
+
+        projection = f.create_dataset('Projection_Information', data=np.array([0], dtype=np.int32))
+        projection.attrs['grid_mapping_name'] = np.bytes_('mercator')
+        for name, value in PROJECTION_ATTRIBUTES.items():
+            projection.attrs[name] = np.atleast_1d(np.array(value, dtype=np.float64))
+
+        left_x, top_y = PROJECTION_ATTRIBUTES['upper_left_xy(meters)']
+        pixel_size = -2 * left_x / width
+        f['X'] = left_x + pixel_size * (np.arange(width) + 0.5)
+        f['Y'] = top_y - pixel_size * (np.arange(height) + 0.5)
+    return path
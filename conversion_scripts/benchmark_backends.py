@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from h5_backends import available_backends, open_backend
+from synthetic_scene import BANDS, write_synthetic_l1c
+
+REPEATS = 3
+
+def read_scene(h5_file, backend):
+    """Read every band of the scene once; returns bytes read."""
+    total = 0
+    f = open_backend(h5_file, backend)
+    try:
+        for band in BANDS:
+            total += f[band][:].nbytes
+    finally:
+        f.close()
+    return total
+
+def measure(h5_file, backend, results):
+    """Run in a fresh process so peak RSS belongs to this backend alone."""
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        nbytes = read_scene(h5_file, backend)
+        best = min(best, time.perf_counter() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((backend, nbytes, best, (peak_kb - baseline_kb) / 1024))
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        h5_file = write_synthetic_l1c(os.path.join(work_dir, "synthetic_L1C.h5"))
+        results = multiprocessing.Queue()
+        print(f"Reading {len(BANDS)} bands, best of {REPEATS} runs")
+        for backend in available_backends():
+            process = multiprocessing.Process(target=measure, args=(h5_file, backend, results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{backend:>8}: failed (exit code {process.exitcode})")
+                continue
+            name, nbytes, elapsed, peak_mb = results.get()
+            throughput = nbytes / elapsed / (1024 * 1024)
+            print(f"{name:>8}: {elapsed * 1000:8.1f} ms  {throughput:8.1f} MB/s  "
+                  f"peak RSS growth {peak_mb:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
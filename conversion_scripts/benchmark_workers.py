@@ -0,0 +1,34 @@
+import logging
+import os
+import tempfile
+import time
+import l1c
+from synthetic_scene import write_synthetic_l1c
+
+WORKER_COUNTS = [1, 2, 3, 6]
+
+def time_conversion(h5_file, output_dir, workers):
+    """Wall-clock seconds for one full L1C conversion."""
+    start = time.perf_counter()
+    written = l1c.extract_and_project_subdatasets(
+        h5_file, output_dir, block_rows=l1c.DEFAULT_BLOCK_ROWS, workers=workers
+    )
+    elapsed = time.perf_counter() - start
+    assert len(written) == 6, f"expected 6 bands, got {len(written)}"
+    return elapsed
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as work_dir:
+        h5_file = write_synthetic_l1c(os.path.join(work_dir, "synthetic_L1C.h5"))
+        print(f"Converting 6 bands on {os.cpu_count()} CPUs")
+        serial = None
+        for workers in WORKER_COUNTS:
+            output_dir = os.path.join(work_dir, f"workers_{workers}")
+            os.makedirs(output_dir)
+            elapsed = time_conversion(h5_file, output_dir, workers)
+            serial = serial or elapsed
+            print(f"workers={workers}: {elapsed:6.2f} s  ({serial / elapsed:4.2f}x vs serial)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Count value INSAT-3DR L1C bands use for missing pixels (_FillValue)
+DEFAULT_FILL_VALUE = 1023
+
+# Number of entries in the IMG_*_TEMP / _RADIANCE / _ALBEDO tables (10-bit counts)
+LUT_SIZE = 1024
+
+# Elements per chunk; small enough that counts and output of a chunk stay in
+# cache while the scale, offset and fill mask are applied to it.
+CHUNK_SIZE = 1 << 16
+
+KELVIN_OFFSET = np.float32(273.15)
+
+def calibrate(counts, scale_factor, offset, fill_value=DEFAULT_FILL_VALUE, out=None):
+    """Convert counts to float32 radiance, writing NaN where counts equal fill_value."""
+    if out is None:
+        out = np.empty(counts.shape, dtype=np.float32)
+    elif not out.flags.c_contiguous:
+        raise ValueError("out must be a C-contiguous array")
+    scale_factor = np.float32(scale_factor)
+    offset = np.float32(offset)
+
+    flat_counts = counts.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat_counts.size, CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        chunk = flat_counts[start:stop]
+        chunk_out = flat_out[start:stop]
+        np.multiply(chunk, scale_factor, out=chunk_out, dtype=np.float32)
+        np.add(chunk_out, offset, out=chunk_out)
+        if fill_value is not None:
+            np.copyto(chunk_out, np.float32(np.nan), where=(chunk == fill_value))
+    return out
+
+def to_celsius(kelvin, out=None):
+    """Convert a Kelvin array to Celsius in float32."""
+    return np.subtract(kelvin, KELVIN_OFFSET, out=out, dtype=np.float32)
+
+def prepare_lut(table, table_fill_value=None, grey_count=None, count_fill_value=DEFAULT_FILL_VALUE):
+    """Float32 lookup table indexed by count, with fill entries set to NaN."""
+    table = np.asarray(table, dtype=np.float32).reshape(-1)
+    if grey_count is None:
+        lut = table.copy()
+    else:
+        # Tables are indexed by the GreyCount dimension, which need not start at 0
+        grey_count = np.asarray(grey_count).reshape(-1)
+        lut = np.full(int(grey_count.max()) + 1, np.nan, dtype=np.float32)
+        lut[grey_count] = table
+    if table_fill_value is not None:
+        lut[lut == np.float32(table_fill_value)] = np.nan
+    if count_fill_value is not None and 0 <= count_fill_value < lut.size:
+        lut[count_fill_value] = np.nan
+    return lut
+
+def build_lut(scale_factor, offset, quad=0.0, size=LUT_SIZE, count_fill_value=DEFAULT_FILL_VALUE):
+    """Radiance lookup table quad*c**2 + scale_factor*c + offset for every count c."""
+    counts = np.arange(size, dtype=np.float64)
+    table = (quad * counts + scale_factor) * counts + offset
+    return prepare_lut(table, count_fill_value=count_fill_value)
+
+def lut_calibrate(counts, lut, out=None):
+    """Convert counts to physical values with a gather through lut."""
+    if out is None:
+        out = np.empty(counts.shape, dtype=lut.dtype)
+    elif not out.flags.c_contiguous:
+        raise ValueError("out must be a C-contiguous array")
+
+    # np.take converts the indices to intp, so gather chunk by chunk to keep
+    # that temporary small. Out-of-range counts clip to the last entry, which
+    # is the NaN fill entry.
+    flat_counts = counts.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat_counts.size, CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        np.take(lut, flat_counts[start:stop], out=flat_out[start:stop], mode='clip')
+    return out
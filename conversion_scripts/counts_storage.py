@@ -0,0 +1,120 @@
+import numpy as np
+import rasterio
+from grid import attribute_value
+
+# Count-domain storage: bands keep their uint16 counts, and everything needed
+# to calibrate them travels as GeoTIFF metadata: scale/offset for radiance,
+# nodata for the _FillValue and the product's lookup tables as band tags.
+
+# Lookup tables shipped per band, as {band}_{quantity} datasets
+LUT_QUANTITIES = ['RADIANCE', 'TEMP', 'ALBEDO']
+
+def band_lookup_tables(h5f, key):
+    """{quantity: float32 table indexed by count} for the band's lookup tables.
+
+    Entries equal to the table's _FillValue become NaN.
+    """
+    grey_count = h5f['GreyCount'][:] if 'GreyCount' in h5f else None
+    tables = {}
+    for quantity in LUT_QUANTITIES:
+        name = f'{key}_{quantity}'
+        if name not in h5f:
+            continue
+        values = np.asarray(h5f[name][:], dtype=np.float32)
+        fill_value = h5f[name].attrs.get('_FillValue')
+        if fill_value is not None:
+            values = np.where(values == np.float32(attribute_value(fill_value)), np.nan, values)
+        if grey_count is not None:
+            table = np.full(int(grey_count.max()) + 1, np.nan, dtype=np.float32)
+            table[grey_count] = values
+            values = table
+        tables[quantity] = values
+    return tables
+
+def encode_lut(table):
+    """Lookup table as a space-separated metadata string (9 digits round-trip float32)."""
+    return ' '.join(f'{value:.9g}' for value in table.tolist())
+
+def decode_lut(text):
+    return np.array(text.split(), dtype=np.float32)
+
+def counts_metadata(h5f, key):
+    """(scale, offset, nodata, band tags) for storing band key as counts."""
+    attrs = h5f[key].attrs
+    scale = attribute_value(attrs.get('lab_radiance_scale_factor', 1.0))
+    offset = attribute_value(attrs.get('lab_radiance_add_offset', 0.0))
+    nodata = attribute_value(attrs['_FillValue']) if '_FillValue' in attrs else None
+    tags = {'CALIBRATION': 'counts'}
+    if 'radiance_units' in attrs:
+        tags['RADIANCE_UNITS'] = attribute_value(attrs['radiance_units'])
+    for quantity, table in band_lookup_tables(h5f, key).items():
+        tags[f'LUT_{quantity}'] = encode_lut(table)
+        units = h5f[f'{key}_{quantity}'].attrs.get('units')
+        if units is not None:
+            tags[f'LUT_{quantity}_UNITS'] = attribute_value(units)
+    return scale, offset, nodata, tags
+
+def apply_counts_metadata(dst, scale, offset, tags, band_index=1):
+    """Attach scale/offset and the calibration tags to a band of an open writer."""
+    scales = list(dst.scales)
+    offsets = list(dst.offsets)
+    scales[band_index - 1] = scale
+    offsets[band_index - 1] = offset
+    dst.scales = scales
+    dst.offsets = offsets
+    dst.update_tags(band_index, **tags)
+
+class CountsReader:
+    """Read a count-domain GeoTIFF and calibrate pixels only when they are asked for."""
+
+    def __init__(self, path, band_index=1):
+        self.path = path
+        self.band_index = band_index
+        self._src = rasterio.open(path)
+        self._tags = self._src.tags(band_index)
+        self._luts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._src.close()
+
+    @property
+    def quantities(self):
+        """Lookup table quantities stored with the band, e.g. ['RADIANCE', 'TEMP']."""
+        return [name[4:] for name in self._tags if name.startswith('LUT_') and not name.endswith('_UNITS')]
+
+    def counts(self, window=None):
+        return self._src.read(self.band_index, window=window)
+
+    def _nodata_mask(self, counts):
+        nodata = self._src.nodata
+        return counts == nodata if nodata is not None else np.zeros(counts.shape, dtype=bool)
+
+    def radiance(self, window=None):
+        """counts * scale + offset as float32, NaN at nodata."""
+        counts = self.counts(window)
+        scale = np.float32(self._src.scales[self.band_index - 1])
+        offset = np.float32(self._src.offsets[self.band_index - 1])
+        radiance = counts.astype(np.float32)
+        radiance *= scale
+        radiance += offset
+        radiance[self._nodata_mask(counts)] = np.nan
+        return radiance
+
+    def lut(self, quantity):
+        if quantity not in self._luts:
+            self._luts[quantity] = decode_lut(self._tags[f'LUT_{quantity}'])
+        return self._luts[quantity]
+
+    def lookup(self, quantity, window=None):
+        """Calibrate through the stored lookup table, e.g. quantity 'TEMP'; NaN at nodata."""
+        counts = self.counts(window)
+        table = self.lut(quantity)
+        values = np.take(table, counts, mode='clip')
+        values[self._nodata_mask(counts)] = np.nan
+        return values
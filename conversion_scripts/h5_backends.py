@@ -0,0 +1,147 @@
+import numpy as np
+
+# Interchangeable readers for the HDF5 products. Every backend offers the part
+# of the h5py.File interface the scripts use: `name in f`, `f[name]` giving a
+# variable with shape, dtype, attrs and numpy-style slicing, `f.attrs`, keys()
+# and close(). Values come back exactly as stored, without masking or scaling.
+
+# Tried in this order when backend='auto'
+BACKEND_PREFERENCE = ['h5py', 'netcdf4', 'gdal']
+
+def _normalize_selection(selection, shape):
+    """Expand a numpy-style selection into one int or step-1 slice per axis."""
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    if any(item is Ellipsis for item in selection):
+        index = selection.index(Ellipsis)
+        fill = (slice(None),) * (len(shape) - len(selection) + 1)
+        selection = selection[:index] + fill + selection[index + 1:]
+    selection = selection + (slice(None),) * (len(shape) - len(selection))
+
+    normalized = []
+    for item, size in zip(selection, shape):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(size)
+            if step != 1:
+                raise ValueError("Only step-1 slices are supported")
+            normalized.append(slice(start, max(start, stop)))
+        else:
+            index = int(item)
+            normalized.append(index + size if index < 0 else index)
+    return normalized
+
+class NetCDF4Variable:
+    """netCDF4 variable read without auto masking or scaling."""
+
+    def __init__(self, variable):
+        variable.set_auto_maskandscale(False)
+        self._variable = variable
+        self.shape = variable.shape
+        self.dtype = variable.dtype
+        self.attrs = {name: variable.getncattr(name) for name in variable.ncattrs()}
+
+    def __getitem__(self, selection):
+        return np.asarray(self._variable[selection])
+
+class NetCDF4File:
+    """netCDF4-python reader."""
+    name = 'netcdf4'
+
+    def __init__(self, path):
+        import netCDF4
+        self._dataset = netCDF4.Dataset(path, 'r')
+        self.attrs = {name: self._dataset.getncattr(name) for name in self._dataset.ncattrs()}
+
+    def __contains__(self, name):
+        return name in self._dataset.variables
+
+    def __getitem__(self, name):
+        return NetCDF4Variable(self._dataset.variables[name])
+
+    def keys(self):
+        return list(self._dataset.variables)
+
+    def close(self):
+        self._dataset.close()
+
+class GdalVariable:
+    """Array read through GDAL's multidimensional HDF5 API."""
+
+    def __init__(self, md_array):
+        from osgeo import gdal_array
+        self._array = md_array
+        self.shape = tuple(dim.GetSize() for dim in md_array.GetDimensions())
+        self.dtype = np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(
+            md_array.GetDataType().GetNumericDataType()
+        ))
+        self.attrs = {attr.GetName(): attr.Read() for attr in md_array.GetAttributes()}
+
+    def __getitem__(self, selection):
+        normalized = _normalize_selection(selection, self.shape)
+        start = [item.start if isinstance(item, slice) else item for item in normalized]
+        count = [item.stop - item.start if isinstance(item, slice) else 1 for item in normalized]
+        data = self._array.ReadAsArray(array_start_idx=start, count=count)
+        # Integer indices drop their axis, as in numpy
+        squeeze_axes = tuple(axis for axis, item in enumerate(normalized) if not isinstance(item, slice))
+        return np.squeeze(data, axis=squeeze_axes) if squeeze_axes else data
+
+class GdalFile:
+    """GDAL HDF5 driver reader (multidimensional API, GDAL >= 3.1)."""
+    name = 'gdal'
+
+    def __init__(self, path):
+        from osgeo import gdal
+        self._dataset = gdal.OpenEx(path, gdal.OF_MULTIDIM_RASTER)
+        if self._dataset is None:
+            raise OSError(f"GDAL could not open {path}")
+        self._root = self._dataset.GetRootGroup()
+        self._names = set(self._root.GetMDArrayNames() or [])
+        self.attrs = {attr.GetName(): attr.Read() for attr in self._root.GetAttributes()}
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return GdalVariable(self._root.OpenMDArray(name))
+
+    def keys(self):
+        return sorted(self._names)
+
+    def close(self):
+        self._root = None
+        self._dataset = None
+
+def open_h5py(path):
+    import h5py
+    return h5py.File(path, 'r')
+
+BACKENDS = {
+    'h5py': open_h5py,
+    'netcdf4': NetCDF4File,
+    'gdal': GdalFile,
+}
+
+def available_backends():
+    """Names of the backends whose libraries import in this environment."""
+    modules = {'h5py': 'h5py', 'netcdf4': 'netCDF4', 'gdal': 'osgeo.gdal'}
+    available = []
+    for name in BACKEND_PREFERENCE:
+        try:
+            __import__(modules[name])
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+def open_backend(path, backend='auto'):
+    """Open an HDF5 product with the named backend, or the first available one."""
+    if backend == 'auto':
+        available = available_backends()
+        if not available:
+            raise ImportError("None of h5py, netCDF4 or GDAL is installed")
+        backend = available[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](path)
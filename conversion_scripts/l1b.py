@@ -1,56 +1,170 @@
 from osgeo import gdal
 import os
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pyproj import CRS
+from rasterio.transform import from_bounds
+from scene_reader import SceneReader
+from grid import Grid
+from remap import DEFAULT_CACHE_DIR as REMAP_CACHE_DIR, remap_plan, target_grid
+from cog_writer import write_cog
+from codec_profiles import CODEC_PROFILES, gdal_options
 
-def convert_to_cog(input_tif, output_tif):
-    """Convert a GeoTIFF to Cloud Optimized GeoTIFF with LZW compression"""
+# Geostationary view of the L1B full disk and its extent [ulx, uly, lrx, lry]
+GEOS_SRS = '+proj=geos +h=35782063 +a=6378137.0 +b=6356752.3142 +lon_0=74.16 +no_defs'
+GEOS_BOUNDS = [-5632000, 5610000, 5632000, -5610000]
+
+# Output region in EPSG:4326, [West, South, East, North]
+REGION_BOUNDS = [45.5991, -10.1249, 105.8995, 44.4621]
+
+# Working buffer for gdal.Warp in MB; larger buffers mean fewer, bigger chunks
+DEFAULT_WARP_MEMORY_MB = 512
+
+def cog_creation_options(overview_resampling='AVERAGE', overview_count=None, block_size=512,
+                         profile=None):
+    """COG creation options: codec profile, block_size tiles and overviews."""
+    creation_options = gdal_options(profile, driver='COG') + [
+        'BIGTIFF=YES',
+        f'BLOCKSIZE={block_size}',
+        'OVERVIEWS=AUTO',
+        f'OVERVIEW_RESAMPLING={overview_resampling}',
+        'NUM_THREADS=ALL_CPUS'
+    ]
+    if overview_count is not None:
+        creation_options.append(f'OVERVIEW_COUNT={overview_count}')
+    return creation_options
+
+def convert_to_cog(input_tif, output_tif, overview_resampling='AVERAGE', overview_count=None,
+                   profile=None):
+    """Convert a GeoTIFF to Cloud Optimized GeoTIFF (LZW unless profile says otherwise)
+
+    The COG driver builds the overview pyramid (halving until it fits in one
+    512 block, or overview_count levels) with overview_resampling, on all CPUs.
+    """
     cog_options = gdal.TranslateOptions(
-        format='GTiff',
-        creationOptions=[
-            'COMPRESS=LZW',
-            'TILED=YES',
-            'COPY_SRC_OVERVIEWS=YES',
-            'BIGTIFF=YES'
-        ]
+        format='COG',
+        creationOptions=cog_creation_options(overview_resampling, overview_count, profile=profile)
     )
     gdal.Translate(output_tif, input_tif, options=cog_options)
 
-def process_satellite_subdataset(input_h5_file, subdataset, output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+def process_satellite_subdataset(input_h5_file, subdataset, output_dir, warp_threads='ALL_CPUS',
+                                 warp_memory_mb=DEFAULT_WARP_MEMORY_MB, block_size=512, profile=None):
+    """Warp one L1B subdataset from the geos view straight into {subdataset}_region_cog.tif.
+
+    The georeferencing VRT lives in /vsimem and gdal.Warp builds the COG
+    itself with warp_threads threads and a warp_memory_mb working buffer,
+    so no intermediate file is managed by this script.
+    """
+    os.makedirs(output_dir, exist_ok=True)
         
-    vrt_path = os.path.join(output_dir, f'{subdataset}_geos.vrt')
-    temp_tif = os.path.join(output_dir, f'{subdataset}_temp.tif')
+    # Unique per thread, as several bands may be warped at once
+    vrt_path = f'/vsimem/l1b_{os.getpid()}_{threading.get_ident()}/{subdataset}_geos.vrt'
     final_tif = os.path.join(output_dir, f'{subdataset}_region_cog.tif')
     
-    geos_srs = '+proj=geos +h=35782063 +a=6378137.0 +b=6356752.3142 +lon_0=74.16 +no_defs'
-    
     translate_options = gdal.TranslateOptions(
         format='VRT',
-        outputSRS=geos_srs,
-        outputBounds=[-5632000, 5610000, 5632000, -5610000]
+        outputSRS=GEOS_SRS,
+        outputBounds=GEOS_BOUNDS
     )
     
     input_path = f'HDF5:"{input_h5_file}"://{subdataset}'
     gdal.Translate(vrt_path, input_path, options=translate_options)
     
-    # Updated bounding box coordinates
-    warp_options = gdal.WarpOptions(
-        dstSRS='EPSG:4326',
-        outputBounds=[45.5991, -10.1249, 105.8995, 44.4621],  # [West, South, East, North]
-        resampleAlg='bilinear',
-        srcNodata=0,
-        dstNodata=0
-    )
-    
-    gdal.Warp(temp_tif, vrt_path, options=warp_options)
-    convert_to_cog(temp_tif, final_tif)
-    
-    # Cleanup temporary files
-    for file in [vrt_path, temp_tif]:
-        if os.path.exists(file):
-            os.remove(file)
+    try:
+        warp_options = gdal.WarpOptions(
+            format='COG',
+            dstSRS='EPSG:4326',
+            outputBounds=REGION_BOUNDS,
+            resampleAlg='bilinear',
+            srcNodata=0,
+            dstNodata=0,
+            multithread=True,
+            warpMemoryLimit=warp_memory_mb,
+            warpOptions=[f'NUM_THREADS={warp_threads}'],
+            creationOptions=cog_creation_options(block_size=block_size, profile=profile)
+        )
+        
+        gdal.Warp(final_tif, vrt_path, options=warp_options)
+    finally:
+        gdal.Unlink(vrt_path)
+
+def geos_grid(width, height):
+    """Grid of an L1B full-disk band of the given size."""
+    ulx, uly, lrx, lry = GEOS_BOUNDS
+    return Grid(CRS.from_proj4(GEOS_SRS).to_wkt(),
+                from_bounds(ulx, lry, lrx, uly, width, height), width, height)
+
+def remap_satellite_subdatasets(input_h5_file, subdatasets, output_dir, method='bilinear',
+                                cache_dir=REMAP_CACHE_DIR, profile=None):
+    """Reproject subdatasets to REGION_BOUNDS COGs through a cached remap plan.
+
+    The index/weight plan for the geos grid is built once (and reused from
+    cache_dir by later scenes), so each band costs one gather instead of a
+    full gdal.Warp. Returns the names of the subdatasets written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    completed = []
+    with SceneReader(input_h5_file) as scene:
+        for subdataset in subdatasets:
+            try:
+                print(f"Processing {subdataset}...")
+                counts = scene.raw(subdataset)
+                src_grid = geos_grid(counts.shape[1], counts.shape[0])
+                dst_grid = target_grid(src_grid, 'EPSG:4326', REGION_BOUNDS)
+                plan = remap_plan(src_grid, dst_grid, method, cache_dir)
+                final_tif = os.path.join(output_dir, f'{subdataset}_region_cog.tif')
+                write_cog(final_tif, plan.apply(counts, src_nodata=0, dst_nodata=0),
+                          dst_grid.crs_wkt, dst_grid.transform, nodata=0, profile=profile)
+                completed.append(subdataset)
+                print(f"Completed processing {subdataset}")
+            except Exception as e:
+                print(f"An error occurred processing {subdataset}: {str(e)}")
+    return completed
+
+def process_satellite_subdatasets(input_h5_file, subdatasets, output_dir, workers=1,
+                                  warp_threads='ALL_CPUS', warp_memory_mb=DEFAULT_WARP_MEMORY_MB,
+                                  profile=None):
+    """Warp every subdataset to a COG, running up to `workers` bands at once.
+
+    GDAL releases the GIL while translating and warping, so bands run in
+    threads; each warp also uses warp_threads threads of its own. A failing
+    band is reported and does not stop the others. Returns the names of the
+    subdatasets that completed, in input order.
+    """
+    def run(subdataset):
+        print(f"Processing {subdataset}...")
+        process_satellite_subdataset(input_h5_file, subdataset, output_dir,
+                                     warp_threads, warp_memory_mb, profile=profile)
+        print(f"Completed processing {subdataset}")
+        return subdataset
+
+    completed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run, subdataset) for subdataset in subdatasets]
+        for subdataset, future in zip(subdatasets, futures):
+            try:
+                completed.append(future.result())
+            except Exception as e:
+                print(f"An error occurred processing {subdataset}: {str(e)}")
+    return completed
 
 def main():
+    parser = argparse.ArgumentParser(description="Warp L1B image bands to COG")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of bands processed concurrently")
+    parser.add_argument('--warp-threads', default='ALL_CPUS',
+                        help="threads per warp (a number or ALL_CPUS)")
+    parser.add_argument('--warp-memory', type=int, default=DEFAULT_WARP_MEMORY_MB,
+                        help="warp working buffer in MB")
+    parser.add_argument('--engine', default='gdal', choices=['gdal', 'remap'],
+                        help="gdal.Warp per band, or a cached remap plan shared by all bands")
+    parser.add_argument('--resampling', default='bilinear', choices=['bilinear', 'nearest'],
+                        help="resampling for the remap engine")
+    parser.add_argument('--codec-profile', choices=sorted(CODEC_PROFILES),
+                        help="compression profile (default: legacy LZW)")
+    args = parser.parse_args()
+
     input_file = '3RIMG_04SEP2024_1015_L1B_STD_V01R00.h5'
     output_base_dir = 'region_outputs'
     
@@ -59,16 +173,19 @@ def main():
         'IMG_TIR2', 'IMG_VIS', 'IMG_WV'
     ]
     
-    try:
-        for subdataset in image_subdatasets:
-            print(f"Processing {subdataset}...")
-            process_satellite_subdataset(input_file, subdataset, output_base_dir)
-            print(f"Completed processing {subdataset}")
-            
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+    if args.engine == 'remap':
+        completed = remap_satellite_subdatasets(
+            input_file, image_subdatasets, output_base_dir, method=args.resampling,
+            profile=args.codec_profile
+        )
     else:
+        completed = process_satellite_subdatasets(
+            input_file, image_subdatasets, output_base_dir, workers=args.workers,
+            warp_threads=args.warp_threads, warp_memory_mb=args.warp_memory,
+            profile=args.codec_profile
+        )
+    if len(completed) == len(image_subdatasets):
         print("All processing completed successfully!")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,102 +1,241 @@
-import h5py
 import numpy as np
 import rasterio
 from rasterio.transform import from_bounds
-from pyproj import CRS, Transformer
+from rasterio.windows import Window
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from scene_reader import SceneReader
+from codec_profiles import CODEC_PROFILES, codec_options, selected_profile
+from build_cache import BuildCache, build_key, file_identity
+from counts_storage import apply_counts_metadata, counts_metadata
+from raster_stats import STATS_MODES, remove_stats_sidecars, streaming_stats, write_stats_sidecars
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_and_project_subdatasets(h5_file_path, output_dir):
+# Rows per hyperslab when streaming a band; peak memory is roughly
+# block_rows * width * 8 bytes per band instead of the whole scene.
+DEFAULT_BLOCK_ROWS = 256
+
+def squeezed_shape(dataset):
+    """Shape of an HDF5 dataset with singleton dimensions dropped."""
+    return tuple(n for n in dataset.shape if n != 1)
+
+def read_rows(dataset, row_start, row_stop):
+    """Read rows [row_start, row_stop) of a squeezed 2-D band as one hyperslab."""
+    selection = []
+    rows_selected = False
+    for n in dataset.shape:
+        if n == 1:
+            selection.append(0)
+        elif not rows_selected:
+            selection.append(slice(row_start, row_stop))
+            rows_selected = True
+        else:
+            selection.append(slice(None))
+    return dataset[tuple(selection)]
+
+def write_band_streaming(dataset, dst, scale_factor, add_offset, block_rows=DEFAULT_BLOCK_ROWS,
+                         stats=None):
+    """Calibrate a band block by block and write each block into its GeoTIFF window.
+
+    With scale_factor None the blocks are written as stored. Each block is
+    also added to stats (a raster_stats.StreamingStats) when given.
+    """
+    height, width = squeezed_shape(dataset)
+    for row_start in range(0, height, block_rows):
+        row_stop = min(row_start + block_rows, height)
+        block = read_rows(dataset, row_start, row_stop)
+        if scale_factor is not None:
+            block = block * scale_factor + add_offset
+        dst.write(block, 1, window=Window(0, row_start, width, row_stop - row_start))
+        if stats is not None:
+            stats.update(block)
+
+def convert_band(scene, key, output_dir, grid, block_rows=None, profile=None, storage='calibrated',
+                 statistics='exact'):
+    """Calibrate one band and write it as {output_dir}/{key}.tif.
+
+    With storage 'counts' the uint16 counts are written as they are, with
+    the radiance scale/offset, nodata=_FillValue and the band's lookup
+    tables as metadata (see counts_storage.CountsReader).
+    Band statistics ('exact' or 'approx', see raster_stats) are gathered
+    from the pixels as they are written and stored as sidecars, so readers
+    get them without scanning the file.
+    Returns the output path, or None when the band is missing or not 2-D.
+    """
+    if key not in scene:
+        logger.warning(f"Skipping {key} - not found in file")
+        return None
+        
+    logger.info(f"Processing {key}")
+    band = scene.dataset(key)
+    
+    scale_factor = band.attrs.get(f'{key}_lab_radiance_scale_factor', 1.0)
+    add_offset = band.attrs.get(f'{key}_lab_radiance_add_offset', 0.0)
+    nodata = None
+    if storage == 'counts':
+        count_scale, count_offset, nodata, count_tags = counts_metadata(scene.file, key)
+        scale_factor = add_offset = None
+    
+    if block_rows:
+        shape = squeezed_shape(band)
+        if scale_factor is None:
+            dtype = band.dtype
+        else:
+            # Same arithmetic as the whole-band path, so same output dtype
+            dtype = (np.zeros(1, dtype=band.dtype) * scale_factor + add_offset).dtype
+        data = None
+    else:
+        data = scene.raw(key)
+        shape = data.shape
+    
+    if len(shape) != 2:
+        logger.warning(f"Skipping {key} - unexpected shape {shape}")
+        return None
+    
+    logger.info(f"Data shape: {shape}")
+    
+    if data is not None:
+        if scale_factor is not None:
+            data = data * scale_factor + add_offset
+        dtype = data.dtype
+    
+    output_path = f"{output_dir}/{key}.tif"
+    remove_stats_sidecars(output_path)
+    stats = streaming_stats(statistics, nodata)
+    
+    if shape == grid.shape:
+        transform = grid.transform
+    else:
+        transform = from_bounds(*grid.bounds, shape[1], shape[0])
+    
+    with rasterio.open(
+        output_path,
+        'w',
+        driver='GTiff',
+        height=shape[0],
+        width=shape[1],
+        count=1,
+        dtype=dtype,
+        crs=grid.crs_wkt,
+        transform=transform,
+        nodata=nodata,
+        **codec_options(profile, dtype)
+    ) as dst:
+        if data is None:
+            write_band_streaming(band, dst, scale_factor, add_offset, block_rows, stats)
+        else:
+            dst.write(data, 1)
+            if stats is not None:
+                stats.update(data)
+        dst.update_tags(**{
+            'WAVELENGTH': band.attrs.get(f'{key}_central_wavelength', ''),
+            'UNITS': band.attrs.get(f'{key}_RADIANCE_units', '')
+        })
+        if storage == 'counts':
+            apply_counts_metadata(dst, count_scale, count_offset, count_tags)
+    if stats is not None:
+        write_stats_sidecars(output_path, [stats.result()])
+    logger.info(f"Successfully written {output_path}")
+    return output_path
+
+def convert_band_job(h5_file_path, key, output_dir, block_rows=None, backend='h5py', profile=None,
+                     storage='calibrated', statistics='exact'):
+    """Worker entry point: convert one band with its own file handle."""
+    try:
+        with SceneReader(h5_file_path, backend=backend) as scene:
+            return convert_band(scene, key, output_dir, scene.grid, block_rows, profile, storage,
+                                statistics)
+    except Exception as e:
+        logger.error(f"Error processing {key}: {str(e)}")
+        return None
+
+def extract_and_project_subdatasets(h5_file_path, output_dir, block_rows=None, workers=1,
+                                    backend='h5py', profile=None, force=False, digest=False,
+                                    storage='calibrated', statistics='exact'):
     """
     Extract and project base image subdatasets from HDF5 file using Mercator projection
+
+    With block_rows set, each band is read, calibrated and written in row
+    blocks so memory use no longer scales with the scene size. With workers
+    above 1 the bands are converted concurrently in separate processes.
+    backend picks the HDF5 reader ('h5py', 'netcdf4', 'gdal' or 'auto')
+    and profile the codec profile (see codec_profiles). storage 'counts'
+    keeps the uint16 counts with calibration metadata instead of floats.
+    statistics is 'exact', 'approx' or 'none' (see raster_stats).
+
+    Bands whose output was already built from the same input (size and
+    mtime, or content with digest) and profile are skipped unless force.
+    Returns the paths of the current outputs, in BASE_IMAGES order.
     """
     # Base image keys to process
     BASE_IMAGES = ['IMG_MIR', 'IMG_SWIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_VIS', 'IMG_WV']
-    
-    proj_params = {
-        'proj': 'merc',
-        'lon_0': 77.25,
-        'lat_ts': 17.75,
-        'x_0': 0,
-        'y_0': 0,
-        'a': 6378137,
-        'b': 6356752.3142,
-        'units': 'm'
-    }
-
-    crs = CRS.from_dict(proj_params)
-    
-    bounds = {
-        'left': 44.5,
-        'right': 110.0,
-        'bottom': -10.0,
-        'top': 45.5
-    }
-
-    transformer = Transformer.from_crs(
-        CRS.from_epsg(4326),
-        crs,
-        always_xy=True
-    )
-
-    left, bottom = transformer.transform(bounds['left'], bounds['bottom'])
-    right, top = transformer.transform(bounds['right'], bounds['top'])
-
-    with h5py.File(h5_file_path, 'r') as h5f:
-        for key in BASE_IMAGES:
-            try:
-                if key not in h5f:
-                    logger.warning(f"Skipping {key} - not found in file")
+
+    cache = BuildCache(output_dir)
+    input_identity = file_identity(h5_file_path, digest)
+    config = {'converter': 'l1c', 'profile': selected_profile(profile), 'storage': storage,
+              'statistics': statistics}
+    build_keys = {key: build_key(input_identity, key, config) for key in BASE_IMAGES}
+    outputs = {}
+    pending = []
+    for key in BASE_IMAGES:
+        output_path = f"{output_dir}/{key}.tif"
+        if not force and cache.is_current(build_keys[key], output_path):
+            logger.info(f"Skipping {key} - up to date")
+            outputs[key] = output_path
+        else:
+            cache.invalidate(output_path)
+            pending.append(key)
+
+    if workers > 1 and pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(convert_band_job, h5_file_path, key, output_dir, block_rows, backend,
+                                profile, storage, statistics)
+                for key in pending
+            ]
+            for key, future in zip(pending, futures):
+                try:
+                    output_path = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {key}: {str(e)}")
                     continue
-                    
-                logger.info(f"Processing {key}")
-                
-                data = h5f[key][:]
-                data = np.squeeze(data)
-                
-                if len(data.shape) != 2:
-                    logger.warning(f"Skipping {key} - unexpected shape {data.shape}")
+                if output_path:
+                    cache.record(build_keys[key], output_path)
+                    outputs[key] = output_path
+    elif pending:
+        with SceneReader(h5_file_path, backend=backend) as scene:
+            grid = scene.grid
+            for key in pending:
+                try:
+                    output_path = convert_band(scene, key, output_dir, grid, block_rows, profile,
+                                               storage, statistics)
+                    if output_path:
+                        cache.record(build_keys[key], output_path)
+                        outputs[key] = output_path
+                except Exception as e:
+                    logger.error(f"Error processing {key}: {str(e)}")
                     continue
-                
-                logger.info(f"Data shape: {data.shape}")
-                
-                scale_factor = h5f[key].attrs.get(f'{key}_lab_radiance_scale_factor', 1.0)
-                add_offset = h5f[key].attrs.get(f'{key}_lab_radiance_add_offset', 0.0)
-                
-                data = data * scale_factor + add_offset
-                
-                output_path = f"{output_dir}/{key}.tif"
-                
-                transform = from_bounds(
-                    left, bottom, right, top,
-                    data.shape[1], data.shape[0]
-                )
-                
-                with rasterio.open(
-                    output_path,
-                    'w',
-                    driver='GTiff',
-                    height=data.shape[0],
-                    width=data.shape[1],
-                    count=1,
-                    dtype=data.dtype,
-                    crs=crs.to_wkt(),
-                    transform=transform,
-                ) as dst:
-                    dst.write(data, 1)
-                    dst.update_tags(**{
-                        'WAVELENGTH': h5f[key].attrs.get(f'{key}_central_wavelength', ''),
-                        'UNITS': h5f[key].attrs.get(f'{key}_RADIANCE_units', '')
-                    })
-                logger.info(f"Successfully written {output_path}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {key}: {str(e)}")
-                continue
+    return [outputs[key] for key in BASE_IMAGES if key in outputs]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert L1C image bands to GeoTIFF")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of bands converted concurrently")
+    parser.add_argument('--backend', default='h5py', choices=['h5py', 'netcdf4', 'gdal', 'auto'],
+                        help="HDF5 reader backend")
+    parser.add_argument('--codec-profile', choices=sorted(CODEC_PROFILES),
+                        help="compression profile (default: uncompressed)")
+    parser.add_argument('--storage', default='calibrated', choices=['calibrated', 'counts'],
+                        help="write calibrated floats, or uint16 counts with calibration metadata")
+    parser.add_argument('--stats', default='exact', choices=STATS_MODES,
+                        help="band statistics gathered while writing (approx samples 1 pixel in 16)")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild bands even if their outputs are up to date")
+    args = parser.parse_args()
+
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
     output_dir = "projected_data"
     
@@ -104,4 +243,7 @@ if __name__ == "__main__":
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
-    extract_and_project_subdatasets(h5_file, output_dir)
\ No newline at end of file
+    extract_and_project_subdatasets(h5_file, output_dir, block_rows=DEFAULT_BLOCK_ROWS,
+                                    workers=args.workers, backend=args.backend,
+                                    profile=args.codec_profile, force=args.force,
+                                    storage=args.storage, statistics=args.stats)
\ No newline at end of file
@@ -1,114 +1,179 @@
-import h5py
 import numpy as np
 import rasterio
 from rasterio.transform import from_bounds
-from pyproj import CRS, Transformer
+from rasterio.windows import Window
 import logging
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from scene_reader import SceneReader
+from grid import attribute_value
+from codec_profiles import CODEC_PROFILES, codec_options
+from l1c import DEFAULT_BLOCK_ROWS, read_rows, squeezed_shape
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_and_project_subdatasets(h5_file_path, output_dir):
-    """
-    Extract and project L2C subdatasets from HDF5 file using Mercator projection
+def dataset_attribute(attrs, dataset, name, default=None):
+    """Attribute `name`, also accepting the dataset-prefixed `{dataset}_{name}` form."""
+    for key in (name, f'{dataset}_{name}'):
+        if key in attrs:
+            return attribute_value(attrs[key])
+    return default
+
+def gridded_datasets(scene):
+    """Names of the 2-D datasets in the file that carry a grid_mapping attribute."""
+    names = []
+    for name in scene.dataset_names():
+        h5_dataset = scene.dataset(name)
+        if dataset_attribute(h5_dataset.attrs, name, 'grid_mapping') is None:
+            continue
+        if len(squeezed_shape(h5_dataset)) == 2:
+            names.append(name)
+    return names
+
+def nodata_value(fill_value, dtype):
+    """Fill value usable as GeoTIFF nodata for dtype, or None."""
+    if fill_value is None:
+        return None
+    if np.dtype(dtype).kind in 'iu':
+        info = np.iinfo(dtype)
+        if not info.min <= fill_value <= info.max:
+            return None
+    return fill_value
+
+def convert_dataset(scene, dataset, output_dir, grid, block_rows=DEFAULT_BLOCK_ROWS, profile=None):
+    """Write one L2C dataset as {output_dir}/{dataset}.tif.
+
+    Values are copied as stored, block_rows rows at a time, with the fill
+    value declared as nodata. Returns the output path, or None when the
+    dataset is missing or not 2-D.
     """
-    # L2C specific subdatasets
-    L2C_DATASETS = ['DHI', 'DNI', 'GHI', 'INS']
+    if dataset not in scene:
+        logger.warning(f"Skipping {dataset} - not found in file")
+        return None
+        
+    logger.info(f"Processing {dataset}")
+    h5_dataset = scene.dataset(dataset)
+    shape = squeezed_shape(h5_dataset)
     
-    # Projection parameters from metadata
-    proj_params = {
-        'proj': 'merc',
-        'lon_0': 77.25,  # Projection_Information_longitude_of_projection_origin
-        'lat_ts': 17.75, # Projection_Information_standard_parallel
-        'x_0': 0,        # Projection_Information_false_easting
-        'y_0': 0,        # Projection_Information_false_northing
-        'a': 6378137,    # Projection_Information_semi_major_axis
-        'b': 6356752.3142, # Projection_Information_semi_minor_axis
-        'units': 'm'
-    }
-
-    crs = CRS.from_dict(proj_params)
+    if len(shape) != 2:
+        logger.warning(f"Skipping {dataset} - unexpected shape {shape}")
+        return None
+    
+    logger.info(f"Data shape: {shape}")
+    
+    attrs = h5_dataset.attrs
+    fill_value = nodata_value(dataset_attribute(attrs, dataset, '_FillValue', -999), h5_dataset.dtype)
+    
+    output_path = f"{output_dir}/{dataset}.tif"
     
-    # Bounds from metadata
-    bounds = {
-        'left': 44.5,    # left_longitude
-        'right': 110.0,  # right_longitude
-        'bottom': -10.0, # lower_latitude
-        'top': 45.5      # upper_latitude
-    }
+    if shape == grid.shape:
+        transform = grid.transform
+    else:
+        transform = from_bounds(*grid.bounds, shape[1], shape[0])
+    
+    height, width = shape
+    with rasterio.open(
+        output_path,
+        'w',
+        driver='GTiff',
+        height=height,
+        width=width,
+        count=1,
+        dtype=h5_dataset.dtype,
+        crs=grid.crs_wkt,
+        transform=transform,
+        nodata=fill_value,
+        **codec_options(profile, h5_dataset.dtype)
+    ) as dst:
+        for row_start in range(0, height, block_rows):
+            row_stop = min(row_start + block_rows, height)
+            dst.write(read_rows(h5_dataset, row_start, row_stop), 1,
+                      window=Window(0, row_start, width, row_stop - row_start))
+        dst.update_tags(**{
+            'LONG_NAME': dataset_attribute(attrs, dataset, 'long_name', ''),
+            'STANDARD_NAME': dataset_attribute(attrs, dataset, 'standard_name', ''),
+            'UNITS': dataset_attribute(attrs, dataset, 'units', ''),
+            'GRID_MAPPING': dataset_attribute(attrs, dataset, 'grid_mapping', '')
+        })
+    logger.info(f"Successfully written {output_path}")
+    return output_path
 
-    transformer = Transformer.from_crs(
-        CRS.from_epsg(4326),
-        crs,
-        always_xy=True
-    )
+def convert_dataset_job(h5_file_path, dataset, output_dir, block_rows=DEFAULT_BLOCK_ROWS,
+                        profile=None):
+    """Worker entry point: convert one dataset with its own file handle."""
+    try:
+        with SceneReader(h5_file_path) as scene:
+            return convert_dataset(scene, dataset, output_dir, scene.grid, block_rows, profile)
+    except Exception as e:
+        logger.error(f"Error processing {dataset}: {str(e)}")
+        return None
 
-    left, bottom = transformer.transform(bounds['left'], bounds['bottom'])
-    right, top = transformer.transform(bounds['right'], bounds['top'])
+def extract_and_project_subdatasets(h5_file_path, output_dir, datasets=None, workers=1,
+                                    block_rows=DEFAULT_BLOCK_ROWS, profile=None):
+    """
+    Extract and project L2C subdatasets from HDF5 file using Mercator projection
 
-    with h5py.File(h5_file_path, 'r') as h5f:
-        for dataset in L2C_DATASETS:
-            try:
-                if dataset not in h5f:
-                    logger.warning(f"Skipping {dataset} - not found in file")
-                    continue
-                    
-                logger.info(f"Processing {dataset}")
-                
-                data = h5f[dataset][:]
-                data = np.squeeze(data)
-                
-                if len(data.shape) != 2:
-                    logger.warning(f"Skipping {dataset} - unexpected shape {data.shape}")
+    datasets defaults to every 2-D dataset with a grid_mapping attribute, so
+    any L2C product (INS, cloud, rain, OLR, ...) converts without changes.
+    All of them are streamed through a single open of the file; with workers
+    above 1 they are converted concurrently in separate processes instead.
+    profile names the codec profile (see codec_profiles).
+    Returns the paths written, in datasets order.
+    """
+    with SceneReader(h5_file_path) as scene:
+        if datasets is None:
+            datasets = gridded_datasets(scene)
+            logger.info(f"Found gridded datasets: {', '.join(datasets)}")
+
+        if workers <= 1:
+            written = []
+            grid = scene.grid
+            for dataset in datasets:
+                try:
+                    output_path = convert_dataset(scene, dataset, output_dir, grid, block_rows,
+                                                  profile)
+                    if output_path:
+                        written.append(output_path)
+                except Exception as e:
+                    logger.error(f"Error processing {dataset}: {str(e)}")
                     continue
-                
-                logger.info(f"Data shape: {data.shape}")
-                
-                # Handle fill values
-                fill_value = h5f[dataset].attrs.get(f'{dataset}__FillValue', -999)
-                data = np.ma.masked_equal(data, fill_value)
-                
-                output_path = f"{output_dir}/{dataset}.tif"
-                
-                transform = from_bounds(
-                    left, bottom, right, top,
-                    data.shape[1], data.shape[0]
-                )
-                
-                with rasterio.open(
-                    output_path,
-                    'w',
-                    driver='GTiff',
-                    height=data.shape[0],
-                    width=data.shape[1],
-                    count=1,
-                    dtype=data.dtype,
-                    crs=crs.to_wkt(),
-                    transform=transform,
-                    nodata=fill_value
-                ) as dst:
-                    dst.write(data.filled(fill_value), 1)
-                    dst.update_tags(**{
-                        'LONG_NAME': h5f[dataset].attrs.get(f'{dataset}_long_name', ''),
-                        'STANDARD_NAME': h5f[dataset].attrs.get(f'{dataset}_standard_name', ''),
-                        'UNITS': h5f[dataset].attrs.get(f'{dataset}_units', ''),
-                        'GRID_MAPPING': h5f[dataset].attrs.get(f'{dataset}_grid_mapping', '')
-                    })
-                logger.info(f"Successfully written {output_path}")
-                
+            return written
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(convert_dataset_job, h5_file_path, dataset, output_dir, block_rows,
+                            profile)
+            for dataset in datasets
+        ]
+        results = []
+        for dataset, future in zip(datasets, futures):
+            try:
+                results.append(future.result())
             except Exception as e:
                 logger.error(f"Error processing {dataset}: {str(e)}")
-                continue
+                results.append(None)
+    return [path for path in results if path]
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert L2C datasets to GeoTIFF")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of datasets converted concurrently")
+    parser.add_argument('--datasets', nargs='+',
+                        help="datasets to convert (default: every gridded dataset)")
+    parser.add_argument('--codec-profile', choices=sorted(CODEC_PROFILES),
+                        help="compression profile (default: uncompressed)")
+    args = parser.parse_args()
+
     h5_file = "3RIMG_04SEP2024_1015_L2C_INS_V01R00.h5"
     output_dir = "l2c_projected_data"
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
-    extract_and_project_subdatasets(h5_file, output_dir)
+    extract_and_project_subdatasets(h5_file, output_dir, datasets=args.datasets,
+                                    workers=args.workers, profile=args.codec_profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
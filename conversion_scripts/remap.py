@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import numpy as np
+from pyproj import CRS, Transformer
+from rasterio.transform import from_origin
+from rasterio.warp import calculate_default_transform
+from grid import Grid
+
+# On-disk cache of remap plans, shared by every scene on the same grids
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'insat_remap')
+
+# Target rows transformed per step while building a plan
+BUILD_BLOCK_ROWS = 256
+
+# Target pixels reprojected per step in RemapPlan.apply
+APPLY_CHUNK_SIZE = 1 << 16
+
+# Number of source pixels each target pixel draws from
+METHOD_TAPS = {'nearest': 1, 'bilinear': 4}
+
+_plans = {}
+
+class RemapPlan:
+    """Source-pixel indices and weights mapping one grid onto another.
+
+    index and weight have shape (taps, target pixels); an index of -1 marks
+    a tap that falls outside the source (or off the Earth's disk).
+    """
+
+    def __init__(self, index, weight, shape):
+        self.index = index
+        self.weight = weight
+        self.shape = shape
+
+    def apply(self, band, src_nodata=None, dst_nodata=0, out=None):
+        """Reproject a 2-D band with a gather; nodata taps are dropped and the rest renormalised."""
+        band = np.ascontiguousarray(band)
+        flat = band.reshape(-1)
+        if out is None:
+            out = np.empty(self.shape, dtype=band.dtype)
+        result = out.reshape(-1)
+        # Chunked so the per-tap temporaries stay cache-sized
+        for start in range(0, result.size, APPLY_CHUNK_SIZE):
+            chunk = slice(start, start + APPLY_CHUNK_SIZE)
+            self._apply_chunk(flat, self.index[:, chunk], self.weight[:, chunk],
+                              src_nodata, dst_nodata, result[chunk])
+        return out
+
+    @staticmethod
+    def _apply_chunk(flat, index, weight, src_nodata, dst_nodata, result):
+        valid = index >= 0
+        values = np.take(flat, np.where(valid, index, 0))
+        if src_nodata is not None:
+            valid &= values != src_nodata
+        if index.shape[0] == 1:
+            np.copyto(result, values[0], casting='unsafe')
+            result[~valid[0]] = dst_nodata
+            return
+
+        weight = np.where(valid, weight, 0)
+        total = weight.sum(axis=0)
+        accumulated = (values * weight).sum(axis=0, dtype=np.float32)
+        covered = total > 0
+        accumulated[covered] /= total[covered]
+        if flat.dtype.kind in 'iu':
+            np.rint(accumulated, out=accumulated)
+        np.copyto(result, accumulated, casting='unsafe')
+        result[~covered] = dst_nodata
+
+def target_grid(src_grid, dst_crs, bounds):
+    """Grid over bounds (west, south, east, north) in dst_crs at the resolution gdalwarp would pick."""
+    transform, _, _ = calculate_default_transform(
+        src_grid.crs, CRS.from_user_input(dst_crs), src_grid.width, src_grid.height,
+        *src_grid.bounds
+    )
+    resolution = transform.a
+    west, south, east, north = bounds
+    width = int((east - west) / resolution + 0.5)
+    height = int((north - south) / resolution + 0.5)
+    dst_transform = from_origin(west, north, (east - west) / width, (north - south) / height)
+    return Grid(CRS.from_user_input(dst_crs).to_wkt(), dst_transform, width, height)
+
+def plan_signature(src_grid, dst_grid, method):
+    """Stable hash of a (source grid, target grid, method) triple."""
+    key = json.dumps({
+        'src': src_grid.to_dict(),
+        'dst': dst_grid.to_dict(),
+        'method': method,
+    }, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def build_plan(src_grid, dst_grid, method='bilinear'):
+    """Compute indices and weights for every target pixel centre."""
+    if method not in METHOD_TAPS:
+        raise ValueError(f"Unsupported method {method!r}, expected one of {sorted(METHOD_TAPS)}")
+    taps = METHOD_TAPS[method]
+    size = dst_grid.width * dst_grid.height
+    index = np.full((taps, size), -1, dtype=np.int32)
+    weight = np.zeros((taps, size), dtype=np.float32)
+
+    transformer = Transformer.from_crs(dst_grid.crs, src_grid.crs, always_xy=True)
+    src_inverse = ~src_grid.transform
+    columns = np.arange(dst_grid.width) + 0.5
+    for row_start in range(0, dst_grid.height, BUILD_BLOCK_ROWS):
+        row_stop = min(row_start + BUILD_BLOCK_ROWS, dst_grid.height)
+        cols, rows = np.meshgrid(columns, np.arange(row_start, row_stop) + 0.5)
+        x, y = dst_grid.transform * (cols.ravel(), rows.ravel())
+        src_x, src_y = transformer.transform(x, y, errcheck=False)
+        # Fractional source positions, 0.0 at the first pixel centre
+        src_col, src_row = src_inverse * (np.asarray(src_x), np.asarray(src_y))
+        src_col = src_col - 0.5
+        src_row = src_row - 0.5
+        finite = np.isfinite(src_col) & np.isfinite(src_row)
+        src_col[~finite] = -2
+        src_row[~finite] = -2
+        block = slice(row_start * dst_grid.width, row_stop * dst_grid.width)
+
+        if method == 'nearest':
+            col = np.rint(src_col).astype(np.int64)
+            row = np.rint(src_row).astype(np.int64)
+            inside = (col >= 0) & (col < src_grid.width) & (row >= 0) & (row < src_grid.height)
+            index[0, block] = np.where(inside, row * src_grid.width + col, -1)
+            weight[0, block] = inside
+            continue
+
+        col0 = np.floor(src_col).astype(np.int64)
+        row0 = np.floor(src_row).astype(np.int64)
+        dx = (src_col - col0).astype(np.float32)
+        dy = (src_row - row0).astype(np.float32)
+        corners = [
+            (0, 0, (1 - dx) * (1 - dy)),
+            (1, 0, dx * (1 - dy)),
+            (0, 1, (1 - dx) * dy),
+            (1, 1, dx * dy),
+        ]
+        for tap, (col_step, row_step, tap_weight) in enumerate(corners):
+            col = col0 + col_step
+            row = row0 + row_step
+            inside = (col >= 0) & (col < src_grid.width) & (row >= 0) & (row < src_grid.height)
+            index[tap, block] = np.where(inside, row * src_grid.width + col, -1)
+            weight[tap, block] = np.where(inside, tap_weight, 0)
+    return RemapPlan(index, weight, dst_grid.shape)
+
+def save_plan(plan, path_prefix):
+    """Write a plan as {prefix}.index.npy / {prefix}.weight.npy, each atomically."""
+    for name in ('weight', 'index'):
+        path = f"{path_prefix}.{name}.npy"
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, getattr(plan, name))
+        os.replace(temp_path, path)
+
+def load_plan(path_prefix, shape):
+    """Memory-map a saved plan."""
+    index = np.load(f"{path_prefix}.index.npy", mmap_mode='r')
+    weight = np.load(f"{path_prefix}.weight.npy", mmap_mode='r')
+    return RemapPlan(index, weight, shape)
+
+def remap_plan(src_grid, dst_grid, method='bilinear', cache_dir=DEFAULT_CACHE_DIR):
+    """Plan for the triple, cached in-process and memory-mapped from disk."""
+    signature = plan_signature(src_grid, dst_grid, method)
+    if signature in _plans:
+        return _plans[signature]
+
+    path_prefix = os.path.join(cache_dir, signature) if cache_dir else None
+    # The index file is replaced last, so its presence means both are complete
+    if path_prefix and os.path.exists(f"{path_prefix}.index.npy"):
+        plan = load_plan(path_prefix, dst_grid.shape)
+    else:
+        plan = build_plan(src_grid, dst_grid, method)
+        if path_prefix:
+            os.makedirs(cache_dir, exist_ok=True)
+            save_plan(plan, path_prefix)
+            plan = load_plan(path_prefix, dst_grid.shape)
+
+    _plans[signature] = plan
+    return plan
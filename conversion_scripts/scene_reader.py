@@ -0,0 +1,202 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from calibration import (
+    DEFAULT_FILL_VALUE,
+    build_lut,
+    calibrate,
+    lut_calibrate,
+    prepare_lut,
+)
+from grid import grid_from_file
+from h5_backends import open_backend
+
+# Upper bound for decoded bands kept in memory per scene (a calibrated
+# 1616x1737 float32 band is ~11 MB).
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Band attributes calibrated() and lut() read: a metadata selection with
+# these is enough to decode the selected bands (see h5_metadata).
+CALIBRATION_ATTRIBUTES = ['lab_radiance_scale_factor', 'lab_radiance_add_offset', '_FillValue']
+
+_open_scenes = {}
+
+def convert_attribute_value(value):
+    """Convert HDF5 attribute value to a plain Python value."""
+    if isinstance(value, (np.ndarray, list)):
+        if len(value) == 1:
+            return value[0].item() if isinstance(value[0], np.generic) else value[0]
+        return [item.item() if isinstance(item, np.generic) else item for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class SceneReader:
+    """Serve bands of one HDF5 scene through a single open handle and an LRU cache."""
+
+    def __init__(self, h5_file, metadata=None, max_cache_bytes=DEFAULT_CACHE_BYTES, backend='h5py'):
+        self.h5_file = h5_file
+        self.metadata = metadata
+        self.max_cache_bytes = max_cache_bytes
+        self.backend = backend
+        self._h5f = None
+        self._grid = None
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, band_name):
+        return band_name in self.file
+
+    @property
+    def file(self):
+        """The open file handle (see h5_backends), opened on first use."""
+        if self._h5f is None:
+            self._h5f = open_backend(self.h5_file, self.backend)
+        return self._h5f
+
+    def close(self):
+        """Close the HDF5 handle and drop every cached band."""
+        if self._h5f is not None:
+            self._h5f.close()
+            self._h5f = None
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    @property
+    def grid(self):
+        """CRS and transform of the scene, from its Projection_Information."""
+        if self._grid is None:
+            self._grid = grid_from_file(self.file)
+        return self._grid
+
+    def dataset_names(self):
+        """Names of every dataset at the root of the file."""
+        return [name for name in self.file.keys() if hasattr(self.file[name], 'shape')]
+
+    def dataset(self, band_name):
+        """Return the raw dataset (variable) for a band."""
+        return self.file[band_name]
+
+    @property
+    def root_attributes(self):
+        """Root attributes, from metadata.json if given, else from the file."""
+        if self.metadata is not None:
+            return self.metadata['root_attributes']
+        return {
+            name: convert_attribute_value(value)
+            for name, value in self.file.attrs.items()
+        }
+
+    def band_attributes(self, band_name):
+        """Attributes of a band, from metadata.json if given, else from the file."""
+        if self.metadata is not None:
+            return self.metadata['datasets'][band_name]['attributes']
+        return {
+            name: convert_attribute_value(value)
+            for name, value in self.file[band_name].attrs.items()
+        }
+
+    def raw(self, band_name):
+        """Band counts with singleton dimensions removed."""
+        return self._cached(('raw', band_name),
+                            lambda: np.squeeze(self.file[band_name][:]))
+
+    def calibrated(self, band_name):
+        """Band counts scaled to float32 radiance, with fill pixels set to NaN."""
+        def load():
+            band_attrs = self.band_attributes(band_name)
+            return calibrate(
+                self.raw(band_name),
+                band_attrs['lab_radiance_scale_factor'],
+                band_attrs['lab_radiance_add_offset'],
+                band_attrs.get('_FillValue', DEFAULT_FILL_VALUE),
+            )
+        return self._cached(('calibrated', band_name), load)
+
+    def lut(self, band_name, quantity):
+        """Lookup table shipped in the file, e.g. quantity 'TEMP' reads IMG_TIR1_TEMP."""
+        def load():
+            table = self.file[f'{band_name}_{quantity}']
+            grey_count = self.file['GreyCount'][:] if 'GreyCount' in self.file else None
+            return prepare_lut(
+                table[:],
+                convert_attribute_value(table.attrs.get('_FillValue')),
+                grey_count,
+                self.band_attributes(band_name).get('_FillValue', DEFAULT_FILL_VALUE),
+            )
+        return self._cached(('lut', band_name, quantity), load)
+
+    def coefficient_lut(self, band_name, gsics=False):
+        """Radiance lookup table built from the lab (or GSICS) quadratic coefficients."""
+        suffix = '_gsics' if gsics else ''
+        def load():
+            band_attrs = self.band_attributes(band_name)
+            return build_lut(
+                band_attrs[f'lab_radiance_scale_factor{suffix}'],
+                band_attrs[f'lab_radiance_add_offset{suffix}'],
+                band_attrs.get(f'lab_radiance_quad{suffix}', 0.0),
+                count_fill_value=band_attrs.get('_FillValue', DEFAULT_FILL_VALUE),
+            )
+        return self._cached(('coefficient_lut', band_name, gsics), load)
+
+    def brightness_temperature(self, band_name):
+        """Brightness temperature in Kelvin from the band's IMG_*_TEMP table."""
+        return self._cached(('TEMP', band_name),
+                            lambda: lut_calibrate(self.raw(band_name), self.lut(band_name, 'TEMP')))
+
+    def radiance(self, band_name, coefficients=None):
+        """Radiance through a lookup table.
+
+        coefficients=None uses the IMG_*_RADIANCE table from the file, 'lab'
+        and 'gsics' build the table from the matching quadratic coefficients.
+        """
+        def load():
+            if coefficients is None:
+                lut = self.lut(band_name, 'RADIANCE')
+            else:
+                lut = self.coefficient_lut(band_name, gsics=(coefficients == 'gsics'))
+            return lut_calibrate(self.raw(band_name), lut)
+        return self._cached(('RADIANCE', band_name, coefficients), load)
+
+    def albedo(self, band_name='IMG_VIS'):
+        """Albedo in percent from the band's IMG_*_ALBEDO table."""
+        return self._cached(('ALBEDO', band_name),
+                            lambda: lut_calibrate(self.raw(band_name), self.lut(band_name, 'ALBEDO')))
+
+    def _cached(self, key, load):
+        """Return a cached array, loading and caching it on a miss."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        data = load()
+        # Cached arrays are shared between callers, so keep them read-only
+        data.flags.writeable = False
+        if data.nbytes > self.max_cache_bytes:
+            return data
+
+        while self._cache and self._cache_bytes + data.nbytes > self.max_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted.nbytes
+        self._cache[key] = data
+        self._cache_bytes += data.nbytes
+        return data
+
+def open_scene(h5_file, metadata=None, max_cache_bytes=DEFAULT_CACHE_BYTES, backend='h5py'):
+    """Return the shared SceneReader for a file, creating it on first use."""
+    key = os.path.abspath(h5_file)
+    if key not in _open_scenes:
+        _open_scenes[key] = SceneReader(h5_file, metadata, max_cache_bytes, backend)
+    return _open_scenes[key]
+
+def close_scenes():
+    """Close every scene opened through open_scene."""
+    for scene in _open_scenes.values():
+        scene.close()
+    _open_scenes.clear()
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+# Manifest kept next to the outputs it describes
+MANIFEST_NAME = '.build_manifest.json'
+
+# Bytes hashed per read when identifying inputs by content
+DIGEST_CHUNK_SIZE = 1 << 20
+
+def file_identity(path, digest=False):
+    """Identity of an input file: size and mtime, or a SHA-256 of its content."""
+    stat = os.stat(path)
+    identity = {'size': stat.st_size}
+    if digest:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        identity['sha256'] = sha256.hexdigest()
+    else:
+        identity['path'] = os.path.abspath(path)
+        identity['mtime_ns'] = stat.st_mtime_ns
+    return identity
+
+def build_key(input_identity, item, config):
+    """Hash of an input identity, the item (band) built from it and the full config."""
+    key = json.dumps({
+        'input': input_identity,
+        'item': item,
+        'config': config,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+class BuildCache:
+    """Manifest of outputs in one directory and the build key each was made with.
+
+    An output is current when the manifest holds its key and the file on disk
+    still has the size recorded after it was written, so outputs cut short by
+    a crash (never recorded) or replaced since are built again.
+    """
+
+    def __init__(self, output_dir, manifest_name=MANIFEST_NAME):
+        self.path = os.path.join(output_dir, manifest_name)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # A damaged manifest only costs a rebuild
+                self.entries = {}
+
+    def is_current(self, key, output_path):
+        entry = self.entries.get(os.path.basename(output_path))
+        if entry is None or entry['key'] != key:
+            return False
+        return os.path.exists(output_path) and os.path.getsize(output_path) == entry['size']
+
+    def record(self, key, output_path):
+        """Mark output_path as built with key and save the manifest."""
+        self.entries[os.path.basename(output_path)] = {
+            'key': key,
+            'size': os.path.getsize(output_path),
+        }
+        self.save()
+
+    def invalidate(self, output_path):
+        """Drop output_path from the manifest and delete it, so a partial file is not reused.
+
+        GDAL cannot overwrite a truncated GeoTIFF, so it has to go first.
+        """
+        if self.entries.pop(os.path.basename(output_path), None) is not None:
+            self.save()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    def save(self):
+        """Write the manifest atomically (temp file, then os.replace)."""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+
+# Named compression settings shared by every writer; see benchmark_codecs.py
+# for the measurements behind them. PREDICTOR is a TIFF predictor number, or
+# True to pick one from the dtype (predictor_for).
+#
+# The compressed profiles use horizontal differencing (2) for every dtype:
+# it is the best predictor for counts, and for calibrated radiance and
+# brightness temperature, which are lookups of 10-bit counts and so take few
+# distinct values; the floating-point predictor doubles their size. Writers
+# of continuous float fields can pass predictor=3.
+CODEC_PROFILES = {
+    # What convert_to_cog has always written
+    'legacy': {'COMPRESS': 'LZW'},
+    # Smallest files: ZSTD 9 matches ZSTD 15 in size at ~5x the write speed
+    'archive': {'COMPRESS': 'ZSTD', 'LEVEL': 9, 'PREDICTOR': 2},
+    # Fastest encode of the compressed options, tiles decode as fast as LZW's
+    'serve-fast': {'COMPRESS': 'ZSTD', 'LEVEL': 1, 'PREDICTOR': 2},
+    # What json_creator's optimized GeoTIFFs have always written
+    'deflate': {'COMPRESS': 'DEFLATE'},
+    'none': {'COMPRESS': 'NONE'},
+}
+
+# Profile used when a writer is not given one; INSAT_CODEC_PROFILE overrides
+# it for every writer. COGs keep their LZW, plain GeoTIFFs stay uncompressed.
+DRIVER_DEFAULT_PROFILES = {'COG': 'legacy', 'GTiff': 'none'}
+
+# Level option name per codec for the GTiff driver; the COG driver takes LEVEL
+LEVEL_OPTIONS = {'ZSTD': 'ZSTD_LEVEL', 'DEFLATE': 'ZLEVEL', 'LERC_ZSTD': 'ZSTD_LEVEL'}
+
+# The COG driver names predictors instead of numbering them
+COG_PREDICTORS = {2: 'STANDARD', 3: 'FLOATING_POINT'}
+
+def predictor_for(dtype):
+    """TIFF predictor for dtype: 3 (floating point) for floats, 2 (horizontal) otherwise."""
+    return 3 if np.dtype(dtype).kind == 'f' else 2
+
+def selected_profile(profile=None, driver='GTiff', default=None):
+    """profile, else $INSAT_CODEC_PROFILE, else default or the driver's default profile."""
+    return profile or os.environ.get('INSAT_CODEC_PROFILE') or default or DRIVER_DEFAULT_PROFILES[driver]
+
+def codec_options(profile=None, dtype=None, driver='GTiff', predictor=None):
+    """Creation options of a named profile for driver ('GTiff' or 'COG').
+
+    predictor overrides the profile's choice, also for profiles without
+    one: a TIFF predictor number (1 or False for none), or True for
+    predictor_for(dtype). It is dropped for uncompressed profiles.
+    """
+    profile = selected_profile(profile, driver)
+    if profile not in CODEC_PROFILES:
+        raise ValueError(f"Unknown codec profile {profile!r}, expected one of {sorted(CODEC_PROFILES)}")
+    settings = dict(CODEC_PROFILES[profile])
+    if predictor is not None and settings['COMPRESS'] != 'NONE':
+        settings['PREDICTOR'] = predictor
+    options = {}
+    for name, value in settings.items():
+        if name == 'PREDICTOR':
+            if value is True:
+                if dtype is None and driver != 'COG':
+                    continue
+                # The COG driver picks the predictor from the data type itself
+                value = 'YES' if driver == 'COG' else predictor_for(dtype)
+            elif not value or value == 1:
+                continue
+            elif driver == 'COG':
+                value = COG_PREDICTORS[value]
+        elif name == 'LEVEL' and driver != 'COG':
+            name = LEVEL_OPTIONS.get(CODEC_PROFILES[profile]['COMPRESS'])
+            if name is None:
+                continue
+        options[name] = str(value)
+    return options
+
+def gdal_options(profile=None, dtype=None, driver='GTiff', predictor=None):
+    """codec_options as a GDAL 'NAME=VALUE' list."""
+    return [f'{name}={value}' for name, value in codec_options(profile, dtype, driver, predictor).items()]
@@ -0,0 +1,178 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# Band statistics accumulated block by block while a raster is written, then
+# stored next to it: GDAL picks them up from the PAM .aux.xml (gdalinfo and
+# GetStatistics report them without reading a pixel) and other readers from
+# the JSON sidecar.
+
+# Buckets in the stored histogram, as GDAL computes by default
+HISTOGRAM_BUCKETS = 256
+
+# Bins kept while accumulating; merged down to HISTOGRAM_BUCKETS at the end
+HISTOGRAM_BINS = 4 * HISTOGRAM_BUCKETS
+
+# Approximate statistics sample every APPROX_SAMPLE_STEP-th row and column
+APPROX_SAMPLE_STEP = 4
+
+STATS_MODES = ['exact', 'approx', 'none']
+
+class StreamingStats:
+    """Min/max/mean/stddev and histogram of one band, updated block by block.
+
+    Mean and variance are merged per block (Chan et al.), so blocks can come
+    in any order. The histogram range starts at the first block's and
+    doubles whenever a later block falls outside it. With sample_step above
+    1 only every sample_step-th row and column is counted and the result is
+    marked approximate.
+    """
+
+    def __init__(self, nodata=None, sample_step=1):
+        self.nodata = nodata
+        self.sample_step = sample_step
+        self.pixels = 0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._hist_min = None
+        self._bin_width = None
+        self._bins = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+
+    def update(self, block):
+        if self.sample_step > 1:
+            block = block[..., ::self.sample_step, ::self.sample_step]
+        values = np.asarray(block).ravel()
+        self.pixels += values.size
+        if values.dtype.kind == 'f':
+            values = values[np.isfinite(values)]
+        if self.nodata is not None:
+            values = values[values != self.nodata]
+        if values.size == 0:
+            return
+
+        values = values.astype(np.float64)
+        block_min = float(values.min())
+        block_max = float(values.max())
+        block_mean = float(values.mean())
+        block_m2 = float(np.square(values - block_mean).sum())
+        total = self.count + values.size
+        delta = block_mean - self.mean
+        self.m2 += block_m2 + delta * delta * self.count * values.size / total
+        self.mean += delta * values.size / total
+        self.count = total
+        self.minimum = block_min if self.minimum is None else min(self.minimum, block_min)
+        self.maximum = block_max if self.maximum is None else max(self.maximum, block_max)
+        self._update_histogram(values, block_min, block_max)
+
+    def _update_histogram(self, values, block_min, block_max):
+        if self._hist_min is None:
+            span = block_max - block_min
+            self._hist_min = block_min
+            self._bin_width = span / (HISTOGRAM_BINS - 1) if span > 0 else 1.0
+        while block_min < self._hist_min:
+            # Double the bin width, growing the range to the left
+            self._hist_min -= self._bin_width * HISTOGRAM_BINS
+            self._bins = np.concatenate([np.zeros_like(self._bins), self._bins])
+            self._merge_bin_pairs()
+        while block_max >= self._hist_min + self._bin_width * HISTOGRAM_BINS:
+            self._bins = np.concatenate([self._bins, np.zeros_like(self._bins)])
+            self._merge_bin_pairs()
+        index = ((values - self._hist_min) / self._bin_width).astype(np.int64)
+        np.clip(index, 0, HISTOGRAM_BINS - 1, out=index)
+        self._bins += np.bincount(index, minlength=HISTOGRAM_BINS)
+
+    def _merge_bin_pairs(self):
+        self._bins = self._bins.reshape(-1, 2).sum(axis=1)
+        self._bin_width *= 2
+
+    def result(self):
+        """Statistics as a dict, or None when the band held no valid pixel."""
+        if self.count == 0:
+            return None
+        merge = HISTOGRAM_BINS // HISTOGRAM_BUCKETS
+        return {
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'mean': self.mean,
+            'stddev': float(np.sqrt(self.m2 / self.count)),
+            'valid_percent': 100.0 * self.count / self.pixels,
+            'approximate': self.sample_step > 1,
+            'histogram': {
+                'min': self._hist_min,
+                'max': self._hist_min + self._bin_width * HISTOGRAM_BINS,
+                'counts': self._bins.reshape(-1, merge).sum(axis=1).tolist(),
+            },
+        }
+
+def streaming_stats(mode, nodata=None):
+    """StreamingStats for one of STATS_MODES, or None for 'none'."""
+    if mode == 'none':
+        return None
+    return StreamingStats(nodata, APPROX_SAMPLE_STEP if mode == 'approx' else 1)
+
+def pam_path(path):
+    return f"{path}.aux.xml"
+
+def json_path(path):
+    return f"{path}.stats.json"
+
+def statistics_metadata(stats):
+    """GDAL's STATISTICS_* band metadata items for a result() dict."""
+    metadata = {
+        'STATISTICS_MINIMUM': repr(stats['minimum']),
+        'STATISTICS_MAXIMUM': repr(stats['maximum']),
+        'STATISTICS_MEAN': repr(stats['mean']),
+        'STATISTICS_STDDEV': repr(stats['stddev']),
+        'STATISTICS_VALID_PERCENT': f"{stats['valid_percent']:.6g}",
+    }
+    if stats['approximate']:
+        metadata['STATISTICS_APPROXIMATE'] = 'YES'
+    return metadata
+
+def write_stats_sidecars(path, band_stats):
+    """Write per-band result() dicts (None for empty bands) as PAM .aux.xml and JSON.
+
+    Replaces any .aux.xml already there; the files written in this repo
+    keep their metadata inside the TIFF, so it only ever holds statistics.
+    """
+    dataset = ET.Element('PAMDataset')
+    for band_index, stats in enumerate(band_stats, start=1):
+        if stats is None:
+            continue
+        band = ET.SubElement(dataset, 'PAMRasterBand', band=str(band_index))
+        histogram = stats['histogram']
+        item = ET.SubElement(ET.SubElement(band, 'Histograms'), 'HistItem')
+        for tag, text in (
+            ('HistMin', repr(histogram['min'])),
+            ('HistMax', repr(histogram['max'])),
+            ('BucketCount', str(len(histogram['counts']))),
+            ('IncludeOutOfRange', '0'),
+            ('Approximate', '1' if stats['approximate'] else '0'),
+            ('HistCounts', '|'.join(str(count) for count in histogram['counts'])),
+        ):
+            ET.SubElement(item, tag).text = text
+        metadata = ET.SubElement(band, 'Metadata')
+        for key, value in statistics_metadata(stats).items():
+            ET.SubElement(metadata, 'MDI', key=key).text = value
+    ET.ElementTree(dataset).write(pam_path(path))
+
+    with open(json_path(path), 'w') as f:
+        json.dump({'bands': band_stats}, f, indent=2)
+
+def read_stats_sidecar(path):
+    """Per-band statistics stored with path by write_stats_sidecars, or None."""
+    try:
+        with open(json_path(path), 'r') as f:
+            return json.load(f)['bands']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def remove_stats_sidecars(path):
+    """Remove the sidecars of path, e.g. before it is rebuilt."""
+    for sidecar in (pam_path(path), json_path(path)):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
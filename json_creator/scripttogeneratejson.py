@@ -1,57 +1,55 @@
-from osgeo import gdal
-import h5py
+from osgeo import gdal, gdal_array
 import json
-import numpy as np
-from datetime import datetime
 import os
-
-
-def convert_attribute_value(value):
-    """Convert HDF5 attribute value to JSON serializable format."""
-    if isinstance(value, (np.ndarray, list)):
-        if len(value) == 1:
-            return value[0].item() if isinstance(value[0], np.generic) else value[0]
-        return [item.item() if isinstance(item, np.generic) else item for item in value]
-    if isinstance(value, np.generic):
-        return value.item()
-    return value
-
-
-def extract_h5_metadata(h5_file_path):
-    """Extract metadata from HDF5 file."""
-    metadata = {}
-
-    with h5py.File(h5_file_path, "r") as f:
-        metadata["root_attributes"] = {
-            attr_name: convert_attribute_value(f.attrs[attr_name])
-            for attr_name in f.attrs.keys()
-        }
-
-        metadata["datasets"] = {}
-
-        def extract_dataset_info(name, obj):
-            if isinstance(obj, h5py.Dataset):
-                metadata["datasets"][name] = {
-                    "shape": list(obj.shape),
-                    "dtype": str(obj.dtype),
-                    "attributes": {
-                        key: convert_attribute_value(obj.attrs[key])
-                        for key in obj.attrs.keys()
-                    },
-                }
-
-        f.visititems(extract_dataset_info)
-        metadata["file_info"] = {
-            "filename": h5_file_path,
-            "extracted_date": datetime.now().isoformat(),
-        }
-
-    return metadata
-
-
-def extract_tiff_metadata(tiff_file_path):
-    """Extract metadata from TIFF file using GDAL."""
-    return gdal.Info(tiff_file_path, format="json", stats=True)
+from build_cache import BuildCache, build_key, file_identity
+from tiles import generate_tiles
+from raster_stats import (
+    read_stats_sidecar, remove_stats_sidecars, streaming_stats, write_stats_sidecars
+)
+from h5_metadata import extract_h5_metadata
+from codec_profiles import gdal_options, selected_profile
+
+
+def extract_tiff_metadata(tiff_file_path, stats=None):
+    """Extract metadata from a TIFF file (or any GDAL dataset or path) using GDAL.
+
+    Statistics already stored with the raster are reported as they are;
+    GDAL only scans the pixels when stats is True, which by default is when
+    a file has no statistics sidecar (see raster_stats).
+    """
+    if stats is None:
+        stats = not (isinstance(tiff_file_path, str) and read_stats_sidecar(tiff_file_path))
+    return gdal.Info(tiff_file_path, format="json", stats=stats)
+
+
+def dataset_statistics(dataset, mode="exact", block_rows=256):
+    """raster_stats results for each band of an open GDAL dataset, read in row blocks.
+
+    With mode "none" no pixel is read and every band's result is None.
+    """
+    results = []
+    for band_index in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(band_index)
+        stats = streaming_stats(mode, band.GetNoDataValue())
+        if stats is None:
+            results.append(None)
+            continue
+        for row in range(0, dataset.RasterYSize, block_rows):
+            rows = min(block_rows, dataset.RasterYSize - row)
+            stats.update(band.ReadAsArray(0, row, dataset.RasterXSize, rows))
+        results.append(stats.result())
+    return results
+
+
+def attach_statistics(dataset, band_stats):
+    """Record band statistics on an open GDAL dataset, as GetStatistics reports them."""
+    for band_index, stats in enumerate(band_stats, start=1):
+        if stats is None:
+            continue
+        band = dataset.GetRasterBand(band_index)
+        band.SetStatistics(stats["minimum"], stats["maximum"], stats["mean"], stats["stddev"])
+        if stats["approximate"]:
+            band.SetMetadataItem("STATISTICS_APPROXIMATE", "YES")
 
 
 def save_json_metadata(metadata, output_file):
@@ -83,30 +81,85 @@ def cleanup_aux_files(files):
             print(f"Error removing {aux_file}: {e}")
 
 
-def process_files(input_file, bands, georef_params, webmercator_srs, optimized_params):
-    """Process HDF5 and generate TIFF files with metadata, then clean up."""
+def cleanup_vsimem_files(files):
+    """Release in-memory (/vsimem) stages and the statistics GDAL kept beside them."""
+    for file in files:
+        gdal.Unlink(file)
+        if gdal.VSIStatL(f"{file}.aux.xml") is not None:
+            gdal.Unlink(f"{file}.aux.xml")
+
+
+def process_files(input_file, bands, georef_params, webmercator_srs, optimized_params,
+                  force=False, tile_params=None, statistics="exact", codec_profile=None):
+    """Process HDF5 and generate TIFF files with metadata, then clean up.
+
+    Extraction and georeferencing are VRTs in /vsimem and the Web Mercator
+    warp is a MEM dataset, so each band is written to disk once, as the
+    optimized GeoTIFF; per-stage metadata is read from those datasets.
+    Band statistics are computed once for the extracted pixels and once for
+    the warped ones ("approx" samples them, see raster_stats) and attached
+    to every stage, instead of GDAL scanning each stage again.
+
+    With tile_params (keyword arguments for tiles.generate_tiles, e.g.
+    min_zoom/max_zoom/tile_format) each band's Web Mercator output is also
+    rendered as XYZ tiles under tiles/{band}.
+
+    optimized_params are layout creation options of the optimized GeoTIFF;
+    its compression comes from codec_profile (see codec_profiles), which
+    defaults to the DEFLATE these files have always used.
+
+    Outputs already built from the same input file and parameters (see
+    build_cache) are skipped unless force.
+    """
+    cache = BuildCache(".")
+    input_identity = file_identity(input_file)
+    codec_profile = selected_profile(codec_profile, default="deflate")
+    config = {
+        "georef_params": georef_params,
+        "webmercator_srs": webmercator_srs,
+        "optimized_params": optimized_params,
+        "tile_params": tile_params,
+        "statistics": statistics,
+        "codec_profile": codec_profile,
+    }
+
     # Extract and save HDF5 metadata
-    h5_metadata = extract_h5_metadata(input_file)
-    save_json_metadata(h5_metadata, "h5_metadata.json")
-    print("Saved HDF5 metadata")
+    metadata_key = build_key(input_identity, "h5_metadata", {})
+    if force or not cache.is_current(metadata_key, "h5_metadata.json"):
+        h5_metadata = extract_h5_metadata(input_file)
+        save_json_metadata(h5_metadata, "h5_metadata.json")
+        cache.record(metadata_key, "h5_metadata.json")
+        print("Saved HDF5 metadata")
+    else:
+        print("HDF5 metadata up to date")
 
     # Process each band
     for band_name, dataset_path in bands.items():
+        band_key = build_key(input_identity, [band_name, dataset_path], config)
+        metadata_file = f"metadata_{band_name}.json"
+        if not force and cache.is_current(band_key, metadata_file):
+            print(f"Skipping band {band_name} - up to date")
+            continue
+        cache.invalidate(metadata_file)
         temp_files = []  # Track files for cleanup
+        virtual_files = []  # Stages kept in /vsimem
+        stage_datasets = []
+        webmercator_ds = None
 
         try:
             # Extract band
-            output_tif = f"IMG_{band_name}.tif"
+            output_vrt = f"/vsimem/IMG_{band_name}.vrt"
             band_ds = gdal.Open(f'HDF5:"{input_file}":{dataset_path}')
-            gdal.Translate(output_tif, band_ds, format="GTiff")
+            gdal.Translate(output_vrt, band_ds, format="VRT")
             band_ds = None
-            temp_files.append(output_tif)
+            virtual_files.append(output_vrt)
 
             # Georeference
-            georef_tif = f"IMG_{band_name}_georef.tif"
+            georef_vrt = f"/vsimem/IMG_{band_name}_georef.vrt"
             gdal.Translate(
-                georef_tif,
-                output_tif,
+                georef_vrt,
+                output_vrt,
+                format="VRT",
                 outputBounds=[
                     georef_params["ulx"],
                     georef_params["uly"],
@@ -115,35 +168,58 @@ def process_files(input_file, bands, georef_params, webmercator_srs, optimized_p
                 ],
                 outputSRS=georef_params["srs"],
             )
-            temp_files.append(georef_tif)
+            virtual_files.append(georef_vrt)
+
+            # Georeferencing leaves the pixels alone: one pass serves both stages
+            stage_datasets = [gdal.Open(output_vrt), gdal.Open(georef_vrt)]
+            band_stats = dataset_statistics(stage_datasets[0], statistics)
+            for dataset in stage_datasets:
+                attach_statistics(dataset, band_stats)
 
-            # Reproject to Web Mercator
-            webmercator_tif = f"IMG_{band_name}_webmercator.tif"
-            gdal.Warp(webmercator_tif, georef_tif, dstSRS=webmercator_srs)
-            temp_files.append(webmercator_tif)
+            # Reproject to Web Mercator, in memory so the warp runs only once
+            webmercator_ds = gdal.Warp("", georef_vrt, format="MEM", dstSRS=webmercator_srs)
+            webmercator_stats = dataset_statistics(webmercator_ds, statistics)
+            attach_statistics(webmercator_ds, webmercator_stats)
 
-            # Optimize for Google Maps
+            # Optimize for Google Maps: the only stage written to disk
             optimized_tif = f"IMG_{band_name}_optimized.tif"
+            dtype = gdal_array.GDALTypeCodeToNumericTypeCode(
+                webmercator_ds.GetRasterBand(1).DataType
+            )
             gdal.Translate(
-                optimized_tif, webmercator_tif, creationOptions=optimized_params
+                optimized_tif, webmercator_ds,
+                creationOptions=optimized_params + gdal_options(codec_profile, dtype),
             )
             temp_files.append(optimized_tif)
+            write_stats_sidecars(optimized_tif, webmercator_stats)
+
+            if tile_params is not None:
+                generate_tiles(
+                    optimized_tif, os.path.join("tiles", band_name), product=band_name,
+                    **tile_params
+                )
 
             # Extract and save metadata for each processing stage
             tiff_metadata = {
-                "original": extract_tiff_metadata(output_tif),
-                "georeferenced": extract_tiff_metadata(georef_tif),
-                "webmercator": extract_tiff_metadata(webmercator_tif),
+                "original": extract_tiff_metadata(stage_datasets[0], stats=False),
+                "georeferenced": extract_tiff_metadata(stage_datasets[1], stats=False),
+                "webmercator": extract_tiff_metadata(webmercator_ds, stats=False),
                 "optimized": extract_tiff_metadata(optimized_tif),
             }
 
-            save_json_metadata(tiff_metadata, f"metadata_{band_name}.json")
+            save_json_metadata(tiff_metadata, metadata_file)
+            cache.record(band_key, metadata_file)
             print(f"Saved metadata for band {band_name}")
 
         finally:
             # Cleanup TIFF files regardless of success or failure
+            stage_datasets = []
+            webmercator_ds = None
+            cleanup_vsimem_files(virtual_files)
             cleanup_tiff_files(temp_files)
             cleanup_aux_files(temp_files)
+            for file in temp_files:
+                remove_stats_sidecars(file)
 
 
 def main():
@@ -164,11 +240,13 @@ def main():
         "srs": "EPSG:4326",
     }
     webmercator_srs = "EPSG:3857"
-    optimized_params = ["TILED=YES", "COMPRESS=DEFLATE"]
+    optimized_params = ["TILED=YES"]
+    tile_params = {"min_zoom": 0, "max_zoom": 6, "tile_format": "png"}
 
     try:
         process_files(
-            input_file, bands, georef_params, webmercator_srs, optimized_params
+            input_file, bands, georef_params, webmercator_srs, optimized_params,
+            tile_params=tile_params,
         )
         print("Processing and cleanup completed successfully")
     except Exception as e:
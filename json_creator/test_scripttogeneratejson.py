@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("osgeo")
+
+from scripttogeneratejson import attach_statistics, dataset_statistics
+
+
+class UnreadableBand:
+    def GetNoDataValue(self):
+        return None
+
+    def ReadAsArray(self, *args):
+        raise AssertionError("band read although statistics are off")
+
+    def SetStatistics(self, *args):
+        raise AssertionError("statistics attached although none were computed")
+
+
+class Dataset:
+    RasterCount = 2
+    RasterXSize = 4
+    RasterYSize = 3
+
+    def GetRasterBand(self, band_index):
+        return UnreadableBand()
+
+
+def test_statistics_none_reads_no_pixels():
+    dataset = Dataset()
+    band_stats = dataset_statistics(dataset, "none")
+    assert band_stats == [None, None]
+    attach_statistics(dataset, band_stats)
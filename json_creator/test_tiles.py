@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import rasterio
+from rasterio.transform import from_bounds
+from tiles import generate_tiles
+
+
+def write_source(path, data):
+    # Inside the north-east quadrant of Web Mercator: tiles x 2-3, y 0-1 at zoom 2
+    with rasterio.open(
+        path, "w", driver="GTiff", height=data.shape[0], width=data.shape[1], count=1,
+        dtype="float32", crs="EPSG:3857", transform=from_bounds(1e6, 1e6, 1.9e7, 1.9e7, *data.shape[::-1]),
+    ) as dst:
+        dst.write(data, 1)
+
+
+def tile_files(output_dir):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), output_dir)
+        for root, _, names in os.walk(output_dir) for name in names
+    )
+
+
+def test_regenerating_removes_stale_tiles(tmp_path):
+    source = str(tmp_path / "source.tif")
+    output_dir = str(tmp_path / "tiles")
+    data = np.arange(64 * 64, dtype=np.float32).reshape(64, 64)
+    write_source(source, data)
+    generate_tiles(source, output_dir, 2, 2, workers=1)
+    assert tile_files(output_dir) == ["2/2/0.png", "2/2/1.png", "2/3/0.png", "2/3/1.png"]
+
+    # Left half now nodata, a tile from an older zoom range and a non-tile file
+    data[:, :32] = np.nan
+    write_source(source, data)
+    os.makedirs(os.path.join(output_dir, "5", "0"))
+    open(os.path.join(output_dir, "5", "0", "0.png"), "wb").close()
+    open(os.path.join(output_dir, "README.txt"), "w").close()
+    generate_tiles(source, output_dir, 2, 2, workers=1)
+    assert tile_files(output_dir) == ["2/3/0.png", "2/3/1.png", "README.txt"]
@@ -0,0 +1,344 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib.pyplot as plt
+import rasterio
+from PIL import Image
+from rasterio.enums import Resampling
+from affine import Affine
+from rasterio.transform import from_bounds as transform_from_bounds
+from rasterio.windows import from_bounds
+from rasterio.warp import reproject, transform_bounds
+
+# Web Mercator (EPSG:3857) XYZ tiles, as served to Google Maps / Leaflet
+WEBMERCATOR_SRS = "EPSG:3857"
+TILE_SIZE = 256
+
+# Half the width of the Web Mercator square, in metres
+ORIGIN_SHIFT = 20037508.342789244
+
+TILE_FORMATS = {"png": "PNG", "webp": "WEBP"}
+
+# Raw counts render in grey (higher counts are brighter in VIS and colder in
+# the IR bands); derived products use jet like the manipulation scripts.
+DEFAULT_COLORMAP = "gray"
+PRODUCT_COLORMAPS = {
+    "brightness": "jet",
+    "lst": "jet",
+    "sst": "jet",
+    "olr": "jet",
+    "uth": "jet",
+    "aod": "jet",
+    "ndsi": "jet",
+    "water_vapor_content": "jet",
+    "fire_mask": "hot",
+}
+
+# Percentiles stretched over the colormap when no value range is given
+STRETCH_PERCENTILES = (2, 98)
+
+# Extra source pixels around each tile's footprint, for the resampling kernel
+SOURCE_MARGIN = 2
+
+# Palette entry left transparent for nodata
+NODATA_INDEX = 255
+
+# Set in each worker by _init_worker
+_source = None
+_render = None
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of tile z/x/y in Web Mercator metres."""
+    size = 2 * ORIGIN_SHIFT / 2 ** z
+    west = -ORIGIN_SHIFT + x * size
+    north = ORIGIN_SHIFT - y * size
+    return west, north - size, west + size, north
+
+
+def tiles_for_bounds(bounds, zoom):
+    """(x, y) of every tile at zoom that intersects Web Mercator bounds."""
+    west, south, east, north = bounds
+    count = 2 ** zoom
+    size = 2 * ORIGIN_SHIFT / count
+    x_min = max(int(math.floor((west + ORIGIN_SHIFT) / size)), 0)
+    x_max = min(int(math.ceil((east + ORIGIN_SHIFT) / size)) - 1, count - 1)
+    y_min = max(int(math.floor((ORIGIN_SHIFT - north) / size)), 0)
+    y_max = min(int(math.ceil((ORIGIN_SHIFT - south) / size)) - 1, count - 1)
+    return [
+        (x, y)
+        for x in range(x_min, x_max + 1)
+        for y in range(y_min, y_max + 1)
+    ]
+
+
+def colormap_table(name):
+    """Palette of 256 RGBA entries (uint8): 255 colours from a matplotlib
+    colormap, then a transparent entry for nodata (NODATA_INDEX).
+    """
+    table = np.zeros((256, 4), dtype=np.uint8)
+    table[:NODATA_INDEX] = (plt.get_cmap(name)(np.linspace(0, 1, NODATA_INDEX)) * 255).round()
+    return table
+
+
+def load_source(source_path, band=1, georef_params=None):
+    """Band as float32 with nodata as NaN, plus its transform and CRS.
+
+    Sources without georeferencing (e.g. an HDF5 band) need georef_params,
+    in the {"ulx", "uly", "lrx", "lry", "srs"} form process_files uses.
+    """
+    with rasterio.open(source_path) as src:
+        data = src.read(band).astype(np.float32)
+        if src.nodata is not None:
+            data[data == np.float32(src.nodata)] = np.nan
+        if georef_params is not None:
+            transform = transform_from_bounds(
+                georef_params["ulx"], georef_params["lry"],
+                georef_params["lrx"], georef_params["uly"],
+                src.width, src.height,
+            )
+            crs = georef_params["srs"]
+        else:
+            transform, crs = src.transform, src.crs
+    if crs is None:
+        raise ValueError(f"{source_path} is not georeferenced; pass georef_params")
+    return {"data": data, "transform": transform, "crs": crs}
+
+
+def value_range(data, percentiles=STRETCH_PERCENTILES):
+    """Colormap stretch (vmin, vmax) from percentiles of the valid pixels."""
+    # A strided sample is plenty for percentiles and keeps this cheap
+    sample = data[::4, ::4]
+    sample = sample[np.isfinite(sample)]
+    if sample.size == 0:
+        return 0.0, 1.0
+    vmin, vmax = np.percentile(sample, percentiles)
+    if vmax <= vmin:
+        vmax = vmin + 1.0
+    return float(vmin), float(vmax)
+
+
+def source_mercator_bounds(source):
+    """Bounds of the source in Web Mercator, clipped to the tiled square."""
+    height, width = source["data"].shape
+    west, north = source["transform"] * (0, 0)
+    east, south = source["transform"] * (width, height)
+    bounds = transform_bounds(
+        source["crs"], WEBMERCATOR_SRS,
+        min(west, east), min(south, north), max(west, east), max(south, north),
+        densify_pts=21,
+    )
+    # Sources reaching the poles project to infinite northings
+    bounds = np.nan_to_num(bounds, posinf=ORIGIN_SHIFT, neginf=-ORIGIN_SHIFT)
+    return np.clip(bounds, -ORIGIN_SHIFT, ORIGIN_SHIFT).tolist()
+
+
+def source_window(source, bounds, margin=SOURCE_MARGIN):
+    """(row slice, column slice) of the source covering Web Mercator bounds, or None.
+
+    Warping from this crop instead of the whole band keeps each tile's cost
+    proportional to the pixels it draws from.
+    """
+    height, width = source["data"].shape
+    src_bounds = transform_bounds(WEBMERCATOR_SRS, source["crs"], *bounds, densify_pts=21)
+    if not np.all(np.isfinite(src_bounds)):
+        return slice(0, height), slice(0, width)
+    window = from_bounds(*src_bounds, transform=source["transform"])
+    row_start = max(int(math.floor(window.row_off)) - margin, 0)
+    col_start = max(int(math.floor(window.col_off)) - margin, 0)
+    row_stop = min(int(math.ceil(window.row_off + window.height)) + margin, height)
+    col_stop = min(int(math.ceil(window.col_off + window.width)) + margin, width)
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+    return slice(row_start, row_stop), slice(col_start, col_stop)
+
+
+def render_tile(source, z, x, y, vmin, vmax, resampling=Resampling.bilinear):
+    """Palette indices (uint8) of tile z/x/y, or None when it holds no valid pixel."""
+    bounds = tile_bounds(z, x, y)
+    window = source_window(source, bounds)
+    if window is None:
+        return None
+    rows, cols = window
+    tile = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    reproject(
+        source=source["data"][rows, cols],
+        destination=tile,
+        src_transform=source["transform"] * Affine.translation(cols.start, rows.start),
+        src_crs=source["crs"],
+        src_nodata=np.nan,
+        dst_transform=transform_from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+        dst_crs=WEBMERCATOR_SRS,
+        dst_nodata=np.nan,
+        resampling=resampling,
+    )
+    valid = np.isfinite(tile)
+    if not valid.any():
+        return None
+    scaled = np.clip((tile - vmin) / (vmax - vmin), 0, 1)
+    scaled[~valid] = 0
+    indices = (scaled * (NODATA_INDEX - 1)).round().astype(np.uint8)
+    indices[~valid] = NODATA_INDEX
+    return indices
+
+
+def encode_tile(indices, table, path, tile_format):
+    """Save palette indices through table as a PNG or (lossless) WebP tile."""
+    if tile_format == "png":
+        # Palette PNGs encode several times faster than RGBA and are smaller
+        image = Image.fromarray(indices, "P")
+        image.putpalette(table[:, :3].tobytes())
+        image.info["transparency"] = table[:, 3].tobytes()
+        image.save(path, "PNG")
+    else:
+        Image.fromarray(table[indices], "RGBA").save(path, TILE_FORMATS[tile_format], lossless=True)
+
+
+def _init_worker(source_path, band, georef_params, render):
+    global _source, _render
+    _source = load_source(source_path, band, georef_params)
+    _render = render
+
+
+def tile_path(output_dir, z, x, y, tile_format):
+    return os.path.join(output_dir, str(z), str(x), f"{y}.{tile_format}")
+
+
+def remove_stale_tiles(output_dir, keep):
+    """Delete {z}/{x}/{y} tiles under output_dir whose path is not in keep.
+
+    Only files named like tiles are touched; directories left empty are
+    removed. Returns the number of tiles deleted.
+    """
+    removed = 0
+    if not os.path.isdir(output_dir):
+        return removed
+    for z in os.listdir(output_dir):
+        z_dir = os.path.join(output_dir, z)
+        if not z.isdigit() or not os.path.isdir(z_dir):
+            continue
+        for x in os.listdir(z_dir):
+            x_dir = os.path.join(z_dir, x)
+            if not x.isdigit() or not os.path.isdir(x_dir):
+                continue
+            for name in os.listdir(x_dir):
+                y, _, extension = name.partition(".")
+                path = os.path.join(x_dir, name)
+                if y.isdigit() and extension in TILE_FORMATS and path not in keep:
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(x_dir):
+                os.rmdir(x_dir)
+        if not os.listdir(z_dir):
+            os.rmdir(z_dir)
+    return removed
+
+
+def _write_tile(tile):
+    """Render and save one tile in a worker; returns False when it was empty."""
+    z, x, y = tile
+    indices = render_tile(
+        _source, z, x, y, _render["vmin"], _render["vmax"], _render["resampling"]
+    )
+    if indices is None:
+        return False
+    path = tile_path(_render["output_dir"], z, x, y, _render["tile_format"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    encode_tile(indices, _render["table"], path, _render["tile_format"])
+    return True
+
+
+def generate_tiles(source_path, output_dir, min_zoom=0, max_zoom=6, tile_format="png",
+                   colormap=None, product=None, vmin=None, vmax=None, band=1,
+                   georef_params=None, workers=None, resampling="bilinear"):
+    """Render {output_dir}/{z}/{x}/{y}.{tile_format} tiles for a zoom range.
+
+    Tiles are rendered in parallel across workers processes (every core by
+    default); tiles outside the source or holding only nodata are not
+    written. Tiles a previous run left in output_dir that this one did not
+    write (now empty, or outside the zoom range or bounds) are deleted once
+    the new pyramid is complete. The colormap defaults to the product's in
+    PRODUCT_COLORMAPS and is stretched over vmin..vmax (percentiles of the
+    band when not given). Returns (tiles written, empty tiles skipped).
+    """
+    if tile_format not in TILE_FORMATS:
+        raise ValueError(f"Unsupported tile format {tile_format!r}, expected one of {sorted(TILE_FORMATS)}")
+    source = load_source(source_path, band, georef_params)
+    if vmin is None or vmax is None:
+        low, high = value_range(source["data"])
+        vmin = low if vmin is None else vmin
+        vmax = high if vmax is None else vmax
+    bounds = source_mercator_bounds(source)
+    tiles = [
+        (z, x, y)
+        for z in range(min_zoom, max_zoom + 1)
+        for x, y in tiles_for_bounds(bounds, z)
+    ]
+    del source
+
+    render = {
+        "output_dir": output_dir,
+        "tile_format": tile_format,
+        "vmin": vmin,
+        "vmax": vmax,
+        "table": colormap_table(colormap or PRODUCT_COLORMAPS.get(product, DEFAULT_COLORMAP)),
+        "resampling": Resampling[resampling],
+    }
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(source_path, band, georef_params, render),
+    ) as executor:
+        chunksize = max(1, len(tiles) // (workers * 8))
+        wrote = list(executor.map(_write_tile, tiles, chunksize=chunksize))
+    written = sum(wrote)
+    keep = {
+        tile_path(output_dir, z, x, y, tile_format)
+        for (z, x, y), tile_written in zip(tiles, wrote) if tile_written
+    }
+    removed = remove_stale_tiles(output_dir, keep)
+    print(f"Wrote {written} tiles to {output_dir}, skipped {len(tiles) - written} empty, "
+          f"removed {removed} stale")
+    return written, len(tiles) - written
+
+
+def parse_zoom(text):
+    """'3' or '0-7' as (min_zoom, max_zoom)."""
+    low, _, high = text.partition("-")
+    return int(low), int(high or low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a raster as Web Mercator XYZ tiles")
+    parser.add_argument("source", help="raster to tile, e.g. a band reprojected to EPSG:3857")
+    parser.add_argument("output_dir", help="tile directory ({z}/{x}/{y}.png)")
+    parser.add_argument("--zoom", default="0-6", help="zoom level or range, e.g. 0-7")
+    parser.add_argument("--format", default="png", choices=sorted(TILE_FORMATS))
+    parser.add_argument("--colormap", help=f"matplotlib colormap (default: by product, else {DEFAULT_COLORMAP})")
+    parser.add_argument("--product", help="product name used to pick the colormap")
+    parser.add_argument("--vmin", type=float, help="value at the bottom of the colormap")
+    parser.add_argument("--vmax", type=float, help="value at the top of the colormap")
+    parser.add_argument("--band", type=int, default=1)
+    parser.add_argument("--georef", nargs=5, metavar=("ULX", "ULY", "LRX", "LRY", "SRS"),
+                        help="bounds and CRS for sources without georeferencing")
+    parser.add_argument("--workers", type=int, help="render processes (default: all cores)")
+    parser.add_argument("--resampling", default="bilinear", choices=["nearest", "bilinear", "cubic", "average"])
+    args = parser.parse_args()
+
+    georef_params = None
+    if args.georef:
+        ulx, uly, lrx, lry, srs = args.georef
+        georef_params = {"ulx": float(ulx), "uly": float(uly), "lrx": float(lrx), "lry": float(lry), "srs": srs}
+    min_zoom, max_zoom = parse_zoom(args.zoom)
+    generate_tiles(
+        args.source, args.output_dir, min_zoom, max_zoom, args.format, args.colormap,
+        args.product, args.vmin, args.vmax, args.band, georef_params, args.workers,
+        args.resampling,
+    )
+
+
+if __name__ == "__main__":
+    main()
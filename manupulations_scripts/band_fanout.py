@@ -0,0 +1,252 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
+from calibration import calibrate, lut_calibrate
+from scene_reader import CALIBRATION_ATTRIBUTES, SceneReader
+from h5_metadata import extract_h5_metadata
+from products import (
+    DEFAULT_H5_FILE,
+    FIELDS,
+    PARAMETERS,
+    PRODUCTS as PRODUCT_FILES,
+    parse_parameter,
+    radiance_coefficients,
+    read_lut,
+    write_fire_mask,
+    write_geotiff,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parallel executor for the data rasters of the products in products.py.
+# The parent process reads the scene and decodes every band field the
+# requested rasters need (IMG_*.kelvin, IMG_*.radiance) exactly once,
+# straight into a shared memory block. Each raster's field is then computed
+# from FIELDS in a worker process on read-only NumPy views of those blocks,
+# so no band is pickled, copied or read from HDF5 twice.
+
+# Band fields decoded by the parent, by quantity
+SHARED_QUANTITIES = ('kelvin', 'radiance')
+
+# The single-band rasters of each product, {product: {file name: field}},
+# written with the writers and file names products.py uses for them
+PRODUCTS = {}
+for _product, _spec in PRODUCT_FILES.items():
+    _rasters = {
+        filename: inputs[0]
+        for filename, (writer, inputs) in _spec['files'].items()
+        if writer in (write_geotiff, write_fire_mask)
+    }
+    if _rasters:
+        PRODUCTS[_product] = _rasters
+
+def is_shared(name):
+    return name.partition('.')[2] in SHARED_QUANTITIES
+
+def shared_inputs(name):
+    """Band fields decoded by the parent that field name is computed from."""
+    if name in PARAMETERS:
+        return set()
+    if is_shared(name):
+        return {name}
+    if name not in FIELDS:
+        raise ValueError(f"No field or parameter named {name!r}")
+    if 'scene' in FIELDS[name][1]:
+        raise ValueError(f"Field {name} reads the scene, not a decoded band")
+    return set().union(*(shared_inputs(input_name) for input_name in FIELDS[name][1]))
+
+def compute_field(name, values):
+    """Value of field name, computing the inputs it needs from FIELDS."""
+    if name not in values:
+        function, inputs = FIELDS[name]
+        values[name] = function(*[compute_field(input_name, values) for input_name in inputs])
+    return values[name]
+
+def decode_band(scene, field, out):
+    """Decode band field (e.g. IMG_TIR1.kelvin) of scene into out (C-contiguous float32)."""
+    band_name, _, quantity = field.partition('.')
+    counts = scene.raw(band_name)
+    if quantity == 'kelvin':
+        return lut_calibrate(counts, read_lut(scene, band_name, 'TEMP'), out=out)
+    if quantity == 'radiance':
+        return calibrate(counts, *radiance_coefficients(scene, band_name), out=out)
+    raise ValueError(f"Unknown quantity {quantity!r}")
+
+class SharedBands:
+    """Shared memory blocks owned by the reader process, unlinked on close.
+
+    A block is described to workers by (name, shape, dtype), which pickles
+    to a few bytes whatever the size of the band.
+    """
+
+    def __init__(self):
+        self.blocks = {}
+        self.descriptors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.descriptors
+
+    def allocate(self, key, shape, dtype=np.float32):
+        """Create the block for key and return a writable view of it."""
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.blocks[key] = block
+        self.descriptors[key] = (block.name, tuple(shape), dtype.str)
+        return np.ndarray(shape, dtype, buffer=block.buf)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+        self.descriptors.clear()
+
+# Blocks a worker has mapped, by name; kept for the life of the worker so a
+# band several products read is mapped once per worker.
+_attached = {}
+
+def attach(descriptor):
+    """Read-only view of a shared block, mapped without copying."""
+    name, shape, dtype = descriptor
+    if name not in _attached:
+        block = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        _attached[name] = (block, view)
+    return _attached[name][1]
+
+def share_result(result):
+    """Copy a worker's result into a new block for the parent to collect."""
+    block = shared_memory.SharedMemory(create=True, size=max(result.nbytes, 1))
+    view = np.ndarray(result.shape, result.dtype, buffer=block.buf)
+    view[...] = result
+    del view
+    block.close()
+    return (block.name, result.shape, result.dtype.str)
+
+def collect_result(descriptor):
+    """Copy a block made by share_result into a normal array and free the block."""
+    name, shape, dtype = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        result = view.copy()
+        del view
+    finally:
+        block.close()
+        block.unlink()
+    return result
+
+def _run_field(field, inputs, parameters, outputs, grid):
+    """Worker: compute one field from shared bands, then write its rasters or share it back."""
+    values = dict(parameters)
+    values.update((name, attach(descriptor)) for name, descriptor in inputs.items())
+    result = np.asarray(compute_field(field, values))
+    if outputs:
+        return [writer(path, result, grid) for path, writer in outputs]
+    return share_result(result)
+
+def run_products(h5_file, products=None, output_dir=None, workers=None, metadata=None, parameters=None):
+    """Compute the rasters of products (default: all of PRODUCTS) of one scene in parallel.
+
+    Each band field is decoded once and each raster field computed once,
+    however many products use it; a field is submitted as soon as its last
+    band is decoded, so workers start while later bands are still being
+    read. parameters overrides entries of PARAMETERS. With output_dir the
+    rasters are written there by the workers and {file name: path} is
+    returned, else {field: array}.
+    """
+    products = list(products or PRODUCTS)
+    unknown = [product for product in products if product not in PRODUCTS]
+    if unknown:
+        raise ValueError(f"Unknown product(s) {', '.join(unknown)}, expected some of {', '.join(PRODUCTS)}")
+    unknown = [name for name in parameters or {} if name not in PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {', '.join(unknown)}, expected some of {', '.join(PARAMETERS)}")
+    parameters = dict(PARAMETERS, **(parameters or {}))
+
+    # {field: [(file name, writer)]}, in product order
+    fields = {}
+    for product in products:
+        for filename, field in PRODUCTS[product].items():
+            writer = PRODUCT_FILES[product]['files'][filename][0]
+            fields.setdefault(field, []).append((filename, writer))
+    needed = {field: sorted(shared_inputs(field)) for field in fields}
+    if metadata is None:
+        bands = sorted({name.partition('.')[0] for names in needed.values() for name in names})
+        metadata = extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
+
+    results = {}
+    with SharedBands() as bands, SceneReader(h5_file, metadata) as scene:
+        grid = None
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            grid = scene.grid
+
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            running = {}
+            try:
+                for field, files in fields.items():
+                    for name in needed[field]:
+                        if name not in bands:
+                            shape = scene.raw(name.partition('.')[0]).shape
+                            decode_band(scene, name, bands.allocate(name, shape))
+                    inputs = {name: bands.descriptors[name] for name in needed[field]}
+                    outputs = [(os.path.join(output_dir, filename), writer)
+                               for filename, writer in files] if output_dir else []
+                    running[executor.submit(_run_field, field, inputs, parameters, outputs, grid)] = field
+                # Decoded bands are in shared memory; drop the reader's own copies
+                scene.close()
+            finally:
+                # Every submitted field is collected, even after a failure
+                # while decoding or in another field, so no result block leaks
+                failures = {}
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        field = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            logger.error(f"Field {field} failed: {e}")
+                            failures[field] = e
+                            continue
+                        if output_dir:
+                            results.update((os.path.basename(path), path) for path in result)
+                        else:
+                            results[field] = collect_result(result)
+    if failures:
+        raise RuntimeError(f"{len(failures)} field(s) failed: {', '.join(sorted(failures))}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute product rasters in parallel from bands decoded once")
+    parser.add_argument('h5_file', nargs='?', default=DEFAULT_H5_FILE, help="L1C scene")
+    parser.add_argument('--products', nargs='+', choices=list(PRODUCTS), help="default: all")
+    parser.add_argument('--output-dir', default='.', help="where the product GeoTIFFs are written")
+    parser.add_argument('--set', dest='parameters', action='append', type=parse_parameter, default=[],
+                        metavar='NAME=VALUE', help=f"override a parameter ({', '.join(PARAMETERS)})")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    outputs = run_products(args.h5_file, args.products, args.output_dir, args.workers,
+                           parameters=dict(args.parameters))
+    for filename, path in outputs.items():
+        print(f"{filename}: {path}")
+    print(f"{len(outputs)} rasters in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import time
+import tracemalloc
+import numpy as np
+from calibration import build_lut, calibrate, lut_calibrate
+
+# Shape of an INSAT-3DR L1C ASIA_MER band
+SHAPE = (1616, 1737)
+REPEATS = 20
+
+def legacy_calibrate(counts, scale_factor, offset):
+    """Calibration as the product scripts used to do it (float64, then cast)."""
+    return (counts.astype(float) * scale_factor + offset).astype(np.float32)
+
+def time_call(func, repeats=REPEATS):
+    """Best wall-clock time of func over several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def peak_allocation(func):
+    """Peak bytes allocated while running func once."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 1024, size=SHAPE, dtype=np.uint16)
+    scale_factor, offset = 0.0017001, -0.0148718
+    out = np.empty(SHAPE, dtype=np.float32)
+    lut = build_lut(scale_factor, offset)
+
+    cases = {
+        "legacy float64": lambda: legacy_calibrate(counts, scale_factor, offset),
+        "float32": lambda: calibrate(counts, scale_factor, offset),
+        "float32 preallocated": lambda: calibrate(counts, scale_factor, offset, out=out),
+        "LUT gather": lambda: lut_calibrate(counts, lut),
+        "LUT gather preallocated": lambda: lut_calibrate(counts, lut, out=out),
+    }
+
+    print(f"Calibrating a {SHAPE[0]}x{SHAPE[1]} band, best of {REPEATS} runs")
+    for name, func in cases.items():
+        elapsed = time_call(func)
+        peak = peak_allocation(func) / (1024 * 1024)
+        print(f"{name:>25}: {elapsed:8.2f} ms  peak {peak:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
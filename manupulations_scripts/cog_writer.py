@@ -0,0 +1,133 @@
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from codec_profiles import codec_options
+
+# GDAL's COG driver only supports CreateCopy, so rasterio stages the raster
+# in a MEM dataset and copies it out when the writer is closed: the final
+# file is the only thing written to disk. Overviews are built on the MEM
+# dataset too, and the driver copies them in (OVERVIEWS=AUTO).
+# Compression comes from the codec profile (LZW unless one is selected).
+COG_OPTIONS = {
+    'BIGTIFF': 'YES',
+    'NUM_THREADS': 'ALL_CPUS',
+}
+
+# Overview pyramid per product. levels None means halve until the smallest
+# overview fits in one block. Continuous fields average; categorical masks
+# must keep class values, so they take the most common one.
+OVERVIEW_PROFILES = {
+    'default': {'levels': None, 'resampling': 'average'},
+    'fire_mask': {'levels': None, 'resampling': 'mode'},
+}
+
+# Smallest overview edge, matching the COG driver's default BLOCKSIZE
+OVERVIEW_MIN_SIZE = 512
+
+def overview_levels(height, width, min_size=OVERVIEW_MIN_SIZE):
+    """Decimation factors 2, 4, 8, ... until the overview fits in min_size."""
+    levels = []
+    size = max(height, width)
+    while size > min_size:
+        size = (size + 1) // 2
+        levels.append(2 ** (len(levels) + 1))
+    return levels
+
+def overview_profile(product=None, levels=None, resampling=None):
+    """(levels, resampling) for a product, with explicit arguments taking precedence."""
+    profile = OVERVIEW_PROFILES.get(product, OVERVIEW_PROFILES['default'])
+    if levels is None:
+        levels = profile['levels']
+    return levels, resampling or profile['resampling']
+
+def build_overviews(dst, levels=None, resampling='average'):
+    """Build overviews on an open writer using every CPU; levels [] builds none."""
+    if levels is None:
+        levels = overview_levels(dst.height, dst.width)
+    if not levels:
+        return []
+    with rasterio.Env(GDAL_NUM_THREADS='ALL_CPUS'):
+        dst.build_overviews(levels, Resampling[resampling.lower()])
+    return levels
+
+def cog_profile(height, width, dtype, crs_wkt, transform, count=1, nodata=None, profile=None,
+                **options):
+    """rasterio profile for writing a COG; options override COG_OPTIONS and the codec profile."""
+    creation_options = dict(COG_OPTIONS)
+    creation_options.update(codec_options(profile, dtype, driver='COG'))
+    creation_options.update(options)
+    return dict(
+        driver='COG',
+        height=height,
+        width=width,
+        count=count,
+        dtype=dtype,
+        crs=crs_wkt,
+        transform=transform,
+        nodata=nodata,
+        **creation_options
+    )
+
+def open_cog(path, height, width, dtype, crs_wkt, transform, count=1, nodata=None, profile=None,
+             **options):
+    """Open a COG for writing; windows can be written before close() builds the file."""
+    return rasterio.open(
+        path, 'w',
+        **cog_profile(height, width, dtype, crs_wkt, transform, count, nodata, profile, **options)
+    )
+
+def write_cog(path, data, crs_wkt, transform, nodata=None, tags=None, product=None,
+              overviews=None, resampling=None, profile=None, **options):
+    """Write a 2-D array (or bands-first 3-D array) straight to a COG at path.
+
+    Overview levels and resampling come from OVERVIEW_PROFILES[product]
+    unless overviews / resampling are given; overviews=[] disables them.
+    profile names the codec profile (see codec_profiles).
+    """
+    data = np.asarray(data)
+    if data.ndim == 2:
+        data = data[np.newaxis]
+    count, height, width = data.shape
+    levels, resampling = overview_profile(product, overviews, resampling)
+    if levels == []:
+        options.setdefault('OVERVIEWS', 'NONE')
+    with open_cog(path, height, width, data.dtype, crs_wkt, transform, count, nodata, profile,
+                  **options) as dst:
+        dst.write(data)
+        build_overviews(dst, levels, resampling)
+        if tags:
+            dst.update_tags(**tags)
+    return path
+
+def write_scene_cog(path, bands, crs_wkt, transform, nodata=None, scales=None, offsets=None,
+                    tags=None, band_tags=None, product=None, profile=None, **options):
+    """Write co-registered bands into one pixel-interleaved COG.
+
+    bands maps band name to a 2-D array; the names become band descriptions
+    so readers can pick bands by name. scales/offsets map band name to the
+    values that turn stored pixels into physical ones, and band_tags to
+    extra per-band metadata. The COG driver interleaves multi-band files by
+    pixel, so one tile read returns every band at that location.
+    """
+    names = list(bands)
+    shapes = {bands[name].shape for name in names}
+    if len(shapes) != 1:
+        raise ValueError(f"Bands are not co-registered: shapes {sorted(shapes)}")
+    height, width = shapes.pop()
+    dtype = np.result_type(*[bands[name].dtype for name in names])
+    levels, resampling = overview_profile(product)
+    with open_cog(path, height, width, dtype, crs_wkt, transform, len(names), nodata, profile,
+                  **options) as dst:
+        for band_index, name in enumerate(names, start=1):
+            dst.write(bands[name].astype(dtype, copy=False), band_index)
+            dst.set_band_description(band_index, name)
+            if band_tags and name in band_tags:
+                dst.update_tags(band_index, **band_tags[name])
+        if scales:
+            dst.scales = [scales.get(name, 1.0) for name in names]
+        if offsets:
+            dst.offsets = [offsets.get(name, 0.0) for name in names]
+        build_overviews(dst, levels, resampling)
+        if tags:
+            dst.update_tags(**tags)
+    return path
@@ -0,0 +1,409 @@
+import argparse
+import json
+import os
+import time
+import zipfile
+from functools import partial
+import numpy as np
+import rasterio
+from calibration import DEFAULT_FILL_VALUE, calibrate, lut_calibrate, to_celsius
+from scene_reader import SceneReader
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
+from cog_writer import write_cog
+from script_for_LST import apply_jet_colormap, lst_statistics
+from script_for_sst import sst_statistics
+from script_for_calculating_OLR import calculate_olr, olr_statistics
+from fire_detection import create_fire_visualization, detect_fires, fire_statistics
+from script_for_UTH import calculate_uth, uth_statistics
+from script_for_watervapour_content import calculate_wv_content, wv_statistics
+from script_for_AOD import aod_statistics, calculate_aod
+from script_for_NDSI import apply_jet_colormap as apply_ndsi_colormap, calculate_ndsi, ndsi_statistics
+from script_for_AMV import amv_statistics, calculate_amv
+from solsat_azimuth import (
+    azimuth_grid,
+    azimuth_statistics,
+    create_azimuth_visualization,
+    write_azimuth_tiff,
+)
+
+# Every product of the manipulation scripts as a graph of named fields. A
+# field is (function, inputs): the function is called with the values of its
+# inputs, which name other fields, parameters or 'scene'. Products then name
+# the files they write from those fields. The planner collects the fields a
+# set of products needs, so a field several products share (TIR1 Kelvin,
+# TIR1 Celsius, WV radiance, the grid) is computed once per run, and the run
+# frees each field as soon as the last step reading it has finished. Steps
+# run one at a time: band_fanout computes the products' data rasters from
+# these FIELDS in parallel processes.
+
+DEFAULT_H5_FILE = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+
+BANDS = ['IMG_VIS', 'IMG_SWIR', 'IMG_MIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_WV']
+
+# Parameters of the product algorithms, overridable per run
+PARAMETERS = {
+    'olr.empirical_constant': 1.1,
+    'fire.threshold': 350,
+    'wv.normalization_factor': 1.0,
+    'aod.epsilon': 0.1,
+    'ndsi.snow_threshold': 0.4,
+}
+
+def read_counts(scene, band_name):
+    return scene.raw(band_name)
+
+def read_lut(scene, band_name, quantity):
+    return scene.lut(band_name, quantity)
+
+def radiance_coefficients(scene, band_name):
+    """(scale_factor, offset, fill_value) of the band's lab radiance calibration."""
+    band_attrs = scene.band_attributes(band_name)
+    return (
+        band_attrs['lab_radiance_scale_factor'],
+        band_attrs['lab_radiance_add_offset'],
+        band_attrs.get('_FillValue', DEFAULT_FILL_VALUE),
+    )
+
+def calibrate_counts(counts, coefficients):
+    return calibrate(counts, *coefficients)
+
+def scene_grid(scene):
+    return scene.grid
+
+def scene_root_attributes(scene):
+    return scene.root_attributes
+
+def calibrated_azimuth_grid(stats, key):
+    return azimuth_grid(stats[key]['calibrated'])
+
+def band_fields(band_name):
+    """Fields of one band: counts read once, then every quantity derived from them."""
+    return {
+        f'{band_name}.counts': (partial(read_counts, band_name=band_name), ['scene']),
+        f'{band_name}.temp_lut': (partial(read_lut, band_name=band_name, quantity='TEMP'), ['scene']),
+        f'{band_name}.kelvin': (lut_calibrate, [f'{band_name}.counts', f'{band_name}.temp_lut']),
+        f'{band_name}.celsius': (to_celsius, [f'{band_name}.kelvin']),
+        f'{band_name}.coefficients': (partial(radiance_coefficients, band_name=band_name), ['scene']),
+        f'{band_name}.radiance': (calibrate_counts, [f'{band_name}.counts', f'{band_name}.coefficients']),
+    }
+
+FIELDS = {
+    'grid': (scene_grid, ['scene']),
+    'root_attributes': (scene_root_attributes, ['scene']),
+    # LST and SST are the band brightness temperatures in Celsius
+    'lst.statistics': (lst_statistics, ['IMG_TIR1.celsius']),
+    'sst.statistics': (sst_statistics, ['IMG_TIR2.celsius']),
+    'olr': (calculate_olr, ['IMG_TIR1.kelvin', 'IMG_TIR2.kelvin', 'olr.empirical_constant']),
+    'olr.statistics': (olr_statistics, ['olr']),
+    'fire_mask': (detect_fires, ['IMG_TIR1.kelvin', 'fire.threshold']),
+    'fire.statistics': (fire_statistics, ['fire_mask', 'IMG_TIR1.kelvin', 'fire.threshold']),
+    'uth': (calculate_uth, ['IMG_WV.radiance']),
+    'uth.statistics': (uth_statistics, ['uth']),
+    'wv_content': (calculate_wv_content, ['IMG_WV.radiance', 'wv.normalization_factor']),
+    'wv_content.statistics': (wv_statistics, ['wv_content']),
+    'aod': (calculate_aod, ['IMG_VIS.radiance', 'aod.epsilon']),
+    'aod.statistics': (aod_statistics, ['aod', 'aod.epsilon']),
+    'ndsi': (calculate_ndsi, ['IMG_VIS.radiance', 'IMG_SWIR.radiance']),
+    'ndsi.statistics': (ndsi_statistics, ['ndsi', 'ndsi.snow_threshold']),
+    'amv': (calculate_amv, ['IMG_MIR.radiance', 'IMG_WV.radiance']),
+    'amv.statistics': (amv_statistics, ['amv']),
+    'azimuth.statistics': (azimuth_statistics, ['root_attributes']),
+    'satellite_azimuth': (partial(calibrated_azimuth_grid, key='satellite_azimuth'), ['azimuth.statistics']),
+    'solar_azimuth': (partial(calibrated_azimuth_grid, key='solar_azimuth'), ['azimuth.statistics']),
+}
+for _band_name in BANDS:
+    FIELDS.update(band_fields(_band_name))
+
+def grid_meta(data, grid):
+    return {
+        "driver": "GTiff",
+        "height": data.shape[0],
+        "width": data.shape[1],
+        "transform": grid.transform,
+        "crs": grid.crs_wkt
+    }
+
+def write_geotiff(path, data, grid):
+    """Write a field as a float32 GeoTIFF on the scene grid."""
+    with rasterio.open(path, 'w', count=1, dtype=np.float32, **grid_meta(data, grid),
+                       **codec_options(dtype=np.float32)) as dst:
+        dst.write(data.astype(np.float32), 1)
+    return path
+
+def write_colored(path, data, grid):
+    return apply_jet_colormap(data, path, grid_meta(data, grid))
+
+def write_ndsi_colored(path, data, grid):
+    return apply_ndsi_colormap(data, path, grid_meta(data, grid))
+
+def write_fire_mask(path, fire_mask, grid):
+    # As a COG whose overviews keep 0/1 classes (mode resampling)
+    return write_cog(path, fire_mask, grid.crs_wkt, grid.transform, product='fire_mask')
+
+def write_fire_visualization(path, fire_mask, temperature, grid):
+    return create_fire_visualization(fire_mask, temperature, path, grid_meta(fire_mask, grid))
+
+def write_azimuth(path, data):
+    return write_azimuth_tiff(data, path)
+
+def write_azimuth_visualization(path, data):
+    return create_azimuth_visualization(data, path, {
+        "driver": "GTiff",
+        "height": data.shape[0],
+        "width": data.shape[1],
+        "crs": "EPSG:4326"
+    })
+
+def write_json(path, stats):
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2)
+    return path
+
+def write_zip(path, *files):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file in files:
+            zipf.write(file, os.path.basename(file))
+    return path
+
+# The files of each product, {file name: (writer, inputs)}, zipped into 'zip';
+# names and contents match what the standalone scripts write.
+PRODUCTS = {
+    'lst': {
+        'files': {
+            'lst_result.tif': (write_geotiff, ['IMG_TIR1.celsius', 'grid']),
+            'lst_result_colored.tif': (write_colored, ['IMG_TIR1.celsius', 'grid']),
+            'lst_statistics.json': (write_json, ['lst.statistics']),
+        },
+        'zip': 'lst_results.zip',
+    },
+    'brightness_temperature': {
+        'files': {
+            'IMG_TIR1_brightness.tif': (write_geotiff, ['IMG_TIR1.celsius', 'grid']),
+            'IMG_TIR1_brightness_colored.tif': (write_colored, ['IMG_TIR1.celsius', 'grid']),
+            'IMG_TIR2_brightness.tif': (write_geotiff, ['IMG_TIR2.celsius', 'grid']),
+            'IMG_TIR2_brightness_colored.tif': (write_colored, ['IMG_TIR2.celsius', 'grid']),
+        },
+        'zip': 'brightness_results.zip',
+    },
+    'fire_detection': {
+        'files': {
+            'fire_mask.tif': (write_fire_mask, ['fire_mask', 'grid']),
+            'fire_detection_vis.tif': (write_fire_visualization, ['fire_mask', 'IMG_TIR1.kelvin', 'grid']),
+            'fire_detection_statistics.json': (write_json, ['fire.statistics']),
+        },
+        'zip': 'fire_detection_results.zip',
+    },
+    'olr': {
+        'files': {
+            'olr_result.tif': (write_geotiff, ['olr', 'grid']),
+            'olr_result_colored.tif': (write_colored, ['olr', 'grid']),
+            'olr_statistics.json': (write_json, ['olr.statistics']),
+        },
+        'zip': 'olr_results.zip',
+    },
+    'sst': {
+        'files': {
+            'sst_result.tif': (write_geotiff, ['IMG_TIR2.celsius', 'grid']),
+            'sst_result_colored.tif': (write_colored, ['IMG_TIR2.celsius', 'grid']),
+            'sst_statistics.json': (write_json, ['sst.statistics']),
+        },
+        'zip': 'sst_results.zip',
+    },
+    'uth': {
+        'files': {
+            'uth_result.tif': (write_geotiff, ['uth', 'grid']),
+            'uth_result_colored.tif': (write_colored, ['uth', 'grid']),
+            'uth_statistics.json': (write_json, ['uth.statistics']),
+        },
+        'zip': 'uth_results.zip',
+    },
+    'water_vapor': {
+        'files': {
+            'water_vapor_content.tif': (write_geotiff, ['wv_content', 'grid']),
+            'water_vapor_content_colored.tif': (write_colored, ['wv_content', 'grid']),
+            'water_vapor_statistics.json': (write_json, ['wv_content.statistics']),
+        },
+        'zip': 'water_vapor_results.zip',
+    },
+    'amv': {
+        'files': {
+            'amv_result.tif': (write_geotiff, ['amv', 'grid']),
+            'amv_result_colored.tif': (write_colored, ['amv', 'grid']),
+            'amv_statistics.json': (write_json, ['amv.statistics']),
+        },
+        'zip': 'amv_results.zip',
+    },
+    'aod': {
+        'files': {
+            'aod_result.tif': (write_geotiff, ['aod', 'grid']),
+            'aod_result_colored.tif': (write_colored, ['aod', 'grid']),
+            'aod_statistics.json': (write_json, ['aod.statistics']),
+        },
+        'zip': 'aod_results.zip',
+    },
+    'ndsi': {
+        'files': {
+            'ndsi_result.tif': (write_geotiff, ['ndsi', 'grid']),
+            'ndsi_result_colored.tif': (write_ndsi_colored, ['ndsi', 'grid']),
+            'ndsi_statistics.json': (write_json, ['ndsi.statistics']),
+        },
+        'zip': 'ndsi_results.zip',
+    },
+    'azimuth': {
+        'files': {
+            'satellite_azimuth.tif': (write_azimuth, ['satellite_azimuth']),
+            'satellite_azimuth_vis.tif': (write_azimuth_visualization, ['satellite_azimuth']),
+            'solar_azimuth.tif': (write_azimuth, ['solar_azimuth']),
+            'solar_azimuth_vis.tif': (write_azimuth_visualization, ['solar_azimuth']),
+            'azimuth_calibration.json': (write_json, ['azimuth.statistics']),
+        },
+        'zip': 'azimuth_calibration_results.zip',
+    },
+}
+
+def plan_products(products=None, output_dir='.'):
+    """Steps producing products (default: all), as {name: (function, inputs)}.
+
+    Fields appear once however many products read them, and every step
+    comes after its inputs. File steps are named by their output path and
+    return it; each product ends in its zip step.
+    """
+    products = list(products or PRODUCTS)
+    unknown = [product for product in products if product not in PRODUCTS]
+    if unknown:
+        raise ValueError(f"Unknown product(s) {', '.join(unknown)}, expected some of {', '.join(PRODUCTS)}")
+
+    steps = {}
+
+    def add_field(name, consumers=()):
+        if name in steps or name == 'scene' or name in PARAMETERS:
+            return
+        if name in consumers:
+            raise ValueError(f"Dependency cycle through {name}")
+        if name not in FIELDS:
+            raise ValueError(f"No field or parameter named {name!r} (needed by {consumers[-1]})")
+        function, inputs = FIELDS[name]
+        for input_name in inputs:
+            add_field(input_name, consumers + (name,))
+        steps[name] = (function, inputs)
+
+    for product in products:
+        files = []
+        for filename, (writer, inputs) in PRODUCTS[product]['files'].items():
+            path = os.path.join(output_dir, filename)
+            for input_name in inputs:
+                add_field(input_name, (path,))
+            steps[path] = (partial(writer, path), inputs)
+            files.append(path)
+        zip_path = os.path.join(output_dir, PRODUCTS[product]['zip'])
+        steps[zip_path] = (partial(write_zip, zip_path), files)
+    return steps
+
+def run_plan(steps, values):
+    """Run steps one after another in plan order, seeded with values ('scene' and parameters).
+
+    A step's value is dropped as soon as the last step reading it has run,
+    and arrays are made read-only since several steps share them. Returns
+    ({final step: value}, {step: error}); steps depending on a failed step
+    are not run.
+    """
+    readers = {name: 0 for name in steps}
+    for _, inputs in steps.values():
+        for input_name in set(inputs):
+            if input_name in readers:
+                readers[input_name] += 1
+    finals = {name for name, count in readers.items() if count == 0}
+    values = dict(values)
+    results = {}
+    failures = {}
+    causes = {}
+
+    for name, (function, inputs) in steps.items():
+        failed = [input_name for input_name in inputs if input_name in failures]
+        if failed:
+            # Report the step that actually failed, not the skipped one in between
+            causes[name] = causes.get(failed[0], failed[0])
+            failures[name] = RuntimeError(f"skipped: {causes[name]} failed")
+        else:
+            try:
+                value = function(*[values[input_name] for input_name in inputs])
+            except Exception as e:
+                print(f"Step {name} failed: {e}")
+                failures[name] = e
+            else:
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+                if name in finals:
+                    results[name] = value
+                else:
+                    values[name] = value
+        for input_name in set(inputs):
+            if input_name in readers:
+                readers[input_name] -= 1
+                if readers[input_name] == 0:
+                    values.pop(input_name, None)
+    return results, failures
+
+def run_products(h5_file, products=None, output_dir='.', parameters=None, metadata=None):
+    """Write products (default: all) of one scene; returns {product: zip path}.
+
+    parameters overrides entries of PARAMETERS. Products whose steps fail
+    are left out of the result and reported; the rest are still written.
+    """
+    unknown = [name for name in parameters or {} if name not in PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {', '.join(unknown)}, expected some of {', '.join(PARAMETERS)}")
+    products = list(products or PRODUCTS)
+    os.makedirs(output_dir, exist_ok=True)
+    steps = plan_products(products, output_dir)
+    if metadata is None:
+        bands = [band_name for band_name in BANDS if f'{band_name}.counts' in steps]
+        metadata = extract_h5_metadata(h5_file, datasets=bands)
+
+    # Nothing is cached by the reader: each field lives exactly as long as the plan needs it
+    with SceneReader(h5_file, metadata, max_cache_bytes=0) as scene:
+        values = dict(PARAMETERS, **(parameters or {}), scene=scene)
+        results, failures = run_plan(steps, values)
+
+    outputs = {}
+    for product in products:
+        zip_path = os.path.join(output_dir, PRODUCTS[product]['zip'])
+        if zip_path in results:
+            outputs[product] = zip_path
+        else:
+            print(f"Product {product} failed: {failures[zip_path]}")
+    return outputs
+
+def parse_parameter(text):
+    """'name=value' from the command line, with value as a number."""
+    name, _, value = text.partition('=')
+    value = float(value)
+    return name, int(value) if value.is_integer() else value
+
+def main():
+    parser = argparse.ArgumentParser(description="Write derived products, computing shared fields once")
+    parser.add_argument('h5_file', nargs='?', default=DEFAULT_H5_FILE, help="L1C scene")
+    parser.add_argument('--products', nargs='+', choices=list(PRODUCTS), help="default: all")
+    parser.add_argument('--output-dir', default='.', help="where product files and zips are written")
+    parser.add_argument('--set', dest='parameters', action='append', type=parse_parameter, default=[],
+                        metavar='NAME=VALUE', help=f"override a parameter ({', '.join(PARAMETERS)})")
+    parser.add_argument('--plan', action='store_true', help="print the steps and exit")
+    args = parser.parse_args()
+
+    if args.plan:
+        for name, (_, inputs) in plan_products(args.products, args.output_dir).items():
+            print(f"{name} <- {', '.join(inputs)}")
+        return
+
+    start = time.perf_counter()
+    products = args.products or list(PRODUCTS)
+    outputs = run_products(args.h5_file, products, args.output_dir, dict(args.parameters))
+    for product, path in outputs.items():
+        print(f"{product}: {path}")
+    print(f"{len(outputs)} of {len(products)} products in {time.perf_counter() - start:.1f} s")
+    if len(outputs) < len(products):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
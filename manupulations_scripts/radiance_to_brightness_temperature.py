@@ -1,6 +1,4 @@
-import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 from rasterio.mask import mask
@@ -8,11 +6,14 @@ from pyproj import Transformer
 from shapely.geometry import box, mapping
 import os
 import zipfile
+from calibration import to_celsius
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_TIR1', 'IMG_TIR2')):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
 def transform_geometry_to_crs(geometry, src_crs="EPSG:4326", dst_crs="EPSG:3857"):
     """Transform coordinates to target CRS."""
@@ -23,26 +24,13 @@ def transform_geometry_to_crs(geometry, src_crs="EPSG:4326", dst_crs="EPSG:3857"
     ]
     return {"type": geometry['type'], "coordinates": transformed_coords}
 
-def radiance_to_brightness(data, scale_factor, offset):
-    """Convert radiance to brightness temperature."""
-    return (data.astype(float) * scale_factor + offset) - 273.15
-
-def process_band(h5_file, band_name, metadata):
-    """Process a specific band from H5 file."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f[band_name][:]
-        data = np.squeeze(data)  # Remove single dimensions
-        
-        band_attrs = metadata['datasets'][band_name]['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        brightness = radiance_to_brightness(data, scale_factor, offset)
-        return brightness
+def process_band(scene, band_name):
+    """Brightness temperature of a band in Celsius, from the band's TEMP table."""
+    return to_celsius(scene.brightness_temperature(band_name))
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to data and save as TIFF."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -51,6 +39,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -84,14 +73,12 @@ def zip_results(files_to_zip, output_zip):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Process bands
     bands_to_process = ['IMG_TIR1', 'IMG_TIR2']
@@ -99,13 +86,10 @@ def main():
     
     for band in bands_to_process:
         # Convert radiance to brightness
-        brightness_data = process_band(h5_file, band, metadata)
+        brightness_data = process_band(scene, band)
         
         # Calculate transform
-        transform = rasterio.transform.from_bounds(
-            left_lon, lower_lat, right_lon, upper_lat,
-            brightness_data.shape[1], brightness_data.shape[0]
-        )
+        transform = grid.transform
         
         # Save brightness temperature TIFF
         output_tiff = f"{band}_brightness.tif"
@@ -115,8 +99,9 @@ def main():
                           width=brightness_data.shape[1],
                           count=1,
                           dtype=brightness_data.dtype,
-                          crs='EPSG:4326',
-                          transform=transform) as dst:
+                          crs=grid.crs_wkt,
+                          transform=transform,
+                          **codec_options(dtype=brightness_data.dtype)) as dst:
             dst.write(brightness_data, 1)
         output_files.append(output_tiff)
         
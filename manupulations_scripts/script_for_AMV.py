@@ -1,36 +1,38 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_MIR', 'IMG_WV')):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def process_band_for_amv(h5_file, band_name, metadata):
+def process_band_for_amv(scene, band_name):
     """Process a band and return scaled radiance."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f[band_name][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets'][band_name]['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        scaled_data = data.astype(float) * scale_factor + offset
-        return scaled_data
+    return scene.calibrated(band_name)
 
 def calculate_amv(mir_data, wv_data):
     """Calculate Atmospheric Motion Vectors."""
     return mir_data - wv_data
 
+def amv_statistics(amv):
+    """Summary statistics of AMV."""
+    return {
+        "min_amv": float(np.nanmin(amv)),
+        "max_amv": float(np.nanmax(amv)),
+        "mean_amv": float(np.nanmean(amv)),
+        "std_amv": float(np.nanstd(amv)),
+        "units": "radiance_difference"
+    }
+
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to AMV data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -39,6 +41,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -47,27 +50,22 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Process MIR and WV bands
-    mir_data = process_band_for_amv(h5_file, 'IMG_MIR', metadata)
-    wv_data = process_band_for_amv(h5_file, 'IMG_WV', metadata)
+    mir_data = process_band_for_amv(scene, 'IMG_MIR')
+    wv_data = process_band_for_amv(scene, 'IMG_WV')
     
     # Calculate AMV
     amv = calculate_amv(mir_data, wv_data)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        amv.shape[1], amv.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -79,8 +77,9 @@ def main():
                       width=amv.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(amv.astype(np.float32), 1)
     output_files.append(amv_tiff)
     
@@ -91,18 +90,12 @@ def main():
         "height": amv.shape[0],
         "width": amv.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(amv_colored)
     
     # Calculate and save statistics
-    stats = {
-        "min_amv": float(amv.min()),
-        "max_amv": float(amv.max()),
-        "mean_amv": float(amv.mean()),
-        "std_amv": float(amv.std()),
-        "units": "radiance_difference"
-    }
+    stats = amv_statistics(amv)
     
     stats_file = "amv_statistics.json"
     with open(stats_file, "w") as f:
@@ -1,36 +1,59 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_VIS',)):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def process_band_for_aod(h5_file, metadata, epsilon=0.1):
+def calculate_aod(vis_radiance, epsilon=0.1):
+    """Calculate Aerosol Optical Depth from VIS radiance."""
+    aod = np.add(vis_radiance, np.float32(epsilon))
+    return np.divide(vis_radiance, aod, out=aod)
+
+def process_band_for_aod(scene, epsilon=0.1):
     """Process VIS band for AOD calculation."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f['IMG_VIS'][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets']['IMG_VIS']['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        # Scale radiance
-        vis_radiance = data.astype(float) * scale_factor + offset
-        
-        # Calculate AOD
-        aod = vis_radiance / (vis_radiance + epsilon)
-        return aod
+    return calculate_aod(scene.calibrated('IMG_VIS'), epsilon)
+
+def aod_statistics(aod, epsilon=0.1):
+    """Summary statistics of AOD and the share of pixels per haze class."""
+    # Define AOD thresholds
+    aod_levels = {
+        "clear": (0.0, 0.1),
+        "moderate": (0.1, 0.3),
+        "hazy": (0.3, 0.5),
+        "very_hazy": (0.5, float('inf'))
+    }
+    
+    stats = {
+        "min_aod": float(np.nanmin(aod)),
+        "max_aod": float(np.nanmax(aod)),
+        "mean_aod": float(np.nanmean(aod)),
+        "std_aod": float(np.nanstd(aod)),
+        "epsilon_used": epsilon,
+        "aod_classification": {}
+    }
+    
+    # Calculate percentage for each AOD level
+    total_pixels = aod.size
+    for level, (min_val, max_val) in aod_levels.items():
+        pixels_in_range = np.sum((aod >= min_val) & (aod < max_val))
+        percentage = (pixels_in_range / total_pixels) * 100
+        stats["aod_classification"][level] = {
+            "pixel_count": int(pixels_in_range),
+            "percentage": float(percentage)
+        }
+    return stats
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to AOD data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -39,6 +62,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -47,23 +71,18 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Calculate AOD
-    aod = process_band_for_aod(h5_file, metadata)
+    aod = process_band_for_aod(scene)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        aod.shape[1], aod.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -75,8 +94,9 @@ def main():
                       width=aod.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(aod.astype(np.float32), 1)
     output_files.append(aod_tiff)
     
@@ -87,37 +107,11 @@ def main():
         "height": aod.shape[0],
         "width": aod.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(aod_colored)
     
-    # Calculate AOD statistics
-    # Define AOD thresholds
-    aod_levels = {
-        "clear": (0.0, 0.1),
-        "moderate": (0.1, 0.3),
-        "hazy": (0.3, 0.5),
-        "very_hazy": (0.5, float('inf'))
-    }
-    
-    stats = {
-        "min_aod": float(aod.min()),
-        "max_aod": float(aod.max()),
-        "mean_aod": float(aod.mean()),
-        "std_aod": float(aod.std()),
-        "epsilon_used": 0.1,
-        "aod_classification": {}
-    }
-    
-    # Calculate percentage for each AOD level
-    total_pixels = aod.size
-    for level, (min_val, max_val) in aod_levels.items():
-        pixels_in_range = np.sum((aod >= min_val) & (aod < max_val))
-        percentage = (pixels_in_range / total_pixels) * 100
-        stats["aod_classification"][level] = {
-            "pixel_count": int(pixels_in_range),
-            "percentage": float(percentage)
-        }
+    stats = aod_statistics(aod)
     
     stats_file = "aod_statistics.json"
     with open(stats_file, "w") as f:
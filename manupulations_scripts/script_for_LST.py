@@ -1,36 +1,39 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from calibration import to_celsius
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_TIR1',)):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def calculate_lst(radiance_data, scale_factor, offset):
+def calculate_lst(brightness_temperature):
     """Calculate Land Surface Temperature in Celsius."""
-    return (radiance_data.astype(float) * scale_factor + offset) - 273.15
+    return to_celsius(brightness_temperature)
 
-def process_tir1_for_lst(h5_file, metadata):
+def process_tir1_for_lst(scene):
     """Process TIR1 band for LST calculation."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f['IMG_TIR1'][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets']['IMG_TIR1']['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        lst = calculate_lst(data, scale_factor, offset)
-        return lst
+    return calculate_lst(scene.brightness_temperature('IMG_TIR1'))
+
+def lst_statistics(lst):
+    """Summary statistics of LST in Celsius."""
+    return {
+        "min_lst": float(np.nanmin(lst)),
+        "max_lst": float(np.nanmax(lst)),
+        "mean_lst": float(np.nanmean(lst)),
+        "std_lst": float(np.nanstd(lst)),
+        "units": "celsius"
+    }
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to LST data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -39,6 +42,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -47,23 +51,18 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Calculate LST
-    lst = process_tir1_for_lst(h5_file, metadata)
+    lst = process_tir1_for_lst(scene)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        lst.shape[1], lst.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -75,8 +74,9 @@ def main():
                       width=lst.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(lst.astype(np.float32), 1)
     output_files.append(lst_tiff)
     
@@ -87,18 +87,12 @@ def main():
         "height": lst.shape[0],
         "width": lst.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(lst_colored)
     
     # Save statistics
-    stats = {
-        "min_lst": float(lst.min()),
-        "max_lst": float(lst.max()),
-        "mean_lst": float(lst.mean()),
-        "std_lst": float(lst.std()),
-        "units": "celsius"
-    }
+    stats = lst_statistics(lst)
     
     stats_file = "lst_statistics.json"
     with open(stats_file, "w") as f:
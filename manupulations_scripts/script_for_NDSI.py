@@ -1,29 +1,21 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 from rasterio.mask import mask
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_VIS', 'IMG_SWIR')):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def process_band_for_ndsi(h5_file, band_name, metadata):
+def process_band_for_ndsi(scene, band_name):
     """Process band and return scaled radiance."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f[band_name][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets'][band_name]['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        scaled_data = data.astype(float) * scale_factor + offset
-        return scaled_data
+    return scene.calibrated(band_name)
 
 def calculate_ndsi(green_band, swir_band):
     """Calculate NDSI."""
@@ -35,6 +27,22 @@ def calculate_ndsi(green_band, swir_band):
     # Clip values to [-1, 1] range
     return np.clip(ndsi, -1, 1)
 
+def ndsi_statistics(ndsi, snow_threshold=0.4):
+    """Summary statistics of NDSI and the percentage of pixels above snow_threshold."""
+    snow_pixels = np.sum(ndsi > snow_threshold)
+    total_pixels = ndsi.size
+    snow_coverage = (snow_pixels / total_pixels) * 100
+    
+    stats = {
+        "min_ndsi": float(np.nanmin(ndsi)),
+        "max_ndsi": float(np.nanmax(ndsi)),
+        "mean_ndsi": float(np.nanmean(ndsi)),
+        "std_ndsi": float(np.nanstd(ndsi)),
+        "snow_coverage_percent": float(snow_coverage),
+        "snow_threshold_used": snow_threshold
+    }
+    return stats
+
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to NDSI data."""
     # Normalize from [-1,1] to [0,1] for visualization
@@ -47,6 +55,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -55,27 +64,22 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Process VIS and SWIR bands
-    green_data = process_band_for_ndsi(h5_file, 'IMG_VIS', metadata)
-    swir_data = process_band_for_ndsi(h5_file, 'IMG_SWIR', metadata)
+    green_data = process_band_for_ndsi(scene, 'IMG_VIS')
+    swir_data = process_band_for_ndsi(scene, 'IMG_SWIR')
     
     # Calculate NDSI
     ndsi = calculate_ndsi(green_data, swir_data)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        ndsi.shape[1], ndsi.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -87,8 +91,9 @@ def main():
                       width=ndsi.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(ndsi.astype(np.float32), 1)
     output_files.append(ndsi_tiff)
     
@@ -99,25 +104,11 @@ def main():
         "height": ndsi.shape[0],
         "width": ndsi.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(ndsi_colored)
     
-    # Calculate snow cover statistics
-    snow_threshold = 0.4  # Typical threshold for snow
-    snow_pixels = np.sum(ndsi > snow_threshold)
-    total_pixels = ndsi.size
-    snow_coverage = (snow_pixels / total_pixels) * 100
-    
-    # Save statistics
-    stats = {
-        "min_ndsi": float(ndsi.min()),
-        "max_ndsi": float(ndsi.max()),
-        "mean_ndsi": float(ndsi.mean()),
-        "std_ndsi": float(ndsi.std()),
-        "snow_coverage_percent": float(snow_coverage),
-        "snow_threshold_used": snow_threshold
-    }
+    stats = ndsi_statistics(ndsi)
     
     stats_file = "ndsi_statistics.json"
     with open(stats_file, "w") as f:
@@ -132,7 +123,7 @@ def main():
     
     print(f"NDSI processing completed! Results saved in {zip_filename}")
     print(f"NDSI range: {stats['min_ndsi']:.3f} to {stats['max_ndsi']:.3f}")
-    print(f"Snow coverage: {snow_coverage:.1f}%")
+    print(f"Snow coverage: {stats['snow_coverage_percent']:.1f}%")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,38 +1,41 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_WV',)):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
 def calculate_uth(wv_radiance):
     """Calculate Upper Tropospheric Humidity."""
     # UTH = 100 * (WV / (WV + 1))
-    return 100 * (wv_radiance / (wv_radiance + 1))
+    uth = np.add(wv_radiance, np.float32(1))
+    np.divide(wv_radiance, uth, out=uth)
+    return np.multiply(uth, np.float32(100), out=uth)
 
-def process_wv_band(h5_file, metadata):
+def process_wv_band(scene):
     """Process Water Vapor band data."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f['IMG_WV'][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets']['IMG_WV']['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        # Apply scale factor and offset to radiance
-        wv_processed = data.astype(float) * scale_factor + offset
-        return wv_processed
+    return scene.calibrated('IMG_WV')
+
+def uth_statistics(uth):
+    """Summary statistics of UTH in percent."""
+    return {
+        "min_uth": float(np.nanmin(uth)),
+        "max_uth": float(np.nanmax(uth)),
+        "mean_uth": float(np.nanmean(uth)),
+        "std_uth": float(np.nanstd(uth)),
+        "units": "percent"
+    }
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to UTH data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -41,6 +44,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -49,24 +53,19 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Process WV band and calculate UTH
-    wv_radiance = process_wv_band(h5_file, metadata)
+    wv_radiance = process_wv_band(scene)
     uth = calculate_uth(wv_radiance)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        uth.shape[1], uth.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -78,8 +77,9 @@ def main():
                       width=uth.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(uth.astype(np.float32), 1)
     output_files.append(uth_tiff)
     
@@ -90,18 +90,12 @@ def main():
         "height": uth.shape[0],
         "width": uth.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(uth_colored)
     
     # Save statistics
-    stats = {
-        "min_uth": float(uth.min()),
-        "max_uth": float(uth.max()),
-        "mean_uth": float(uth.mean()),
-        "std_uth": float(uth.std()),
-        "units": "percent"
-    }
+    stats = uth_statistics(uth)
     
     stats_file = "uth_statistics.json"
     with open(stats_file, "w") as f:
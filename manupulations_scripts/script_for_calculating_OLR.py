@@ -1,42 +1,40 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 from rasterio.mask import mask
 from pyproj import Transformer
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
-
-def radiance_to_brightness_kelvin(data, scale_factor, offset):
-    """Convert radiance to brightness temperature in Kelvin."""
-    return (data.astype(float) * scale_factor + offset)
+def load_metadata(h5_file, bands=('IMG_TIR1', 'IMG_TIR2')):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
 def calculate_olr(tir1_temp, tir2_temp, empirical_constant=1.1):
     """Calculate OLR using TIR1 and TIR2 brightness temperatures."""
-    return empirical_constant * (tir1_temp + tir2_temp)
+    olr = np.add(tir1_temp, tir2_temp)
+    return np.multiply(olr, np.float32(empirical_constant), out=olr)
 
-def process_band_for_olr(h5_file, band_name, metadata):
+def process_band_for_olr(scene, band_name):
     """Process a band and return brightness temperature in Kelvin."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f[band_name][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets'][band_name]['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        brightness = radiance_to_brightness_kelvin(data, scale_factor, offset)
-        return brightness
+    return scene.brightness_temperature(band_name)
+
+def olr_statistics(olr):
+    """Summary statistics of OLR."""
+    return {
+        "min_olr": float(np.nanmin(olr)),
+        "max_olr": float(np.nanmax(olr)),
+        "mean_olr": float(np.nanmean(olr)),
+        "std_olr": float(np.nanstd(olr))
+    }
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to OLR data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -45,6 +43,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -53,27 +52,22 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Process TIR1 and TIR2 bands
-    tir1_temp = process_band_for_olr(h5_file, 'IMG_TIR1', metadata)
-    tir2_temp = process_band_for_olr(h5_file, 'IMG_TIR2', metadata)
+    tir1_temp = process_band_for_olr(scene, 'IMG_TIR1')
+    tir2_temp = process_band_for_olr(scene, 'IMG_TIR2')
     
     # Calculate OLR
     olr = calculate_olr(tir1_temp, tir2_temp)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        olr.shape[1], olr.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -85,8 +79,9 @@ def main():
                       width=olr.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(olr.astype(np.float32), 1)
     output_files.append(olr_tiff)
     
@@ -97,17 +92,12 @@ def main():
         "height": olr.shape[0],
         "width": olr.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(olr_colored)
     
     # Save statistics
-    stats = {
-        "min_olr": float(olr.min()),
-        "max_olr": float(olr.max()),
-        "mean_olr": float(olr.mean()),
-        "std_olr": float(olr.std())
-    }
+    stats = olr_statistics(olr)
     
     with open("olr_statistics.json", "w") as f:
         json.dump(stats, f, indent=2)
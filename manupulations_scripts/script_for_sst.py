@@ -1,41 +1,40 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 from rasterio.mask import mask
 import os
 import zipfile
+from calibration import to_celsius
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_TIR2',)):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def calculate_sst(radiance_data, scale_factor, offset):
+def calculate_sst(brightness_temperature):
     """Calculate Sea Surface Temperature."""
-    # SST = (R * S) + O - 273.15 (convert to Celsius)
-    return (radiance_data.astype(float) * scale_factor + offset) - 273.15
+    # SST = BT - 273.15 (convert to Celsius)
+    return to_celsius(brightness_temperature)
 
-def process_band_for_sst(h5_file, metadata):
+def process_band_for_sst(scene):
     """Process TIR2 band for SST calculation."""
-    with h5py.File(h5_file, 'r') as f:
-        # Extract TIR2 data
-        data = f['IMG_TIR2'][:]
-        data = np.squeeze(data)
-        
-        # Get conversion parameters
-        band_attrs = metadata['datasets']['IMG_TIR2']['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        # Calculate SST
-        sst = calculate_sst(data, scale_factor, offset)
-        return sst
+    return calculate_sst(scene.brightness_temperature('IMG_TIR2'))
+
+def sst_statistics(sst):
+    """Summary statistics of SST."""
+    return {
+        "min_sst": float(np.nanmin(sst)),
+        "max_sst": float(np.nanmax(sst)),
+        "mean_sst": float(np.nanmean(sst)),
+        "std_sst": float(np.nanstd(sst))
+    }
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to SST data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -44,6 +43,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -52,23 +52,18 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Calculate SST
-    sst = process_band_for_sst(h5_file, metadata)
+    sst = process_band_for_sst(scene)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        sst.shape[1], sst.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -80,8 +75,9 @@ def main():
                       width=sst.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(sst.astype(np.float32), 1)
     output_files.append(sst_tiff)
     
@@ -92,17 +88,12 @@ def main():
         "height": sst.shape[0],
         "width": sst.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(sst_colored)
     
     # Save statistics
-    stats = {
-        "min_sst": float(sst.min()),
-        "max_sst": float(sst.max()),
-        "mean_sst": float(sst.mean()),
-        "std_sst": float(sst.std())
-    }
+    stats = sst_statistics(sst)
     
     stats_file = "sst_statistics.json"
     with open(stats_file, "w") as f:
@@ -1,34 +1,60 @@
 import json
 import rasterio
-import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from scene_reader import CALIBRATION_ATTRIBUTES, open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+def load_metadata(h5_file, bands=('IMG_WV',)):
+    """Calibration attributes of the bands this script reads (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=bands, attributes=CALIBRATION_ATTRIBUTES)
 
-def process_wv_band(h5_file, metadata, normalization_factor=1.0):
+def calculate_wv_content(wv_radiance, normalization_factor=1.0):
+    """Calculate water vapor content from WV radiance."""
+    wv_content = np.divide(wv_radiance, np.float32(normalization_factor))
+    return np.multiply(wv_content, np.float32(100), out=wv_content)
+
+def process_wv_band(scene, normalization_factor=1.0):
     """Process Water Vapor band and calculate content."""
-    with h5py.File(h5_file, 'r') as f:
-        data = f['IMG_WV'][:]
-        data = np.squeeze(data)
-        
-        band_attrs = metadata['datasets']['IMG_WV']['attributes']
-        scale_factor = band_attrs['lab_radiance_scale_factor']
-        offset = band_attrs['lab_radiance_add_offset']
-        
-        # Scale radiance and calculate water vapor content
-        wv_radiance = data.astype(float) * scale_factor + offset
-        wv_content = 100 * (wv_radiance / normalization_factor)
-        return wv_content
+    return calculate_wv_content(scene.calibrated('IMG_WV'), normalization_factor)
+
+def wv_statistics(wv_content):
+    """Summary statistics of water vapor content and the share of pixels per humidity class."""
+    wv_levels = {
+        "very_dry": (0, 20),
+        "dry": (20, 40),
+        "moderate": (40, 60),
+        "humid": (60, 80),
+        "very_humid": (80, float('inf'))
+    }
+    
+    # Calculate statistics
+    stats = {
+        "min_wv": float(np.nanmin(wv_content)),
+        "max_wv": float(np.nanmax(wv_content)),
+        "mean_wv": float(np.nanmean(wv_content)),
+        "std_wv": float(np.nanstd(wv_content)),
+        "classifications": {}
+    }
+    
+    # Calculate percentage for each humidity level
+    total_pixels = wv_content.size
+    for level, (min_val, max_val) in wv_levels.items():
+        pixels_in_range = np.sum((wv_content >= min_val) & (wv_content < max_val))
+        percentage = (pixels_in_range / total_pixels) * 100
+        stats["classifications"][level] = {
+            "pixel_count": int(pixels_in_range),
+            "percentage": float(percentage),
+            "range": f"{min_val}-{max_val}%"
+        }
+    return stats
 
 def apply_jet_colormap(data, output_file, input_meta):
     """Apply jet colormap to water vapor content data."""
-    data_normalized = (data - data.min()) / (data.max() - data.min())
+    data_normalized = (data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data))
     cmap = plt.get_cmap('jet')
     colored_data = cmap(data_normalized)[:, :, :3]
     
@@ -37,6 +63,7 @@ def apply_jet_colormap(data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -45,23 +72,18 @@ def apply_jet_colormap(data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Get spatial reference info
-    left_lon = metadata['root_attributes']['left_longitude']
-    right_lon = metadata['root_attributes']['right_longitude']
-    lower_lat = metadata['root_attributes']['lower_latitude']
-    upper_lat = metadata['root_attributes']['upper_latitude']
+    grid = scene.grid
     
     # Calculate water vapor content
-    wv_content = process_wv_band(h5_file, metadata)
+    wv_content = process_wv_band(scene)
     
     # Calculate transform
-    transform = rasterio.transform.from_bounds(
-        left_lon, lower_lat, right_lon, upper_lat,
-        wv_content.shape[1], wv_content.shape[0]
-    )
+    transform = grid.transform
     
     output_files = []
     
@@ -73,8 +95,9 @@ def main():
                       width=wv_content.shape[1],
                       count=1,
                       dtype=np.float32,
-                      crs='EPSG:4326',
-                      transform=transform) as dst:
+                      crs=grid.crs_wkt,
+                      transform=transform,
+                      **codec_options(dtype=np.float32)) as dst:
         dst.write(wv_content.astype(np.float32), 1)
     output_files.append(wv_tiff)
     
@@ -85,38 +108,11 @@ def main():
         "height": wv_content.shape[0],
         "width": wv_content.shape[1],
         "transform": transform,
-        "crs": "EPSG:4326"
+        "crs": grid.crs_wkt
     })
     output_files.append(wv_colored)
     
-    # Calculate classifications
-    wv_levels = {
-        "very_dry": (0, 20),
-        "dry": (20, 40),
-        "moderate": (40, 60),
-        "humid": (60, 80),
-        "very_humid": (80, float('inf'))
-    }
-    
-    # Calculate statistics
-    stats = {
-        "min_wv": float(wv_content.min()),
-        "max_wv": float(wv_content.max()),
-        "mean_wv": float(wv_content.mean()),
-        "std_wv": float(wv_content.std()),
-        "classifications": {}
-    }
-    
-    # Calculate percentage for each humidity level
-    total_pixels = wv_content.size
-    for level, (min_val, max_val) in wv_levels.items():
-        pixels_in_range = np.sum((wv_content >= min_val) & (wv_content < max_val))
-        percentage = (pixels_in_range / total_pixels) * 100
-        stats["classifications"][level] = {
-            "pixel_count": int(pixels_in_range),
-            "percentage": float(percentage),
-            "range": f"{min_val}-{max_val}%"
-        }
+    stats = wv_statistics(wv_content)
     
     stats_file = "water_vapor_statistics.json"
     with open(stats_file, "w") as f:
@@ -4,11 +4,19 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import zipfile
+from scene_reader import open_scene
+from h5_metadata import extract_h5_metadata
+from codec_profiles import codec_options
 
-def load_metadata():
-    """Load metadata from JSON file."""
-    with open('metadata.json', 'r') as f:
-        return json.load(f)
+# Root attributes azimuth_statistics reads
+AZIMUTH_ATTRIBUTES = [
+    'Sat_Azimuth(Degrees)', 'Sun_Azimuth(Degrees)',
+    'Sat_Azimuth_scale_factor', 'Sun_Azimuth_scale_factor',
+]
+
+def load_metadata(h5_file):
+    """Root azimuth attributes of the scene, without walking its datasets (see h5_metadata)."""
+    return extract_h5_metadata(h5_file, datasets=[], attributes=AZIMUTH_ATTRIBUTES)
 
 def calibrate_azimuth(raw_azimuth, scale_factor):
     """Calibrate azimuth values."""
@@ -20,6 +28,53 @@ def get_direction(azimuth):
     index = int((azimuth + 22.5) // 45 % 8)
     return directions[index]
 
+def azimuth_statistics(root_attributes):
+    """Raw and calibrated satellite and solar azimuths with their directions."""
+    # Get azimuth values and scale factors
+    sat_azimuth = root_attributes['Sat_Azimuth(Degrees)']
+    sun_azimuth = root_attributes['Sun_Azimuth(Degrees)']
+    
+    # Example scale factors (adjust based on actual metadata)
+    sat_scale_factor = root_attributes.get('Sat_Azimuth_scale_factor', 1.0)
+    sun_scale_factor = root_attributes.get('Sun_Azimuth_scale_factor', 1.0)
+    
+    cal_sat_azimuth = calibrate_azimuth(sat_azimuth, sat_scale_factor)
+    cal_sun_azimuth = calibrate_azimuth(sun_azimuth, sun_scale_factor)
+    
+    return {
+        "satellite_azimuth": {
+            "raw": float(sat_azimuth),
+            "calibrated": float(cal_sat_azimuth),
+            "direction": get_direction(cal_sat_azimuth)
+        },
+        "solar_azimuth": {
+            "raw": float(sun_azimuth),
+            "calibrated": float(cal_sun_azimuth),
+            "direction": get_direction(cal_sun_azimuth)
+        },
+        "scale_factors": {
+            "satellite": float(sat_scale_factor),
+            "solar": float(sun_scale_factor)
+        }
+    }
+
+def azimuth_grid(azimuth, height=500, width=500):
+    """Constant grid of one azimuth, for visualization."""
+    return np.full((height, width), azimuth)
+
+def write_azimuth_tiff(data, output_file):
+    """Write an azimuth grid as a float32 GeoTIFF."""
+    with rasterio.open(output_file, 'w',
+                      driver='GTiff',
+                      height=data.shape[0],
+                      width=data.shape[1],
+                      count=1,
+                      dtype=np.float32,
+                      crs='EPSG:4326',
+                      **codec_options(dtype=np.float32)) as dst:
+        dst.write(data.astype(np.float32), 1)
+    return output_file
+
 def create_azimuth_visualization(azimuth_data, output_file, input_meta):
     """Create circular visualization of azimuth data."""
     # Normalize to [0, 360]
@@ -42,6 +97,7 @@ def create_azimuth_visualization(azimuth_data, output_file, input_meta):
         "count": 3,
         "dtype": "float32"
     })
+    out_meta.update(codec_options(dtype=np.float32))
     
     with rasterio.open(output_file, "w", **out_meta) as dest:
         for i in range(3):
@@ -50,24 +106,19 @@ def create_azimuth_visualization(azimuth_data, output_file, input_meta):
 
 def main():
     # Load metadata
-    metadata = load_metadata()
-    
-    # Get azimuth values and scale factors
-    sat_azimuth = metadata['root_attributes']['Sat_Azimuth(Degrees)']
-    sun_azimuth = metadata['root_attributes']['Sun_Azimuth(Degrees)']
-    
-    # Example scale factors (adjust based on actual metadata)
-    sat_scale_factor = metadata.get('root_attributes', {}).get('Sat_Azimuth_scale_factor', 1.0)
-    sun_scale_factor = metadata.get('root_attributes', {}).get('Sun_Azimuth_scale_factor', 1.0)
+    h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    metadata = load_metadata(h5_file)
+    scene = open_scene(h5_file, metadata)
     
     # Calibrate azimuths
-    cal_sat_azimuth = calibrate_azimuth(sat_azimuth, sat_scale_factor)
-    cal_sun_azimuth = calibrate_azimuth(sun_azimuth, sun_scale_factor)
+    stats = azimuth_statistics(scene.root_attributes)
+    cal_sat_azimuth = stats["satellite_azimuth"]["calibrated"]
+    cal_sun_azimuth = stats["solar_azimuth"]["calibrated"]
     
     # Create dummy spatial data for visualization
-    height, width = 500, 500
-    sat_azimuth_grid = np.full((height, width), cal_sat_azimuth)
-    sun_azimuth_grid = np.full((height, width), cal_sun_azimuth)
+    sat_azimuth_grid = azimuth_grid(cal_sat_azimuth)
+    sun_azimuth_grid = azimuth_grid(cal_sun_azimuth)
+    height, width = sat_azimuth_grid.shape
     
     output_files = []
     
@@ -75,14 +126,7 @@ def main():
     for name, data in [("satellite", sat_azimuth_grid), ("solar", sun_azimuth_grid)]:
         # Save raw azimuth data
         azimuth_tiff = f"{name}_azimuth.tif"
-        with rasterio.open(azimuth_tiff, 'w',
-                          driver='GTiff',
-                          height=height,
-                          width=width,
-                          count=1,
-                          dtype=np.float32,
-                          crs='EPSG:4326') as dst:
-            dst.write(data.astype(np.float32), 1)
+        write_azimuth_tiff(data, azimuth_tiff)
         output_files.append(azimuth_tiff)
         
         # Create visualization
@@ -95,24 +139,6 @@ def main():
         })
         output_files.append(vis_tiff)
     
-    # Calculate statistics and directions
-    stats = {
-        "satellite_azimuth": {
-            "raw": float(sat_azimuth),
-            "calibrated": float(cal_sat_azimuth),
-            "direction": get_direction(cal_sat_azimuth)
-        },
-        "solar_azimuth": {
-            "raw": float(sun_azimuth),
-            "calibrated": float(cal_sun_azimuth),
-            "direction": get_direction(cal_sun_azimuth)
-        },
-        "scale_factors": {
-            "satellite": float(sat_scale_factor),
-            "solar": float(sun_scale_factor)
-        }
-    }
-    
     stats_file = "azimuth_calibration.json"
     with open(stats_file, "w") as f:
         json.dump(stats, f, indent=2)
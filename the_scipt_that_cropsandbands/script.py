@@ -69,6 +69,40 @@ def crop_tiff(input_tiff, geometry):
         logger.error(f"Error cropping raster: {str(e)}")
         raise
 
+def crop_scene_bands(scene_path, geometry, band_names):
+    """Crop named bands of a multi-band scene COG in one masked read.
+
+    scene_path may be a local file or a URL; rasterio reads only the tiles
+    under the geometry, and pixel interleaving brings every band with them.
+    Returns ({band_name: array}, mask, meta).
+    """
+    try:
+        with rasterio.open(scene_path) as src:
+            indexes = [src.descriptions.index(name) + 1 for name in band_names]
+            transformed_geometry = transform_geom('EPSG:4326', src.crs, geometry)
+            
+            logger.info(f"Raster bounds: {src.bounds}")
+            
+            out_image, out_transform = mask(src, [transformed_geometry], crop=True, indexes=indexes)
+            out_meta = src.meta.copy()
+            
+            mask_array = create_mask(transformed_geometry,
+                                   (out_image.shape[1], out_image.shape[2]),
+                                   out_transform)
+            
+            out_meta.update({
+                "driver": "GTiff",
+                "count": 1,
+                "height": out_image.shape[1],
+                "width": out_image.shape[2],
+                "transform": out_transform,
+                "nodata": None
+            })
+            return dict(zip(band_names, out_image)), mask_array, out_meta
+    except ValueError as e:
+        logger.error(f"Error cropping raster: {str(e)}")
+        raise
+
 def calculate_ndvi(nir_array, red_array, mask_array):
     """Calculate NDVI from NIR and RED bands with masking."""
     # Convert to float to avoid integer division
@@ -121,22 +155,32 @@ def main():
         config = json.load(f)
     
     try:
-        # Download and crop TIFF files
-        red_url = config['urls'][0]  # VIS (RED) band
-        nir_url = config['urls'][1]  # SWIR band (substitute for NIR)
-        
-        # Download files
-        logger.info("Downloading files...")
-        red_file = download_tiff(red_url, "red.tif")
-        nir_file = download_tiff(nir_url, "nir.tif")
-        
         # Get geometry from config
         geometry = config['polygon']['geometry']
+        downloaded = []
         
-        logger.info("Cropping images...")
-        # Crop both images
-        red_data, mask_array, meta = crop_tiff(red_file, geometry)
-        nir_data, _, _ = crop_tiff(nir_file, geometry)
+        if 'scene_url' in config:
+            # One multi-band scene COG: both bands come from the same tiles
+            logger.info("Cropping scene...")
+            red_band, nir_band = config.get('scene_bands', ['IMG_VIS', 'IMG_SWIR'])
+            bands, mask_array, meta = crop_scene_bands(config['scene_url'], geometry,
+                                                       [red_band, nir_band])
+            red_data, nir_data = bands[red_band], bands[nir_band]
+        else:
+            # Download and crop TIFF files
+            red_url = config['urls'][0]  # VIS (RED) band
+            nir_url = config['urls'][1]  # SWIR band (substitute for NIR)
+            
+            # Download files
+            logger.info("Downloading files...")
+            red_file = download_tiff(red_url, "red.tif")
+            nir_file = download_tiff(nir_url, "nir.tif")
+            downloaded = [red_file, nir_file]
+            
+            logger.info("Cropping images...")
+            # Crop both images
+            red_data, mask_array, meta = crop_tiff(red_file, geometry)
+            nir_data, _, _ = crop_tiff(nir_file, geometry)
         
         logger.info("Calculating NDVI...")
         # Calculate NDVI with mask
@@ -162,8 +206,8 @@ def main():
         logger.info(f"Colored NDVI saved as {output_file}")
         
         # Cleanup downloaded files
-        os.remove(red_file)
-        os.remove(nir_file)
+        for file in downloaded:
+            os.remove(file)
         
         # Zip results
         files_to_zip = [output_file]
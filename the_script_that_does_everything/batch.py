@@ -0,0 +1,187 @@
+import argparse
+import glob
+import json
+import os
+import time
+from pipeline import Pipeline, PipelineError
+from worflowscript import build_pipeline, determine_product_level
+
+DEFAULT_JOURNAL = 'batch_journal.jsonl'
+
+# The stages are the workflow's conversion, COG and metadata tasks (see
+# worflowscript.build_pipeline). Derived products are not batch stages:
+# they live in manupulations_scripts with their own copies of the reader
+# modules, and run per scene with products.py or band_fanout.py there.
+
+BANDS = ["VIS", "MIR", "SWIR", "TIR1", "TIR2", "WV"]
+
+class Journal:
+    """Append-only record of finished and failed (scene, stage) tasks, one JSON object per line.
+
+    Every line is flushed and fsynced before the next task can depend on
+    it, so after a crash the journal holds exactly the tasks that finished.
+    A torn last line is ignored, and a failure recorded after a task
+    finished makes it run again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'error' in entry:
+                        self.done.pop(entry['task'], None)
+                    else:
+                        self.done[entry['task']] = entry
+        self._file = open(path, 'a')
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return entry
+
+    def record(self, task, outputs):
+        entry = self._append({
+            'task': task,
+            'finished_at': time.time(),
+            'outputs': outputs,
+            'bytes': sum(os.path.getsize(path) for path in outputs),
+        })
+        self.done[task] = entry
+        return entry
+
+    def record_failure(self, task, error):
+        self.done.pop(task, None)
+        return self._append({'task': task, 'failed_at': time.time(), 'error': error})
+
+    def completed(self, pipeline):
+        """Tasks of pipeline the journal records as done whose outputs still exist."""
+        return {
+            name for name, task in pipeline.tasks.items()
+            if name in self.done and all(os.path.exists(path) for path in task.outputs)
+        }
+
+    def close(self):
+        self._file.close()
+
+def expand_inputs(patterns, list_files=()):
+    """Scene paths from paths/globs and files listing one path per line, deduplicated in order."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    for list_file in list_files:
+        with open(list_file, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+def scene_prefix(h5_file):
+    return f"{os.path.splitext(os.path.basename(h5_file))[0]}/"
+
+def missing_inputs(scenes):
+    """{'{scene}/input': error} for scenes that do not exist."""
+    return {
+        f"{scene_prefix(path)}input": FileNotFoundError(f"Input {path} does not exist")
+        for path in scenes if not os.path.exists(path)
+    }
+
+def build_batch(scenes, output_root):
+    """One pipeline holding every scene's tasks, named {scene}/{stage}."""
+    pipeline = Pipeline()
+    for h5_file in scenes:
+        try:
+            determine_product_level(os.path.basename(h5_file))
+        except ValueError as e:
+            print(f"Skipping {h5_file}: {e}")
+            continue
+        prefix = scene_prefix(h5_file)
+        output_dir = os.path.join(output_root, prefix.rstrip('/'))
+        build_pipeline(h5_file, BANDS, output_dir, pipeline=pipeline, prefix=prefix)
+    return pipeline
+
+def summarize(pipeline, scenes, completed_before, finished, failures, elapsed):
+    """Print scenes/hour and bytes/s for the tasks this run executed."""
+    scene_tasks = {}
+    for name in list(pipeline.tasks) + [name for name in failures if name not in pipeline.tasks]:
+        scene_tasks.setdefault(name.split('/', 1)[0], []).append(name)
+    inputs = {os.path.splitext(os.path.basename(path))[0]: path for path in scenes}
+
+    resumed = processed = failed = 0
+    input_bytes = 0
+    for scene, names in scene_tasks.items():
+        if all(name in completed_before for name in names):
+            resumed += 1
+        elif any(name in failures for name in names):
+            failed += 1
+        elif all(name in completed_before or name in finished for name in names):
+            processed += 1
+            input_bytes += os.path.getsize(inputs[scene])
+    output_bytes = sum(entry['bytes'] for entry in finished.values())
+
+    hours = elapsed / 3600
+    print(f"Scenes: {processed} processed, {resumed} already done, {failed} failed")
+    print(f"Tasks: {len(finished)} run, {len(completed_before)} resumed, {len(failures)} failed")
+    print(f"Elapsed: {elapsed:.1f} s")
+    if elapsed > 0:
+        print(f"Throughput: {processed / hours:.1f} scenes/hour, "
+              f"{input_bytes / elapsed / 1e6:.1f} MB/s read, {output_bytes / elapsed / 1e6:.1f} MB/s written")
+
+def run_batch(scenes, output_root, journal_path=DEFAULT_JOURNAL, workers=None, processes=True):
+    """Run every (scene, stage) task not yet in the journal; returns the failures.
+
+    Failures are recorded in the journal too. A scene that does not exist
+    fails as its '{scene}/input' task; the other scenes still run.
+    """
+    failures = missing_inputs(scenes)
+    pipeline = build_batch([path for path in scenes if os.path.exists(path)], output_root)
+    journal = Journal(journal_path)
+    completed_before = journal.completed(pipeline)
+    print(f"{len(pipeline.tasks)} tasks for {len(scenes)} scenes, {len(completed_before)} already done")
+
+    finished = {}
+
+    def on_complete(name, result):
+        finished[name] = journal.record(name, pipeline.tasks[name].outputs)
+
+    start = time.perf_counter()
+    try:
+        try:
+            pipeline.run(workers, completed=completed_before, on_complete=on_complete,
+                         processes=processes)
+        except PipelineError as e:
+            failures.update(e.failures)
+        for name, error in sorted(failures.items()):
+            print(f"Failed {name}: {error}")
+            journal.record_failure(name, str(error))
+    finally:
+        journal.close()
+    summarize(pipeline, scenes, completed_before, finished, failures,
+              time.perf_counter() - start)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Process many scenes, resuming from the journal")
+    parser.add_argument('inputs', nargs='*', help="scene paths or globs, e.g. 'archive/3RIMG_*SEP2024*.h5'")
+    parser.add_argument('--list', action='append', default=[], help="file listing one scene per line")
+    parser.add_argument('--output-root', default='batch_outputs', help="one output directory per scene")
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL, help="completion journal to resume from")
+    parser.add_argument('--workers', type=int, help="tasks run at once (default: all cores)")
+    parser.add_argument('--threads', action='store_true', help="run tasks on threads instead of processes")
+    args = parser.parse_args()
+
+    scenes = expand_inputs(args.inputs, args.list)
+    if not scenes:
+        parser.error("no input scenes")
+    failures = run_batch(scenes, os.path.abspath(args.output_root), args.journal, args.workers,
+                         processes=not args.threads)
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+import h5py
+import numpy as np
+
+# Extracted metadata is cached per file identity (path, size, mtime): in
+# process, and as JSON under DEFAULT_CACHE_DIR so later runs skip the walk.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'insat_metadata')
+
+_extracted = {}
+
+def convert_attribute_value(value):
+    """Convert HDF5 attribute value to JSON serializable format.
+
+    Arrays become lists (a single element is unwrapped), numpy scalars
+    Python ones and byte strings text, so a value reads back from the JSON
+    cache exactly as it was extracted.
+    """
+    if isinstance(value, (np.ndarray, list)):
+        if len(value) == 1:
+            return convert_attribute_value(value[0])
+        return [convert_attribute_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+def is_reference_dtype(dtype):
+    """True for object/region references, alone or inside vlen, array or compound types.
+
+    Dimension-scale bookkeeping (DIMENSION_LIST, REFERENCE_LIST) is stored
+    this way and only serializes as "<HDF5 object reference>".
+    """
+    if h5py.check_dtype(ref=dtype) is not None:
+        return True
+    base = h5py.check_dtype(vlen=dtype)
+    if base is not None and not isinstance(base, type):
+        return is_reference_dtype(base)
+    if dtype.subdtype is not None:
+        return is_reference_dtype(dtype.subdtype[0])
+    if dtype.fields:
+        return any(is_reference_dtype(field[0]) for field in dtype.fields.values())
+    return False
+
+def read_attributes(obj, names=None):
+    """Attributes of an HDF5 object, skipping reference-typed ones; names limits which."""
+    attributes = {}
+    for name in obj.attrs.keys():
+        if names is not None and name not in names:
+            continue
+        # The type is checked before the value is read, so references cost nothing
+        if is_reference_dtype(obj.attrs.get_id(name).dtype):
+            continue
+        attributes[name] = convert_attribute_value(obj.attrs[name])
+    return attributes
+
+def dataset_info(dataset, attributes=None):
+    return {
+        'shape': list(dataset.shape),
+        'dtype': str(dataset.dtype),
+        'attributes': read_attributes(dataset, attributes),
+    }
+
+def file_key(h5_file_path):
+    """Cache key of a file: hash of its absolute path, size and mtime."""
+    stat = os.stat(h5_file_path)
+    identity = json.dumps([os.path.abspath(h5_file_path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+def cache_file(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.json') if cache_dir else None
+
+def walk_metadata(h5_file_path):
+    """Root attributes and every dataset's shape, dtype and attributes."""
+    metadata = {}
+    with h5py.File(h5_file_path, 'r') as f:
+        metadata['root_attributes'] = read_attributes(f)
+        metadata['datasets'] = {}
+
+        def extract_dataset_info(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                metadata['datasets'][name] = dataset_info(obj)
+
+        f.visititems(extract_dataset_info)
+    metadata['file_info'] = {
+        'filename': h5_file_path,
+        'extracted_date': datetime.now().isoformat(),
+    }
+    return metadata
+
+def cached_metadata(h5_file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Full metadata of a file, walked once per file identity."""
+    key = file_key(h5_file_path)
+    if key in _extracted:
+        return _extracted[key]
+
+    cache_path = cache_file(cache_dir, key)
+    metadata = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            # A damaged cache entry only costs a walk
+            metadata = None
+    if metadata is None:
+        metadata = walk_metadata(h5_file_path)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(metadata, f)
+            os.replace(temp_path, cache_path)
+    _extracted[key] = metadata
+    return metadata
+
+def select_metadata(metadata, datasets=None, attributes=None):
+    """Copy of metadata keeping only the named datasets and attributes (None keeps all)."""
+    def keep(attrs):
+        if attributes is None:
+            return dict(attrs)
+        return {name: value for name, value in attrs.items() if name in attributes}
+
+    selected = {
+        'root_attributes': keep(metadata['root_attributes']),
+        'datasets': {},
+        'file_info': dict(metadata['file_info']),
+    }
+    for name, info in metadata['datasets'].items():
+        if datasets is not None and name not in datasets:
+            continue
+        selected['datasets'][name] = dict(info, attributes=keep(info['attributes']))
+    return selected
+
+def extract_h5_metadata(h5_file_path, datasets=None, attributes=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Extract metadata from HDF5 file.
+
+    Returns root_attributes, datasets ({name: shape, dtype, attributes})
+    and file_info, without reference-typed attributes. datasets and
+    attributes restrict the result to those names. The full walk is cached
+    per file identity (cache_dir None keeps it in process only); a
+    selection on a file not walked yet reads just the selected datasets.
+    """
+    key = file_key(h5_file_path)
+    cache_path = cache_file(cache_dir, key)
+    walked = key in _extracted or (cache_path is not None and os.path.exists(cache_path))
+    if datasets is None or walked:
+        return select_metadata(cached_metadata(h5_file_path, cache_dir), datasets, attributes)
+
+    metadata = {'datasets': {}}
+    with h5py.File(h5_file_path, 'r') as f:
+        metadata['root_attributes'] = read_attributes(f, attributes)
+        for name in datasets:
+            if name in f and isinstance(f[name], h5py.Dataset):
+                metadata['datasets'][name] = dataset_info(f[name], attributes)
+    metadata['file_info'] = {
+        'filename': h5_file_path,
+        'extracted_date': datetime.now().isoformat(),
+    }
+    return metadata
@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import signal
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import h5py
+from worflowscript import determine_product_level
+
+# Scenes as delivered, e.g. 3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5
+SCENE_PATTERN = re.compile(r'^3RIMG_.*\.h5$')
+
+# Polling fallback: seconds between scans, and how long a file's size and
+# mtime must stay unchanged before it counts as complete
+DEFAULT_POLL_INTERVAL = 10
+DEFAULT_SETTLE_SECONDS = 30
+
+# GDAL block cache of each warm worker, in MB
+DEFAULT_GDAL_CACHEMAX = 512
+
+def is_complete_scene(path):
+    """True when path opens as HDF5; a file still being copied fails HDF5's EOF check."""
+    try:
+        with h5py.File(path, 'r'):
+            return True
+    except OSError:
+        return False
+
+class PollingWatcher:
+    """Report scenes in a directory once their size and mtime have settled."""
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS):
+        self.directory = directory
+        self.interval = interval
+        self.settle = settle
+        self._seen = {}
+        self._reported = set()
+        self._next_scan = 0.0
+
+    def poll(self, timeout):
+        """Complete scenes found within timeout seconds (at most one scan)."""
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(delay, 0))
+        self._next_scan = time.monotonic() + self.interval
+        now = time.monotonic()
+        complete = []
+        for entry in os.scandir(self.directory):
+            if not SCENE_PATTERN.match(entry.name) or not entry.is_file():
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._seen.get(entry.path)
+            if previous is None or previous[0] != signature:
+                self._seen[entry.path] = (signature, now)
+                continue
+            if (entry.path, signature) in self._reported or now - previous[1] < self.settle:
+                continue
+            if is_complete_scene(entry.path):
+                self._reported.add((entry.path, signature))
+                complete.append(entry.path)
+        return complete
+
+class InotifyWatcher:
+    """Report scenes when their writer closes them or they are moved in (needs inotify_simple).
+
+    A scene that does not open yet when its event arrives is checked again
+    every interval seconds until it does or is removed.
+    """
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL):
+        from inotify_simple import INotify, flags
+        self.directory = directory
+        self.interval = interval
+        self._inotify = INotify()
+        self._inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+        # Scenes that arrived while the service was down
+        self._pending = [
+            entry.path for entry in os.scandir(directory)
+            if SCENE_PATTERN.match(entry.name) and entry.is_file()
+        ]
+        # Incomplete scenes, by path, with when to check them again
+        self._retry = {}
+
+    def poll(self, timeout):
+        paths, self._pending = self._pending, []
+        now = time.monotonic()
+        paths += [path for path, at in self._retry.items() if at <= now]
+        if not paths and self._retry:
+            timeout = min(timeout, max(min(self._retry.values()) - now, 0))
+        for event in self._inotify.read(timeout=0 if paths else int(timeout * 1000)):
+            if SCENE_PATTERN.match(event.name):
+                paths.append(os.path.join(self.directory, event.name))
+
+        complete = []
+        for path in dict.fromkeys(paths):
+            self._retry.pop(path, None)
+            if is_complete_scene(path):
+                complete.append(path)
+            elif os.path.exists(path):
+                self._retry[path] = time.monotonic() + self.interval
+        return complete
+
+def open_watcher(directory, poll_interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS):
+    """InotifyWatcher where inotify is available, else PollingWatcher."""
+    try:
+        return InotifyWatcher(directory, poll_interval)
+    except (ImportError, OSError):
+        return PollingWatcher(directory, poll_interval, settle)
+
+class SceneQueue:
+    """Persistent queue of scenes (sqlite), so nothing is lost across restarts.
+
+    A scene is identified by path, size and mtime: a file replaced by a new
+    delivery is queued again, a duplicate report of the same file is not.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS scenes (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                status TEXT,
+                error TEXT,
+                queued_at REAL,
+                finished_at REAL
+            )
+        ''')
+        # Scenes running when the service stopped start again
+        self._db.execute("UPDATE scenes SET status = 'queued' WHERE status = 'running'")
+        self._db.commit()
+
+    def enqueue(self, path):
+        """Queue path unless this version of it is already known; returns True if queued."""
+        stat = os.stat(path)
+        row = self._db.execute(
+            'SELECT size, mtime_ns FROM scenes WHERE path = ?', (path,)
+        ).fetchone()
+        if row == (stat.st_size, stat.st_mtime_ns):
+            return False
+        self._db.execute(
+            'INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, NULL, ?, NULL)',
+            (path, stat.st_size, stat.st_mtime_ns, 'queued', time.time()),
+        )
+        self._db.commit()
+        return True
+
+    def take(self):
+        """Oldest queued scene, marked running, or None."""
+        row = self._db.execute(
+            "SELECT path FROM scenes WHERE status = 'queued' ORDER BY queued_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE scenes SET status = 'running' WHERE path = ?", row)
+        self._db.commit()
+        return row[0]
+
+    def finish(self, path, error=None):
+        self._db.execute(
+            'UPDATE scenes SET status = ?, error = ?, finished_at = ? WHERE path = ?',
+            ('failed' if error else 'done', error, time.time(), path),
+        )
+        self._db.commit()
+
+    def count(self, status):
+        return self._db.execute(
+            'SELECT COUNT(*) FROM scenes WHERE status = ?', (status,)
+        ).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+_workflow = None
+
+def _init_worker(gdal_cachemax):
+    """Load GDAL, h5py and the workflow once per worker process."""
+    global _workflow
+    os.environ.setdefault('GDAL_CACHEMAX', str(gdal_cachemax))
+    import worflowscript
+    _workflow = worflowscript
+
+def _process_scene(path, output_root, task_workers):
+    output_dir = os.path.join(output_root, os.path.splitext(os.path.basename(path))[0])
+    start = time.perf_counter()
+    _workflow.process_satellite_data(path, output_dir, task_workers)
+    return time.perf_counter() - start
+
+def run_service(watch_dir, output_root, queue_path, workers=2, task_workers=None,
+                poll_interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS,
+                gdal_cachemax=DEFAULT_GDAL_CACHEMAX):
+    """Watch watch_dir and process every complete scene until SIGINT/SIGTERM.
+
+    Scenes are queued in queue_path and handed to at most workers warm
+    worker processes at a time; the rest wait in the queue (backpressure),
+    so a burst of deliveries never starts more work than the pool can run.
+    On shutdown, running scenes finish and queued ones wait for the next start.
+    """
+    watcher = open_watcher(watch_dir, poll_interval, settle)
+    print(f"Watching {watch_dir} with {type(watcher).__name__}")
+    queue = SceneQueue(queue_path)
+    stopping = []
+
+    def stop(signum, frame):
+        print("Stopping after the running scenes")
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(gdal_cachemax,)) as executor:
+        while not stopping or running:
+            if not stopping:
+                for path in watcher.poll(timeout=0 if running else 1):
+                    try:
+                        determine_product_level(os.path.basename(path))
+                    except ValueError as e:
+                        print(f"Ignoring {path}: {e}")
+                        continue
+                    if queue.enqueue(path):
+                        print(f"Queued {path} ({queue.count('queued')} waiting)")
+
+                while len(running) < workers:
+                    path = queue.take()
+                    if path is None:
+                        break
+                    print(f"Processing {path}")
+                    running[executor.submit(_process_scene, path, output_root, task_workers)] = path
+
+            if running:
+                done, _ = wait(running, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        elapsed = future.result()
+                    except Exception as e:
+                        print(f"Failed {path}: {e}")
+                        queue.finish(path, str(e))
+                    else:
+                        print(f"Finished {path} in {elapsed:.1f} s")
+                        queue.finish(path)
+    queue.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Process INSAT-3DR scenes as they arrive")
+    parser.add_argument('watch_dir', help="directory the 3RIMG_*.h5 scenes are delivered to")
+    parser.add_argument('--output-root', default='processed', help="one output directory per scene")
+    parser.add_argument('--queue', default='ingest_queue.sqlite', help="persistent scene queue")
+    parser.add_argument('--workers', type=int, default=2, help="scenes processed at once")
+    parser.add_argument('--task-workers', type=int, help="pipeline tasks run at once per scene")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between scans without inotify")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="seconds a file must stay unchanged without inotify")
+    parser.add_argument('--gdal-cachemax', type=int, default=DEFAULT_GDAL_CACHEMAX,
+                        help="GDAL block cache per worker, in MB")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_root, exist_ok=True)
+    run_service(os.path.abspath(args.watch_dir), os.path.abspath(args.output_root), args.queue,
+                args.workers, args.task_workers, args.poll_interval, args.settle,
+                args.gdal_cachemax)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 from osgeo import gdal
 import os
+from raster_stats import read_stats_sidecar, remove_stats_sidecars, write_stats_sidecars
 
 def convert_to_cog(input_tif, output_tif):
-    """Convert a GeoTIFF to Cloud Optimized GeoTIFF with LZW compression"""
+    """Convert a GeoTIFF to Cloud Optimized GeoTIFF with LZW compression
+
+    The COG holds the same pixels, so statistics stored with input_tif
+    (see raster_stats) are stored with it too.
+    """
     cog_options = gdal.TranslateOptions(
         format='GTiff',
         creationOptions=[
@@ -13,6 +18,10 @@ def convert_to_cog(input_tif, output_tif):
         ]
     )
     gdal.Translate(output_tif, input_tif, options=cog_options)
+    band_stats = read_stats_sidecar(input_tif)
+    remove_stats_sidecars(output_tif)
+    if band_stats is not None:
+        write_stats_sidecars(output_tif, band_stats)
 
 def process_satellite_subdataset(input_h5_file, subdataset, output_dir):
     if not os.path.exists(output_dir):
@@ -4,16 +4,23 @@ import rasterio
 from rasterio.transform import from_bounds
 from pyproj import CRS, Transformer
 import logging
+from raster_stats import remove_stats_sidecars, streaming_stats, write_stats_sidecars
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_and_project_subdatasets(h5_file_path, output_dir):
+def extract_and_project_subdatasets(h5_file_path, output_dir, keys=None, statistics='exact'):
     """
     Extract and project base image subdatasets from HDF5 file using Mercator projection
+
+    keys limits the conversion to some of the base images. Band statistics
+    ('exact', 'approx' or 'none', see raster_stats) are taken from the
+    pixels being written and stored as sidecars, so the metadata step does
+    not scan the file again. Returns the paths written.
     """
     # Base image keys to process
     BASE_IMAGES = ['IMG_MIR', 'IMG_SWIR', 'IMG_TIR1', 'IMG_TIR2', 'IMG_VIS', 'IMG_WV']
+    outputs = []
     
     proj_params = {
         'proj': 'merc',
@@ -45,7 +52,7 @@ def extract_and_project_subdatasets(h5_file_path, output_dir):
     right, top = transformer.transform(bounds['right'], bounds['top'])
 
     with h5py.File(h5_file_path, 'r') as h5f:
-        for key in BASE_IMAGES:
+        for key in keys or BASE_IMAGES:
             try:
                 if key not in h5f:
                     logger.warning(f"Skipping {key} - not found in file")
@@ -68,6 +75,10 @@ def extract_and_project_subdatasets(h5_file_path, output_dir):
                 data = data * scale_factor + add_offset
                 
                 output_path = f"{output_dir}/{key}.tif"
+                remove_stats_sidecars(output_path)
+                stats = streaming_stats(statistics)
+                if stats is not None:
+                    stats.update(data)
                 
                 transform = from_bounds(
                     left, bottom, right, top,
@@ -90,11 +101,15 @@ def extract_and_project_subdatasets(h5_file_path, output_dir):
                         'WAVELENGTH': h5f[key].attrs.get(f'{key}_central_wavelength', ''),
                         'UNITS': h5f[key].attrs.get(f'{key}_RADIANCE_units', '')
                     })
+                if stats is not None:
+                    write_stats_sidecars(output_path, [stats.result()])
                 logger.info(f"Successfully written {output_path}")
+                outputs.append(output_path)
                 
             except Exception as e:
                 logger.error(f"Error processing {key}: {str(e)}")
                 continue
+    return outputs
 
 if __name__ == "__main__":
     h5_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+class PipelineError(Exception):
+    """Raised by Pipeline.run when tasks failed; failures maps task name to the
+    error and results holds what the other tasks returned.
+    """
+
+    def __init__(self, failures, results=None):
+        # Both go to args, so the error unpickles intact when it is raised
+        # in a worker process
+        super().__init__(failures, results or {})
+        self.failures = failures
+        self.results = results or {}
+
+    def __str__(self):
+        names = ', '.join(sorted(self.failures))
+        return f"{len(self.failures)} task(s) failed: {names}"
+
+class Task:
+    """A call with the files it reads (inputs) and the files it must produce (outputs)."""
+
+    def __init__(self, name, func, args=(), kwargs=None, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def run(self):
+        result = self.func(*self.args, **self.kwargs)
+        missing = [path for path in self.outputs if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"{self.name} did not produce {', '.join(missing)}")
+        return result
+
+class Pipeline:
+    """Tasks linked through their files, run in process on a thread (or process) pool.
+
+    A task depends on the tasks whose outputs it lists as inputs; inputs no
+    task produces must already exist. Each task is submitted the moment its
+    last dependency completes, so no stage waits on a timer or sees a file
+    that is still being written. Dependents of a failed task are skipped.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def add(self, name, func, *args, inputs=(), outputs=(), **kwargs):
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task {name!r}")
+        self.tasks[name] = Task(name, func, args, kwargs, inputs, outputs)
+        return name
+
+    def dependencies(self):
+        """{task name: set of task names it waits for}, checking every input has a source."""
+        producers = {}
+        for task in self.tasks.values():
+            for path in task.outputs:
+                if path in producers:
+                    raise ValueError(f"{path} is produced by both {producers[path]} and {task.name}")
+                producers[path] = task.name
+        dependencies = {}
+        for task in self.tasks.values():
+            dependencies[task.name] = set()
+            for path in task.inputs:
+                if path in producers:
+                    dependencies[task.name].add(producers[path])
+                elif not os.path.exists(path):
+                    raise FileNotFoundError(f"Input {path} of {task.name} does not exist and no task produces it")
+        return dependencies
+
+    def run(self, workers=None, completed=(), on_complete=None, processes=False):
+        """Run every task and return {task name: result}.
+
+        Tasks named in completed are taken as done (result None) and not run.
+        on_complete(name, result) is called as each task succeeds. With
+        processes the tasks run in worker processes, so functions and
+        arguments must pickle. Raises PipelineError once nothing else can
+        run if any task failed.
+        """
+        dependencies = self.dependencies()
+        completed = {name for name in completed if name in self.tasks}
+        dependents = {name: set() for name in self.tasks}
+        for name, upstream in dependencies.items():
+            for dependency in upstream:
+                dependents[dependency].add(name)
+        waiting = {name: len(upstream - completed) for name, upstream in dependencies.items()}
+
+        results = {name: None for name in completed}
+        failures = {}
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor_class(max_workers=workers or os.cpu_count()) as executor:
+            running = {}
+
+            def submit_ready(names):
+                for name in names:
+                    if waiting[name] == 0 and name not in completed:
+                        print(f"Starting {name}")
+                        running[executor.submit(self.tasks[name].run)] = name
+
+            def skip(name):
+                for dependent in dependents[name]:
+                    if dependent not in failures:
+                        failures[dependent] = RuntimeError(f"skipped: {name} failed")
+                        skip(dependent)
+
+            submit_ready(self.tasks)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"Task {name} failed: {e}")
+                        failures[name] = e
+                        skip(name)
+                        continue
+                    print(f"Finished {name}")
+                    if on_complete is not None:
+                        on_complete(name, results[name])
+                    ready = []
+                    for dependent in dependents[name]:
+                        waiting[dependent] -= 1
+                        ready.append(dependent)
+                    submit_ready(ready)
+
+        unfinished = set(self.tasks) - set(results) - set(failures)
+        if unfinished:
+            raise ValueError(f"Dependency cycle between {', '.join(sorted(unfinished))}")
+        if failures:
+            raise PipelineError(failures, results)
+        return results
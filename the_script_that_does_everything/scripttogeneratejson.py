@@ -1,50 +1,18 @@
 from osgeo import gdal
-import h5py
 import json
-import numpy as np
-from datetime import datetime
 import os
 import glob
-
-def convert_attribute_value(value):
-    """Convert HDF5 attribute value to JSON serializable format."""
-    if isinstance(value, (np.ndarray, list)):
-        if len(value) == 1:
-            return value[0].item() if isinstance(value[0], np.generic) else value[0]
-        return [item.item() if isinstance(item, np.generic) else item for item in value]
-    if isinstance(value, np.generic):
-        return value.item()
-    return value
-
-def extract_h5_metadata(h5_file_path):
-    """Extract metadata from HDF5 file."""
-    metadata = {}
-    with h5py.File(h5_file_path, "r") as f:
-        metadata["root_attributes"] = {
-            attr_name: convert_attribute_value(f.attrs[attr_name])
-            for attr_name in f.attrs.keys()
-        }
-        metadata["datasets"] = {}
-        def extract_dataset_info(name, obj):
-            if isinstance(obj, h5py.Dataset):
-                metadata["datasets"][name] = {
-                    "shape": list(obj.shape),
-                    "dtype": str(obj.dtype),
-                    "attributes": {
-                        key: convert_attribute_value(obj.attrs[key])
-                        for key in obj.attrs.keys()
-                    },
-                }
-        f.visititems(extract_dataset_info)
-        metadata["file_info"] = {
-            "filename": h5_file_path,
-            "extracted_date": datetime.now().isoformat(),
-        }
-    return metadata
+from raster_stats import read_stats_sidecar
+from h5_metadata import extract_h5_metadata
 
 def extract_tiff_metadata(tiff_file_path):
-    """Extract metadata from TIFF file using GDAL."""
-    return gdal.Info(tiff_file_path, format="json", stats=True)
+    """Extract metadata from TIFF file using GDAL.
+
+    Statistics stored with the file while it was written (see raster_stats)
+    are reported as they are; only files without them are scanned.
+    """
+    stats = read_stats_sidecar(tiff_file_path) is None
+    return gdal.Info(tiff_file_path, format="json", stats=stats)
 
 def save_json_metadata(metadata, output_file):
     """Save metadata dictionary to JSON file."""
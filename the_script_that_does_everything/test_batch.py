@@ -0,0 +1,56 @@
+import json
+import pytest
+
+pytest.importorskip('osgeo')
+
+import batch
+from pipeline import Pipeline
+
+def read_journal(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f]
+
+def test_missing_input_is_journaled(tmp_path, monkeypatch):
+    present = tmp_path / '3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5'
+    present.write_bytes(b'')
+    missing = tmp_path / '3RIMG_05SEP2024_1015_L1C_ASIA_MER_V01R00.h5'
+    built = []
+
+    def build_batch(scenes, output_root):
+        built.extend(scenes)
+        return Pipeline()
+
+    monkeypatch.setattr(batch, 'build_batch', build_batch)
+    journal = tmp_path / 'journal.jsonl'
+    failures = batch.run_batch([str(present), str(missing)], str(tmp_path / 'out'), str(journal))
+
+    assert built == [str(present)]
+    assert list(failures) == ['3RIMG_05SEP2024_1015_L1C_ASIA_MER_V01R00/input']
+    [entry] = read_journal(journal)
+    assert entry['task'] == '3RIMG_05SEP2024_1015_L1C_ASIA_MER_V01R00/input'
+    assert entry['error'] == f"Input {missing} does not exist"
+
+def fail(message):
+    raise ValueError(message)
+
+def test_failure_in_worker_process_is_journaled(tmp_path, monkeypatch):
+    scene = tmp_path / '3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5'
+    scene.write_bytes(b'')
+    output = str(tmp_path / 'converted.tif')
+    pipeline = Pipeline()
+    pipeline.add('3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/convert', fail, 'bad band',
+                 inputs=[str(scene)], outputs=[output])
+    pipeline.add('3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/metadata', open, output, inputs=[output])
+    monkeypatch.setattr(batch, 'build_batch', lambda scenes, output_root: pipeline)
+
+    journal = tmp_path / 'journal.jsonl'
+    failures = batch.run_batch([str(scene)], str(tmp_path / 'out'), str(journal),
+                               workers=1, processes=True)
+
+    assert str(failures['3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/convert']) == 'bad band'
+    errors = {entry['task']: entry['error'] for entry in read_journal(journal)}
+    assert errors == {
+        '3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/convert': 'bad band',
+        '3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/metadata':
+            'skipped: 3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00/convert failed',
+    }
@@ -0,0 +1,25 @@
+import pickle
+import pytest
+from pipeline import Pipeline, PipelineError
+
+def fail(message):
+    raise ValueError(message)
+
+def test_pipeline_error_pickles():
+    error = PipelineError({'b': RuntimeError('skipped: a failed'), 'a': ValueError('bad')}, {'c': 1})
+    restored = pickle.loads(pickle.dumps(error))
+    assert str(restored) == "2 task(s) failed: a, b"
+    assert sorted(restored.failures) == ['a', 'b']
+    assert str(restored.failures['a']) == 'bad'
+    assert restored.results == {'c': 1}
+
+def test_failure_in_worker_process(tmp_path):
+    pipeline = Pipeline()
+    output = str(tmp_path / 'a.txt')
+    pipeline.add('a', fail, 'bad input', outputs=[output])
+    pipeline.add('b', open, output, inputs=[output])
+    with pytest.raises(PipelineError) as raised:
+        pipeline.run(workers=1, processes=True)
+    assert str(raised.value) == "2 task(s) failed: a, b"
+    assert str(raised.value.failures['a']) == 'bad input'
+    assert str(raised.value.failures['b']) == 'skipped: a failed'
@@ -0,0 +1,43 @@
+import h5py
+import numpy as np
+import pytest
+import l1c
+from raster_stats import read_stats_sidecar
+
+def write_scene(path):
+    counts = np.arange(12, dtype=np.uint16).reshape(1, 3, 4)
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('IMG_TIR1', data=counts)
+    return counts.astype(np.float64)
+
+def test_l1c_stores_statistics_of_the_written_pixels(tmp_path):
+    data = write_scene(tmp_path / 'scene.h5')
+    [output] = l1c.extract_and_project_subdatasets(str(tmp_path / 'scene.h5'), str(tmp_path),
+                                                   keys=['IMG_TIR1'])
+    [stats] = read_stats_sidecar(output)
+    assert stats['minimum'] == data.min()
+    assert stats['maximum'] == data.max()
+    assert stats['mean'] == pytest.approx(data.mean())
+    assert stats['stddev'] == pytest.approx(data.std())
+
+def test_metadata_step_reads_the_sidecar(tmp_path, monkeypatch):
+    pytest.importorskip('osgeo')
+    import l1b
+    import scripttogeneratejson
+
+    write_scene(tmp_path / 'scene.h5')
+    [tiff] = l1c.extract_and_project_subdatasets(str(tmp_path / 'scene.h5'), str(tmp_path),
+                                                 keys=['IMG_TIR1'])
+    cog = str(tmp_path / 'IMG_TIR1_cog.tif')
+    l1b.convert_to_cog(tiff, cog)
+    assert read_stats_sidecar(cog) == read_stats_sidecar(tiff)
+
+    calls = []
+    monkeypatch.setattr(scripttogeneratejson.gdal, 'Info',
+                        lambda path, **kwargs: calls.append((path, kwargs)) or {})
+    scripttogeneratejson.extract_tiff_metadata(cog)
+    assert calls == [(cog, {'format': 'json', 'stats': False})]
+
+    # A file without a sidecar is still scanned
+    scripttogeneratejson.extract_tiff_metadata(str(tmp_path / 'other.tif'))
+    assert calls[-1][1]['stats'] is True
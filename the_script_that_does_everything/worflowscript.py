@@ -1,13 +1,13 @@
+import argparse
 import os
-import re
-import time
 from scripttogeneratejson import (
     extract_h5_metadata, 
     save_json_metadata, 
     process_tiff_metadata
 )
-import subprocess
-import glob
+from pipeline import Pipeline
+import l1b
+import l1c
 
 def determine_product_level(filename):
     """Determine if file is L1B, L1C, or L2C based on filename."""
@@ -20,78 +20,89 @@ def determine_product_level(filename):
     else:
         raise ValueError("Unknown product level in filename")
 
-def wait_for_tiff_files(bands, timeout=60):
-    """Wait for TIFF files to be generated and collect their paths."""
-    start_time = time.time()
-    tiff_files = set()
-    
-    while time.time() - start_time < timeout:
-        for band_name in bands:
-            pattern = f"IMG_{band_name}*.tif"
-            found_files = glob.glob(pattern)
-            tiff_files.update(found_files)
-            
-        if len(tiff_files) >= len(bands):
-            break
-        time.sleep(1)
-    
-    return list(tiff_files)
-
-def process_satellite_data(input_h5_file):
-    """Main workflow function to process satellite data."""
-    # Step 1: Generate H5 metadata
-    print("Generating H5 metadata...")
+def write_h5_metadata(input_h5_file, metadata_filename):
     h5_metadata = extract_h5_metadata(input_h5_file)
-    metadata_filename = f"{os.path.splitext(input_h5_file)[0]}_metadata.json"
     save_json_metadata(h5_metadata, metadata_filename)
     print(f"Saved H5 metadata to {metadata_filename}")
 
-    # Define bands to process
-    bands = ["VIS", "MIR", "SWIR", "TIR1", "TIR2", "WV"]
+def write_tiff_metadata(tiff_file):
+    """Per-TIFF metadata task; raises so the pipeline records the failure."""
+    if not process_tiff_metadata(tiff_file):
+        raise RuntimeError(f"Metadata extraction failed for {tiff_file}")
+
+def tiff_metadata_path(tiff_file):
+    return f"{os.path.splitext(tiff_file)[0]}_metadata.json"
+
+def build_pipeline(input_h5_file, bands, output_dir=None, pipeline=None, prefix=''):
+    """Tasks for one input file: H5 metadata, then per band convert -> COG -> metadata.
 
-    # Step 2: Determine product level and process accordingly
+    Each task starts as soon as the file it reads has been written,
+    independently of the other bands. Every output, the H5 metadata JSON
+    included, goes to output_dir, which defaults to projected_data for L1C
+    and region_outputs for L1B, as l1c.py and l1b.py use. Tasks are added
+    to pipeline (a new one by default) with prefix before their names, so
+    several scenes can share one pipeline.
+    """
+    if pipeline is None:
+        pipeline = Pipeline()
     product_level = determine_product_level(input_h5_file)
     print(f"Detected product level: {product_level}")
 
-    # Step 3: Process based on product level
-    try:
+    if output_dir is None:
+        output_dir = 'projected_data' if product_level == 'L1C' else 'region_outputs'
+    os.makedirs(output_dir, exist_ok=True)
+    metadata_filename = os.path.join(
+        output_dir, f"{os.path.splitext(os.path.basename(input_h5_file))[0]}_metadata.json")
+    pipeline.add(f'{prefix}h5_metadata', write_h5_metadata, input_h5_file, metadata_filename,
+                 inputs=[input_h5_file], outputs=[metadata_filename])
+
+    if product_level == 'L2C':
+        print("L2C processing not implemented yet")
+        return pipeline
+
+    for band_name in bands:
+        subdataset = f"IMG_{band_name}"
         if product_level == 'L1C':
-            print("Processing L1C data...")
-            subprocess.run(['python', 'l1c.py'], check=True)
-        elif product_level == 'L1B':
-            print("Processing L1B data...")
-            subprocess.run(['python', 'l1b.py'], check=True)
-        elif product_level == 'L2C':
-            print("Processing L2C data...")
-            print("L2C processing not implemented yet")
-            return
-        
-        # Step 4: Wait for TIFF files and generate metadata
-        print("Waiting for TIFF files to be generated...")
-        tiff_files = wait_for_tiff_files(bands)
-        
-        if tiff_files:
-            print("Generating metadata for TIFF files...")
-            for tiff_file in tiff_files:
-                process_tiff_metadata(tiff_file)
-            print(f"Generated metadata for {len(tiff_files)} TIFF files")
+            tiff_file = os.path.join(output_dir, f"{subdataset}.tif")
+            cog_file = os.path.join(output_dir, f"{subdataset}_cog.tif")
+            pipeline.add(f'{prefix}convert_{band_name}', l1c.extract_and_project_subdatasets,
+                         input_h5_file, output_dir, keys=[subdataset],
+                         inputs=[input_h5_file], outputs=[tiff_file])
+            pipeline.add(f'{prefix}cog_{band_name}', l1b.convert_to_cog, tiff_file, cog_file,
+                         inputs=[tiff_file], outputs=[cog_file])
         else:
-            print("No TIFF files found within timeout period")
-        
-        print(f"Successfully processed {product_level} data")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"Error processing {product_level} data: {str(e)}")
-        raise
+            # The L1B chain warps straight to a COG
+            cog_file = os.path.join(output_dir, f"{subdataset}_region_cog.tif")
+            pipeline.add(f'{prefix}convert_{band_name}', l1b.process_satellite_subdataset,
+                         input_h5_file, subdataset, output_dir,
+                         inputs=[input_h5_file], outputs=[cog_file])
+        pipeline.add(f'{prefix}metadata_{band_name}', write_tiff_metadata, cog_file,
+                     inputs=[cog_file], outputs=[tiff_metadata_path(cog_file)])
+    return pipeline
+
+def process_satellite_data(input_h5_file, output_dir=None, workers=None):
+    """Main workflow function to process satellite data."""
+    # Define bands to process
+    bands = ["VIS", "MIR", "SWIR", "TIR1", "TIR2", "WV"]
+
+    pipeline = build_pipeline(input_h5_file, bands, output_dir)
+    results = pipeline.run(workers)
+    print(f"Successfully ran {len(results)} tasks")
+    return results
 
 def main():
-    input_file = "3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5"
+    parser = argparse.ArgumentParser(description="Convert a scene and extract its metadata")
+    parser.add_argument('input_file', nargs='?', default="3RIMG_04SEP2024_1015_L1C_ASIA_MER_V01R00.h5")
+    parser.add_argument('--output-dir', help="default: projected_data (L1C) or region_outputs (L1B)")
+    parser.add_argument('--workers', type=int, help="tasks run concurrently (default: all cores)")
+    args = parser.parse_args()
+    input_file = args.input_file
     
     try:
         if not os.path.exists(input_file):
             raise FileNotFoundError(f"Input file {input_file} not found")
             
-        process_satellite_data(input_file)
+        process_satellite_data(input_file, args.output_dir, args.workers)
         print("Workflow completed successfully")
         
     except Exception as e: